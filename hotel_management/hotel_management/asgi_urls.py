@@ -0,0 +1,11 @@
+"""
+URLconf del despliegue ASGI: las vistas async de reservations.async_urls
+van primero y el resto del sitio se resuelve como en hotel_management.urls.
+"""
+from django.urls import path, include
+from . import urls
+
+urlpatterns = [
+    path('', include('reservations.async_urls')),
+    *urls.urlpatterns,
+]
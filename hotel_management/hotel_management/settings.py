@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'reservations.middleware.RequestMetricsMiddleware',
+    'reservations.middleware.PropertyMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,7 +52,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'hotel_management.urls'
+# Con HOTEL_ASYNC_VIEWS=1 (lo define asgi.py) las vistas de lectura más
+# concurridas se sirven con sus variantes async.
+ASYNC_VIEWS = os.environ.get('HOTEL_ASYNC_VIEWS') == '1'
+
+ROOT_URLCONF = 'hotel_management.asgi_urls' if ASYNC_VIEWS else 'hotel_management.urls'
 
 TEMPLATES = [
     {
@@ -77,9 +83,190 @@ WSGI_APPLICATION = 'hotel_management.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('HOTEL_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        # Los tests de concurrencia necesitan un archivo real: la base en
+        # memoria compartida de SQLite bloquea tablas en vez de esperar.
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+# Perfil de producción (HOTEL_DB_PROFILE=production):
+# - WAL y los pragmas de SQLITE_PRAGMAS en cada conexión nueva
+#   (reservations.db.configure_sqlite_connection).
+# - Conexiones persistentes en vez de una por petición.
+# - Transacciones IMMEDIATE: toman el candado de escritura al empezar, así
+#   que una transacción nunca falla a mitad de camino al pasar de leer a
+#   escribir; espera hasta busy_timeout.
+# - Una segunda conexión de solo lectura ('replica') sobre el mismo archivo,
+#   a la que reservations.routers.ReadWriteRouter manda las lecturas.
+
+SQLITE_PRAGMAS = {}
+DATABASE_ROUTERS = []
+
+if os.environ.get('HOTEL_DB_PROFILE') == 'production':
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -20000,
+    }
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    })
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'OPTIONS': {},
+        'TEST': {'MIRROR': 'default'},
+    }
+    READ_DATABASE_ALIAS = 'replica'
+    DATABASE_ROUTERS = ['reservations.routers.ReadWriteRouter']
+
+
+# Propiedades
+# Cada hotel de HOTEL_PROPERTIES (separados por coma) tiene su propia base,
+# db_<propiedad>.sqlite3 junto a la principal, con sus habitaciones,
+# huéspedes, reservas y promociones: las escrituras de un hotel no esperan
+# a las de otro. 'default' guarda usuarios, sesiones y el directorio
+# compartido de huéspedes. La propiedad de cada petición sale del host
+# (<propiedad>.dominio); la primera de la lista es la por defecto. Sin
+# HOTEL_PROPERTIES hay una sola propiedad, guardada en 'default'.
+# migrate_properties migra todas las bases; seed_data --all-properties
+# siembra cada una en su propio proceso. Para pasar una instalación de una
+# sola base a propiedades: activar HOTEL_PROPERTIES, correr
+# migrate_properties y luego move_to_property --property <propiedad>, que
+# copia los datos de hotel de 'default' a la base de esa propiedad.
+
+PROPERTY_NAMES = [name.strip() for name in os.environ.get('HOTEL_PROPERTIES', '').split(',') if name.strip()]
+DEFAULT_PROPERTY = PROPERTY_NAMES[0] if PROPERTY_NAMES else 'veranum'
+PROPERTY_DATABASES = {DEFAULT_PROPERTY: 'default'}
+
+if PROPERTY_NAMES:
+    PROPERTY_DATABASES = {name: f'property_{name}' for name in PROPERTY_NAMES}
+    data_dir = Path(DATABASES['default']['NAME']).parent
+    for name, alias in PROPERTY_DATABASES.items():
+        DATABASES[alias] = {
+            **DATABASES['default'],
+            'NAME': data_dir / f'db_{name}.sqlite3',
+            'TEST': {'NAME': BASE_DIR / f'test_db_{name}.sqlite3'},
+        }
+    DATABASE_ROUTERS = ['reservations.routers.PropertyRouter', *DATABASE_ROUTERS]
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Memoria local por defecto. Con varios procesos, HOTEL_CACHE_BACKEND=file
+# comparte el caché (y sus invalidaciones) a través del disco.
+
+if os.environ.get('HOTEL_CACHE_BACKEND') == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('HOTEL_CACHE_LOCATION', BASE_DIR / 'cache'),
+        }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'veranum',
+        }
+    }
+
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+
+# Sesiones y autenticación
+# HOTEL_SESSION_MODE elige dónde vive la sesión:
+# - db (por defecto): una consulta a django_session por petición.
+# - cached_db: se lee del caché y la base queda de respaldo. Con varios
+#   procesos exige un caché compartido (HOTEL_CACHE_BACKEND=file); con
+#   memoria local, un logout en un proceso no se vería en los demás.
+# - signed_cookies: la sesión viaja firmada en la cookie y no toca la base,
+#   pero un logout no invalida copias anteriores de la cookie.
+# El usuario de la sesión, con su Guest y sus permisos, se guarda en caché
+# AUTH_CACHE_TIMEOUT segundos (reservations.backends.CachedModelBackend;
+# 0 lo desactiva).
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('HOTEL_SESSION_MODE', 'db')]
+
+AUTHENTICATION_BACKENDS = ['reservations.backends.CachedModelBackend']
+AUTH_CACHE_ALIAS = 'default'
+AUTH_CACHE_TIMEOUT = int(os.environ.get('HOTEL_AUTH_CACHE_SECONDS', 300))
+
+
+# Métricas
+# /metrics responde al personal y a quien mande la cabecera
+# Authorization: Bearer <HOTEL_METRICS_TOKEN> (el scraper de Prometheus).
+# No se filtra por dirección: detrás del proxy todo llega desde loopback.
+# Las peticiones más lentas que SLOW_REQUEST_THRESHOLD_MS se registran con su
+# SQL en el logger reservations.slow_requests (None lo desactiva).
+
+METRICS_TOKEN = os.environ.get('HOTEL_METRICS_TOKEN')
+
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('HOTEL_SLOW_REQUEST_MS', 500)) or None
+
+
+# Feeds iCalendar
+# /calendars/rooms/<número>.ics y /calendars/types/<tipo>.ics publican las
+# noches ocupadas para los channel managers, desde CALENDAR_PAST_DAYS
+# atrás. Si HOTEL_CALENDAR_TOKEN está definido, las URLs deben llevar
+# ?token=<valor>.
+
+CALENDAR_FEED_TOKEN = os.environ.get('HOTEL_CALENDAR_TOKEN')
+CALENDAR_PAST_DAYS = 30
+CALENDAR_CACHE_SECONDS = 60
+
+
+# Archivo de reservas
+# archive_reservations mueve a ReservationArchive las estadías que
+# terminaron hace más de RESERVATION_ARCHIVE_AFTER_DAYS días.
+
+RESERVATION_ARCHIVE_AFTER_DAYS = int(os.environ.get('HOTEL_ARCHIVE_AFTER_DAYS', 365))
+
+
+# Correo y trabajos en segundo plano
+# Los correos (confirmaciones de reserva) los manda el comando run_jobs, no
+# la petición. En desarrollo se imprimen en consola; en producción
+# HOTEL_EMAIL_BACKEND apunta al backend SMTP. Un trabajo tomado por un
+# worker que no lo termina en JOB_LEASE_SECONDS vuelve a la cola.
+
+EMAIL_BACKEND = os.environ.get('HOTEL_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('HOTEL_FROM_EMAIL', 'reservas@veranum.cl')
+
+JOB_LEASE_SECONDS = 300
+
+
+# Disponibilidad en vivo
+# /live/availability/ (solo en el despliegue ASGI) empuja por server-sent
+# events los cambios de habitaciones y reservas al tablero. HOTEL_LIVE_BACKEND
+# elige cómo llegan los eventos a cada proceso:
+# - local (por defecto): dentro del proceso; basta con un solo proceso ASGI.
+# - db: por la tabla LiveEvent, que cada proceso consulta cada
+#   LIVE_POLL_SECONDS. Para varios procesos sin un broker.
+# Un backend sobre un broker se indica con su ruta en LIVE_EVENTS_BACKEND
+# (ver reservations.live).
+
+LIVE_EVENTS_BACKENDS = {
+    'local': 'reservations.live.LocalBackend',
+    'db': 'reservations.live.DatabaseBackend',
 }
+LIVE_EVENTS_BACKEND = LIVE_EVENTS_BACKENDS[os.environ.get('HOTEL_LIVE_BACKEND', 'local')]
+LIVE_POLL_SECONDS = 1
+LIVE_EVENT_RETENTION_SECONDS = 300
+LIVE_KEEPALIVE_SECONDS = 15
+LIVE_RETRY_MILLISECONDS = 5000
+# Eventos pendientes por conexión antes de mandarle un reset.
+LIVE_QUEUE_SIZE = 32
 
 
 # Password validation
@@ -1,6 +1,78 @@
 from django.contrib import admin
-from .models import Guest, Reservation, Room
+from . import catalog
+from .models import Guest, Promotion, Reservation, Room
+from .pagination import CappedCountPaginator
+from .search import search_guests
 
-admin.site.register(Guest)
-admin.site.register(Reservation)
-admin.site.register(Room)
\ No newline at end of file
+# Con tablas grandes cada listado del admin debe costar un número fijo de
+# consultas: list_select_related para los __str__ de las llaves foráneas,
+# autocompletado en vez de <select> con toda la tabla, orden y filtros que
+# calzan con un índice, y conteos acotados (CappedCountPaginator, sin el
+# total de la tabla).
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class RoomTypeFilter(admin.SimpleListFilter):
+    # Los tipos salen del catálogo en caché, no de un SELECT DISTINCT.
+    title = 'tipo de habitación'
+    parameter_name = 'room_type'
+
+    def lookups(self, request, model_admin):
+        room_types = sorted({room.room_type for room in catalog.get_rooms()})
+        return [(room_type, room_type) for room_type in room_types]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        field = 'room_type' if queryset.model is Room else 'room__room_type'
+        return queryset.filter(**{field: self.value()})
+
+
+@admin.register(Guest)
+class GuestAdmin(ScalableAdmin):
+    list_display = ['last_name', 'first_name', 'email', 'phone_number', 'has_used_promotion']
+    ordering = ['last_name', 'first_name', 'id']
+    # Solo para habilitar el buscador; la búsqueda real usa el índice FTS5.
+    search_fields = ['last_name']
+    autocomplete_fields = ['user']
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        ids = [guest.pk for guest in search_guests(search_term, limit=self.list_per_page * 4)]
+        return queryset.filter(pk__in=ids), False
+
+
+@admin.register(Room)
+class RoomAdmin(ScalableAdmin):
+    list_display = ['room_number', 'room_type', 'price_per_night', 'available', 'promotion']
+    list_select_related = ['promotion']
+    list_filter = [RoomTypeFilter, 'available']
+    ordering = ['room_number']
+    search_fields = ['^room_number', 'room_type']
+    autocomplete_fields = ['promotion']
+
+
+@admin.register(Promotion)
+class PromotionAdmin(ScalableAdmin):
+    list_display = ['code', 'discount_percentage', 'start_date', 'end_date', 'uses_count', 'max_uses']
+    list_filter = ['start_date', 'end_date']
+    ordering = ['-start_date', '-id']
+    search_fields = ['^code']
+    readonly_fields = ['uses_count']
+
+
+@admin.register(Reservation)
+class ReservationAdmin(ScalableAdmin):
+    list_display = ['id', 'guest', 'room', 'check_in_date', 'check_out_date', 'total_price', 'room_locked']
+    list_select_related = ['guest', 'room']
+    # check_in_date y check_out_date tienen índice (reservation_check_in_idx,
+    # reservation_check_out_idx); el filtro de tipo va por la llave de room.
+    list_filter = ['check_in_date', 'check_out_date', RoomTypeFilter]
+    ordering = ['-check_in_date', '-id']
+    autocomplete_fields = ['guest', 'room', 'promotion']
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class ReservationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reservations'
+
+    def ready(self):
+        from . import signals, tasks  # noqa: F401
+        from .db import configure_sqlite_connection, install_sqlite_triggers
+        post_migrate.connect(install_sqlite_triggers, sender=self)
+        connection_created.connect(configure_sqlite_connection)
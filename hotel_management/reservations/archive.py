@@ -0,0 +1,76 @@
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import connections, router, transaction
+from . import versions
+from .models import PromotionRedemption, Reservation, ReservationArchive
+
+# Campos que pasan tal cual de Reservation a ReservationArchive.
+FIELDS = ('id', 'guest_id', 'room_id', 'check_in_date', 'check_out_date', 'promotion_id', 'total_price', 'property')
+
+
+def cutoff(today=None, days=None):
+    """
+    Las estadías con salida anterior a esta fecha se archivan.
+    """
+    days = settings.RESERVATION_ARCHIVE_AFTER_DAYS if days is None else days
+    return (today or date.today()) - timedelta(days=days)
+
+
+def archive_batch(before, batch_size=1000):
+    """
+    Mueve a ReservationArchive hasta batch_size reservas con salida anterior
+    a `before`, en una transacción. Devuelve cuántas movió (0 cuando no
+    queda ninguna). Cada lote se confirma por separado: si el comando se
+    interrumpe, lo movido queda movido y la siguiente corrida sigue con lo
+    que falta.
+
+    Se borra con SQL directo y no con delete(): las señales restarían la
+    estadía del rollup y del inventario (que guardan el historial) y
+    devolverían el cupo de su promoción. El canje no se borra: pasa a
+    apuntar a la archivada, así el límite por huésped lo sigue contando.
+    """
+    using = router.db_for_write(Reservation)
+    with transaction.atomic(using=using):
+        rows = list(
+            Reservation.objects.using(using).filter(check_out_date__lt=before).order_by('id').values_list(*FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ReservationArchive.objects.using(using).bulk_create(
+            [ReservationArchive(**dict(zip(FIELDS, row))) for row in rows],
+            ignore_conflicts=True,
+        )
+        ids = [(row[0],) for row in rows]
+        with connections[using].cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {PromotionRedemption._meta.db_table} '
+                'SET archived_reservation_id = reservation_id, reservation_id = NULL WHERE reservation_id = %s',
+                ids,
+            )
+            cursor.executemany(f'DELETE FROM {Reservation._meta.db_table} WHERE id = %s', ids)
+        versions.bump(Reservation)
+    return len(rows)
+
+
+def archive(before, batch_size=1000):
+    """
+    Archiva por lotes todas las reservas con salida anterior a `before`.
+    Devuelve el total movido.
+    """
+    moved = 0
+    while True:
+        count = archive_batch(before, batch_size=batch_size)
+        if not count:
+            return moved
+        moved += count
+
+
+def stays(fields, **filters):
+    """
+    values_list(*fields) de las reservas activas y las archivadas juntas
+    (UNION ALL), con los mismos filtros en ambas tablas. Para recorrer todo
+    el historial, como al recalcular el rollup.
+    """
+    hot = Reservation.objects.filter(**filters).values_list(*fields)
+    cold = ReservationArchive.objects.filter(**filters).values_list(*fields)
+    return hot.union(cold, all=True)
@@ -0,0 +1,271 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from django.db import connections, router, transaction
+from . import calendars, jobs, live, tasks, versions
+from .models import Reservation, Room
+
+# Huecos de una o dos noches entre dos estadías: casi nunca se venden.
+SHORT_GAP = 2
+# Costos de pack(): dejar un hueco corto pesa más que abrir una habitación
+# vacía, y eso más que cualquier hueco largo dentro de la ventana.
+SHORT_GAP_COST = 1_000_000
+EMPTY_ROOM_COST = 100_000
+# Las estadías que se mueven se estacionan temporalmente este número de
+# días más adelante (ver apply_plan).
+PARKING_OFFSET = 300 * 365
+
+
+class Stay:
+    __slots__ = ('id', 'room_id', 'start', 'end', 'locked')
+
+    def __init__(self, id, room_id, start, end, locked):
+        self.id = id
+        self.room_id = room_id
+        self.start = start
+        self.end = end
+        self.locked = locked
+
+
+class RoomTimeline:
+    """
+    Estado de una habitación mientras se reparte: las estadías fijas
+    ordenadas por entrada y `free_from`, la salida de la última estadía
+    ya ubicada. Como las estadías se reparten por orden de entrada, el
+    puntero `next` solo avanza.
+    """
+
+    __slots__ = ('room_id', 'fixed', 'next', 'free_from')
+
+    def __init__(self, room_id, fixed):
+        self.room_id = room_id
+        self.fixed = sorted(fixed, key=lambda stay: stay.start)
+        self.next = 0
+        self.free_from = None
+
+    def fit(self, start, end):
+        """
+        Devuelve (hueco antes, hueco después) si [start, end) cabe, o None.
+        Un hueco es None cuando no hay estadía de ese lado.
+        """
+        fixed = self.fixed
+        while self.next < len(fixed) and fixed[self.next].start < start:
+            stay = fixed[self.next]
+            if self.free_from is None or stay.end > self.free_from:
+                self.free_from = stay.end
+            self.next += 1
+        if self.free_from is not None and self.free_from > start:
+            return None
+        after = None
+        if self.next < len(fixed):
+            after = fixed[self.next].start - end
+            if after < 0:
+                return None
+        before = None if self.free_from is None else start - self.free_from
+        return before, after
+
+
+def gap_cost(gap):
+    return SHORT_GAP_COST if gap is not None and 0 < gap <= SHORT_GAP else 0
+
+
+def gap_report(stays, room_ids):
+    """
+    Huecos entre estadías consecutivas de cada habitación: cuántos son
+    cortos (de 1 a SHORT_GAP noches) y cuántas noches suman. Los bordes
+    de la ventana no cuentan como hueco. También cuenta las habitaciones
+    sin ninguna estadía en la ventana, que quedan libres de punta a punta.
+    """
+    by_room = defaultdict(list)
+    for stay in stays:
+        by_room[stay.room_id].append(stay)
+    short_gaps = short_nights = 0
+    for room_stays in by_room.values():
+        room_stays.sort(key=lambda stay: stay.start)
+        for previous, following in zip(room_stays, room_stays[1:]):
+            gap = following.start - previous.end
+            if 0 < gap <= SHORT_GAP:
+                short_gaps += 1
+                short_nights += gap
+    return {
+        'short_gaps': short_gaps,
+        'short_gap_nights': short_nights,
+        'empty_rooms': len(set(room_ids) - by_room.keys()),
+    }
+
+
+def pack(timelines, movable):
+    """
+    Reparte las estadías movibles entre las habitaciones de un tipo.
+
+    Es el reparto voraz de intervalos por orden de entrada (coloreo de un
+    grafo de intervalos) con elección best-fit: cada estadía va a la
+    habitación donde queda más pegada a la anterior, evitando dejar
+    huecos cortos antes o después. Las habitaciones vacías solo se abren
+    cuando ninguna ocupada sirve, así siguen libres en bloques largos. A
+    igual costo se prefiere la habitación actual para no mover de más.
+    Devuelve {id de reserva: habitación} o None si alguna no cupo.
+    """
+    assignment = {}
+    for stay in sorted(movable, key=lambda stay: (stay.start, -stay.end)):
+        best = best_cost = None
+        for timeline in timelines:
+            gaps = timeline.fit(stay.start, stay.end)
+            if gaps is None:
+                continue
+            before, after = gaps
+            cost = gap_cost(before) + gap_cost(after)
+            cost += 2 * before if before is not None else EMPTY_ROOM_COST
+            if timeline.room_id == stay.room_id:
+                cost -= 1
+            if best is None or cost < best_cost:
+                best, best_cost = timeline, cost
+        if best is None:
+            return None
+        best.free_from = stay.end
+        assignment[stay.id] = best.room_id
+    return assignment
+
+
+class AssignmentPlan:
+    """
+    Resultado de plan(): las reservas que cambian de habitación
+    (`moves`, lista de (reserva, habitación actual, habitación nueva)), las
+    fechas con que se planificó cada una (`dates`) y un resumen por tipo de
+    habitación con los huecos antes y después. apply_plan() deja en
+    `skipped` cuántas no movió porque habían cambiado.
+    """
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+        self.moves = []
+        self.dates = {}
+        self.room_types = {}
+        self.skipped = 0
+
+
+def plan(start=None, end=None, room_type=None, today=None):
+    """
+    Propone una asignación de habitaciones para las estadías de la
+    ventana [start, end) sin tocar la base.
+
+    Se mueven solo las reservas sin room_locked que caen enteras dentro
+    de la ventana y empiezan después de hoy; siempre dentro del mismo
+    tipo de habitación, así que precios, rollup e inventario no cambian.
+    Las demás quedan fijas en su habitación. Un tipo solo se reasigna si
+    quedan menos huecos cortos que antes (o los mismos, pero más
+    habitaciones libres toda la ventana).
+    """
+    today = today or date.today()
+    start = start or today + timedelta(days=1)
+    end = end or start + timedelta(days=90)
+    result = AssignmentPlan(start, end)
+    first_movable = max(start, today + timedelta(days=1)).toordinal()
+
+    rooms = Room.objects.all()
+    if room_type:
+        rooms = rooms.filter(room_type=room_type)
+    rooms_by_type = defaultdict(list)
+    for room_id, kind, available in rooms.values_list('pk', 'room_type', 'available'):
+        rooms_by_type[kind].append((room_id, available))
+
+    stays = Reservation.objects.filter(check_in_date__lt=end, check_out_date__gt=start)
+    if room_type:
+        stays = stays.filter(room__room_type=room_type)
+    stays_by_type = defaultdict(list)
+    rows = stays.values_list('pk', 'room_id', 'room__room_type', 'check_in_date', 'check_out_date', 'room_locked')
+    for pk, room_id, kind, check_in_date, check_out_date, locked in rows.iterator():
+        check_in = check_in_date.toordinal()
+        locked = locked or check_in < first_movable or check_out_date > end
+        stays_by_type[kind].append(Stay(pk, room_id, check_in, check_out_date.toordinal(), locked))
+
+    for kind, room_list in sorted(rooms_by_type.items()):
+        type_stays = stays_by_type.get(kind, [])
+        available = {room_id for room_id, is_available in room_list if is_available}
+        fixed, movable = defaultdict(list), []
+        for stay in type_stays:
+            if stay.locked:
+                fixed[stay.room_id].append(stay)
+            else:
+                movable.append(stay)
+        # Las habitaciones fuera de servicio no reciben estadías: las
+        # movibles que tengan se reparten entre las demás.
+        timelines = [RoomTimeline(room_id, fixed[room_id]) for room_id, _ in room_list if room_id in available]
+        room_ids = [room_id for room_id, _ in room_list]
+        before = gap_report(type_stays, room_ids)
+        assignment = pack(timelines, movable)
+        summary = {'rooms': len(room_list), 'stays': len(type_stays), 'movable': len(movable), 'before': before}
+        result.room_types[kind] = summary
+        if assignment is None:
+            summary.update(after=before, moves=0, skipped=True)
+            continue
+        proposed = [Stay(stay.id, assignment.get(stay.id, stay.room_id), stay.start, stay.end, stay.locked) for stay in type_stays]
+        after = gap_report(proposed, room_ids)
+        if (after['short_gaps'], -after['empty_rooms']) >= (before['short_gaps'], -before['empty_rooms']):
+            summary.update(after=before, moves=0, skipped=True)
+            continue
+        moves = [stay for stay in movable if assignment[stay.id] != stay.room_id]
+        summary.update(after=after, moves=len(moves), skipped=False)
+        for stay in moves:
+            result.moves.append((stay.id, stay.room_id, assignment[stay.id]))
+            result.dates[stay.id] = (date.fromordinal(stay.start), date.fromordinal(stay.end))
+    return result
+
+
+def apply_plan(result):
+    """
+    Aplica los movimientos de un plan en una sola transacción.
+
+    Un intercambio entre dos habitaciones no se puede hacer fila por fila:
+    el trigger reservation_no_overlap_update rechazaría el primer UPDATE.
+    Por eso primero se estacionan las reservas que se mueven PARKING_OFFSET
+    días más adelante (en su habitación de siempre, así que no chocan entre
+    sí) y después se dejan en su habitación nueva con sus fechas reales.
+    No hace falta tocar el rollup ni el inventario porque el tipo de
+    habitación y las fechas no cambian (sí el sello de versión de
+    Reservation), así que se escribe con executemany
+    (bulk_update arma un CASE por fila y con miles de filas es decenas de
+    veces más lento). Los triggers de cruce corren igual sobre estos
+    UPDATE: si entretanto alguien reservó en un hueco, abortan todo y no se
+    mueve nada.
+
+    El plan se calculó fuera de la transacción. Antes de escribir se vuelve
+    a leer cada reserva y se deja como está la que ya no coincide con lo
+    planificado (otra habitación u otras fechas, ahora fija o borrada); el
+    total queda en result.skipped. Cada huésped movido recibe un correo
+    (tarea SEND_ROOM_CHANGE, encolada en la misma transacción).
+    Devuelve cuántas reservas se movieron.
+    """
+    if not result.moves:
+        return 0
+    offset = timedelta(days=PARKING_OFFSET)
+    table = Reservation._meta.db_table
+    using = router.db_for_write(Reservation)
+    connection = connections[using]
+    adapt = connection.ops.adapt_datefield_value
+    with transaction.atomic(using=using):
+        planned = {pk: (current, *result.dates[pk]) for pk, current, _ in result.moves}
+        stays = Reservation.objects.using(using).filter(pk__in=list(planned), room_locked=False).values_list('pk', 'room_id', 'check_in_date', 'check_out_date')
+        dates = {
+            pk: (check_in_date, check_out_date)
+            for pk, room_id, check_in_date, check_out_date in stays.iterator()
+            if planned[pk] == (room_id, check_in_date, check_out_date)
+        }
+        moves = [(pk, current, new) for pk, current, new in result.moves if pk in dates]
+        result.skipped = len(result.moves) - len(moves)
+        if not moves:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'UPDATE {table} SET check_in_date = %s, check_out_date = %s WHERE id = %s',
+                [(adapt(check_in_date + offset), adapt(check_out_date + offset), pk) for pk, (check_in_date, check_out_date) in dates.items()],
+            )
+            cursor.executemany(
+                f'UPDATE {table} SET room_id = %s, check_in_date = %s, check_out_date = %s WHERE id = %s',
+                [(room_id, adapt(dates[pk][0]), adapt(dates[pk][1]), pk) for pk, _, room_id in moves],
+            )
+        jobs.enqueue_many(tasks.SEND_ROOM_CHANGE, [({'reservation_id': pk}, tasks.room_change_key(pk, room_id)) for pk, _, room_id in moves])
+        versions.bump(Reservation)
+        calendars.touch({room_id for _, current, new in moves for room_id in (current, new)})
+        live.publish_reset()
+    return len(moves)
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('rooms/search/', async_views.room_search, name='room_search'),
+    path('user_dashboard/', async_views.user_dashboard, name='user_dashboard'),
+    path('user_reservations/', async_views.user_reservations, name='user_reservations'),
+    path('live/availability/', async_views.live_availability, name='live_availability'),
+]
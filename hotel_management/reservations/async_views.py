@@ -0,0 +1,115 @@
+from datetime import date, timedelta
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.urls import reverse
+from django.contrib.auth.decorators import login_required
+from . import catalog, inventory, live
+from .availability import aavailable_catalog_rooms
+from .conditional import versioned
+from .forms import AvailabilitySearchForm
+from .models import Promotion, Reservation, ReservationArchive, Room
+from .views import room_type_booking_form, with_stay_totals
+
+# Variantes async de las vistas de lectura más concurridas, para el
+# despliegue ASGI (hotel_management.asgi_urls). Hacen lo mismo que sus
+# pares de views.py, pero esperan a la base con el ORM async en vez de
+# ocupar un hilo por petición.
+
+
+async def arender(request, template_name, context):
+    """
+    render() para vistas async. El usuario se resuelve antes con
+    request.auser() para que el procesador de contexto `auth` no consulte
+    la base desde el bucle de eventos al renderizar la plantilla.
+    """
+    request.user = await request.auser()
+    return render(request, template_name, context)
+
+@login_required
+async def room_search(request):
+    """
+    Busca habitaciones libres para un rango de fechas, filtrando opcionalmente
+    por tipo de habitación y precio máximo por noche.
+    """
+    form = AvailabilitySearchForm(request.GET or None)
+    rooms = vacancies = booking_form = None
+    if form.is_valid():
+        check_in_date = form.cleaned_data['check_in_date']
+        check_out_date = form.cleaned_data['check_out_date']
+        vacancies = await inventory.avacancies(check_in_date, check_out_date, room_type=form.cleaned_data['room_type'])
+        booking_form = room_type_booking_form(vacancies, check_in_date, check_out_date)
+        rooms = await aavailable_catalog_rooms(
+            check_in_date,
+            check_out_date,
+            room_type=form.cleaned_data['room_type'],
+            max_price=form.cleaned_data['max_price'],
+        )
+        rooms = with_stay_totals(rooms, check_in_date, check_out_date)
+    return await arender(request, 'reservations/room_search.html', {
+        'form': form,
+        'rooms': rooms,
+        'vacancies': vacancies,
+        'booking_form': booking_form,
+    })
+
+@login_required
+@versioned(Room, Reservation, Promotion, per_day=True)
+async def user_dashboard(request):
+    """
+    Muestra el tablero de usuario con una lista de habitaciones disponibles.
+    Por defecto muestra las habitaciones libres para esta noche.
+    """
+    today = date.today()
+    form = AvailabilitySearchForm(request.GET or None)
+    if form.is_valid():
+        check_in_date = form.cleaned_data['check_in_date']
+        check_out_date = form.cleaned_data['check_out_date']
+    else:
+        check_in_date, check_out_date = today, today + timedelta(days=1)
+    rooms = with_stay_totals(await aavailable_catalog_rooms(check_in_date, check_out_date), check_in_date, check_out_date)
+    promotions = await catalog.aget_active_promotions(today)
+    return await arender(request, 'reservations/user_dashboard.html', {
+        'rooms': rooms,
+        'promotions': promotions,
+        'today': today,
+        'check_in_date': check_in_date,
+        'check_out_date': check_out_date,
+        'live_url': reverse('live_availability'),
+    })
+
+@login_required
+async def user_reservations(request):
+    """
+    Muestra una lista de reservas del usuario actual; con ?history=1 incluye
+    también las estadías archivadas.
+    """
+    user = await request.auser()
+    history = request.GET.get('history') == '1'
+    # Como en views.user_reservations: sin perfil de huésped, lista vacía.
+    guest = await sync_to_async(getattr)(user, 'guest', None)
+    reservations = []
+    if guest is not None:
+        reservations = [
+            reservation async for reservation in
+            Reservation.objects.filter(guest=guest).select_related('room')
+        ]
+        if history:
+            reservations += [
+                reservation async for reservation in
+                ReservationArchive.objects.filter(guest=guest).select_related('room').order_by('-check_in_date')
+            ]
+    return await arender(request, 'reservations/user_reservations.html', {'reservations': reservations, 'history': history})
+
+@login_required
+async def live_availability(request):
+    """
+    Flujo de server-sent events con los cambios de disponibilidad y precio
+    de las habitaciones (ver live.py). La conexión queda abierta sin ocupar
+    un hilo: solo espera en el bucle de eventos.
+    """
+    response = StreamingHttpResponse(live.stream(request.property), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Que nginx no acumule el flujo en su búfer.
+    response['X-Accel-Buffering'] = 'no'
+    return response
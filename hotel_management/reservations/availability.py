@@ -0,0 +1,59 @@
+from django.db.models import Exists, OuterRef
+from . import catalog
+from .models import Reservation, Room
+
+
+def overlapping_reservations(check_in_date, check_out_date):
+    """
+    Reservas que se cruzan con el rango [check_in_date, check_out_date).
+    Una estadía que termina el mismo día en que empieza otra no se considera cruce.
+    """
+    return Reservation.objects.filter(
+        check_in_date__lt=check_out_date,
+        check_out_date__gt=check_in_date,
+    )
+
+
+def available_rooms(check_in_date, check_out_date, room_type=None, max_price=None):
+    """
+    Devuelve las habitaciones libres para el rango de fechas indicado.
+    Resuelve todo en una sola consulta: el NOT EXISTS usa el índice
+    compuesto (room, check_out_date, check_in_date) de Reservation: con la
+    salida en segunda posición solo se recorren las estadías que terminan
+    después de la entrada pedida, no todo el historial de la habitación.
+    """
+    booked = overlapping_reservations(check_in_date, check_out_date).filter(room=OuterRef('pk'))
+    rooms = Room.objects.filter(available=True)
+    if room_type:
+        rooms = rooms.filter(room_type=room_type)
+    if max_price is not None:
+        rooms = rooms.filter(price_per_night__lte=max_price)
+    return rooms.filter(~Exists(booked)).select_related('promotion').order_by('room_number')
+
+
+def _free_rooms(rooms, booked, room_type, max_price):
+    return [
+        room for room in rooms
+        if room.available
+        and room.pk not in booked
+        and (not room_type or room.room_type == room_type)
+        and (max_price is None or room.price_per_night <= max_price)
+    ]
+
+
+def available_catalog_rooms(check_in_date, check_out_date, room_type=None, max_price=None):
+    """
+    Igual que available_rooms, pero las habitaciones salen del catálogo en
+    caché: la única consulta es la de reservas que se cruzan con el rango.
+    Devuelve una lista.
+    """
+    booked = set(overlapping_reservations(check_in_date, check_out_date).values_list('room_id', flat=True))
+    return _free_rooms(catalog.get_rooms(), booked, room_type, max_price)
+
+
+async def aavailable_catalog_rooms(check_in_date, check_out_date, room_type=None, max_price=None):
+    """
+    Variante async de available_catalog_rooms().
+    """
+    booked = {room_id async for room_id in overlapping_reservations(check_in_date, check_out_date).values_list('room_id', flat=True)}
+    return _free_rooms(await catalog.aget_rooms(), booked, room_type, max_price)
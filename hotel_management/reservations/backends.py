@@ -0,0 +1,166 @@
+import copy
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db import router
+from . import properties
+
+# Cada usuario se guarda con su propia clave, dentro de la versión vigente
+# (como en catalog.py). Un cambio en un usuario o en su Guest borra solo su
+# clave; un cambio de permisos de grupo sube la versión y descarta todas.
+# La clave lleva la propiedad: el mismo usuario tiene un Guest por hotel.
+VERSION_KEY = 'reservations:auth:version'
+USER_KEY = 'reservations:auth:user:{}:{}'
+# El hash de la contraseña no va al caché: con HOTEL_CACHE_BACKEND=file
+# quedaría escrito en disco. Se guarda solo el hash de sesión que se deriva
+# de él, que es lo que se compara en cada petición.
+PRIVATE_FIELDS = {'password'}
+# Permisos que ModelBackend deja calculados en el usuario.
+PERMISSION_CACHES = ('_perm_cache', '_user_perm_cache', '_group_perm_cache')
+
+
+def _cache():
+    return caches[settings.AUTH_CACHE_ALIAS]
+
+
+def _version():
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def _aversion():
+    cache = _cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def forget_user(user_id):
+    _cache().delete_many([USER_KEY.format(name, user_id) for name in properties.names()], version=_version())
+
+
+def _users():
+    # Con varias propiedades el Guest está en otra base y no se puede unir.
+    users = get_user_model()._default_manager
+    return users.all() if properties.is_sharded() else users.select_related('guest')
+
+
+def _pack(user):
+    """
+    Lo que se guarda en caché de un usuario: sus campos sin la contraseña,
+    el hash de sesión, su Guest (o None) y sus permisos.
+    """
+    guest = getattr(user, 'guest', None)
+    if guest is not None:
+        # Sin el User que select_related dejó enlazado (con su contraseña).
+        guest = copy.copy(guest)
+        guest._state.fields_cache.pop('user', None)
+    return {
+        'fields': {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields if field.attname not in PRIVATE_FIELDS
+        },
+        'session_hash': user.get_session_auth_hash(),
+        'guest': guest,
+        'permissions': {name: getattr(user, name) for name in PERMISSION_CACHES if hasattr(user, name)},
+    }
+
+
+def _unpack(entry):
+    """
+    Rearma el usuario de _pack(). La contraseña queda diferida: si alguien
+    la lee (cambio de contraseña, claves de sesión antiguas) se carga de la
+    base, y desde ese momento el hash de sesión se vuelve a calcular.
+    """
+    user_model = get_user_model()
+    fields = entry['fields']
+    user = user_model.from_db(router.db_for_read(user_model), list(fields), list(fields.values()))
+    session_hash = entry['session_hash']
+
+    def get_session_auth_hash():
+        if 'password' in user.__dict__:
+            return user_model.get_session_auth_hash(user)
+        return session_hash
+
+    user.get_session_auth_hash = get_session_auth_hash
+    guest = entry['guest']
+    if guest is not None:
+        guest.user = user
+    user_model.guest.related.set_cached_value(user, guest)
+    for name, value in entry['permissions'].items():
+        setattr(user, name, value)
+    return user
+
+
+def forget_all():
+    cache = _cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend que guarda en caché, por AUTH_CACHE_TIMEOUT segundos, el
+    usuario de la sesión junto con su Guest (select_related) y sus permisos.
+    Así una petición autenticada no consulta auth_user, reservations_guest
+    ni las tablas de permisos. Las señales de signals.py invalidan la
+    entrada cuando cambian esos registros. Del usuario se guardan los
+    campos sin la contraseña (ver _pack).
+    """
+
+    def _load(self, user_id):
+        user_model = get_user_model()
+        try:
+            user = _users().get(pk=user_id)
+        except user_model.DoesNotExist:
+            return None
+        # Deja el Guest (o su ausencia) guardado en el objeto.
+        hasattr(user, 'guest')
+        # Deja calculados los permisos (_perm_cache) para que viajen en caché.
+        self.get_all_permissions(user)
+        return user
+
+    def get_user(self, user_id):
+        if not settings.AUTH_CACHE_TIMEOUT:
+            return super().get_user(user_id)
+        cache, version = _cache(), _version()
+        key = USER_KEY.format(properties.current(), user_id)
+        entry = cache.get(key, version=version)
+        if entry is None:
+            user = self._load(user_id)
+            if user is None:
+                return None
+            cache.set(key, _pack(user), timeout=settings.AUTH_CACHE_TIMEOUT, version=version)
+        else:
+            user = _unpack(entry)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        if not settings.AUTH_CACHE_TIMEOUT:
+            return await super().aget_user(user_id)
+        cache, version = _cache(), await _aversion()
+        key = USER_KEY.format(properties.current(), user_id)
+        entry = await cache.aget(key, version=version)
+        if entry is None:
+            user_model = get_user_model()
+            try:
+                user = await _users().aget(pk=user_id)
+            except user_model.DoesNotExist:
+                return None
+            await sync_to_async(hasattr)(user, 'guest')
+            await self.aget_all_permissions(user)
+            await cache.aset(key, _pack(user), timeout=settings.AUTH_CACHE_TIMEOUT, version=version)
+        else:
+            user = _unpack(entry)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,210 @@
+import asyncio
+import io
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import django
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import Guest
+
+BENCH_STAFF = 'bench_staff'
+BENCH_GUEST = 'bench_guest'
+# Lo justo para las vistas del personal que se miden.
+STAFF_PERMISSIONS = ('view_reservation', 'view_guest', 'view_room', 'view_promotion', 'view_dailyroomtypestats')
+
+
+class BenchmarkCommandMixin:
+    """
+    Para los comandos que crean los usuarios de benchmark y hacen
+    peticiones contra la base configurada: se niegan a correr con DEBUG
+    desactivado salvo con --allow-production.
+    """
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument(
+            '--allow-production', action='store_true',
+            help='Corre aunque DEBUG esté desactivado. Crea los usuarios de benchmark en la base configurada.',
+        )
+        return parser
+
+    def execute(self, *args, **options):
+        if not settings.DEBUG and not options.get('allow_production'):
+            raise CommandError('DEBUG está desactivado: usa --allow-production para medir contra esta base.')
+        return super().execute(*args, **options)
+
+
+def bench_users():
+    """
+    Usuarios fijos de los benchmarks: uno del personal, sin contraseña y
+    solo con permisos de lectura (nunca superusuario), y un huésped.
+    """
+    staff, created = User.objects.get_or_create(username=BENCH_STAFF, defaults={'is_staff': True})
+    # Una corrida anterior pudo dejarlo como superusuario.
+    staff.is_staff, staff.is_superuser = True, False
+    staff.set_unusable_password()
+    staff.save()
+    staff.user_permissions.set(Permission.objects.filter(content_type__app_label='reservations', codename__in=STAFF_PERMISSIONS))
+    guest_user, created = User.objects.get_or_create(username=BENCH_GUEST)
+    Guest.objects.get_or_create(user=guest_user, defaults={
+        'first_name': 'Bench',
+        'last_name': 'Guest',
+        'email': 'bench_guest@veranum.cl',
+        'phone_number': 'bench',
+        'has_used_promotion': True,
+    })
+    return staff, guest_user
+
+
+def percentile(values, fraction):
+    """
+    Percentil por el método del rango más cercano sobre una lista ordenada.
+    """
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, round(fraction * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def summarize(latencies, queries=(), statuses=()):
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if latencies else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+    }
+    if queries:
+        summary['queries_mean'] = round(statistics.fmean(queries), 2)
+        summary['queries_max'] = max(queries)
+    if statuses:
+        summary['status_codes'] = {str(status): list(statuses).count(status) for status in sorted(set(statuses))}
+    return summary
+
+
+def measure(call, repeat, warmup=1):
+    """
+    Ejecuta `call` `repeat` veces y devuelve latencias, consultas por
+    llamada y códigos de estado. Las primeras `warmup` no se cuentan.
+    """
+    for _ in range(warmup):
+        call()
+    latencies, queries, statuses = [], [], []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = call()
+            latencies.append(time.perf_counter() - started)
+        queries.append(len(captured))
+        statuses.append(getattr(response, 'status_code', None))
+    return latencies, queries, statuses
+
+
+def peak_memory(call, repeat=3):
+    """
+    Memoria máxima (KB) reservada por Python durante `repeat` llamadas.
+    Se mide aparte porque tracemalloc distorsiona las latencias.
+    """
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        for _ in range(repeat):
+            call()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def environment():
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+    }
+
+
+def write_results(path, results):
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(results, output, indent=2, ensure_ascii=False, default=str)
+
+
+def wsgi_get(handler, path, query='', cookie=''):
+    """
+    Petición GET directa a un WSGIHandler, como la haría el servidor.
+    Devuelve el código de estado.
+    """
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver',
+        'HTTP_COOKIE': cookie,
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'http',
+        'wsgi.version': (1, 0),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    status = []
+    body = handler(environ, lambda line, headers, exc_info=None: status.append(int(line.split()[0])))
+    try:
+        for _ in body:
+            pass
+    finally:
+        # close() dispara request_finished, que cierra las conexiones viejas.
+        body.close()
+    return status[0]
+
+
+async def asgi_get(application, path, query='', cookie=''):
+    """
+    Petición GET directa a una aplicación ASGI, como la haría el servidor.
+    Devuelve el código de estado.
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'root_path': '',
+        'query_string': query.encode(),
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+    sent_body = False
+    status = []
+
+    async def receive():
+        nonlocal sent_body
+        if not sent_body:
+            sent_body = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # El cliente nunca se desconecta; Django cancela esta espera al responder.
+        await asyncio.Future()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
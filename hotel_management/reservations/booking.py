@@ -0,0 +1,102 @@
+from django.db import IntegrityError, connections, router, transaction
+from . import backends, inventory, jobs, promotions, tasks
+from .availability import available_rooms, overlapping_reservations
+from .models import Guest, Reservation, Room
+from .pricing import quote_room
+
+
+class BookingError(Exception):
+    """
+    Error base del flujo de reservas.
+    """
+
+
+class RoomUnavailable(BookingError):
+    """
+    La habitación ya está reservada en parte del rango pedido.
+    """
+
+
+class PromotionAlreadyUsed(BookingError):
+    """
+    El huésped ya utilizó su promoción de primera reserva.
+    """
+
+
+def book_room(guest, room, check_in_date, check_out_date, promotion=None, room_locked=False):
+    """
+    Crea una reserva y, si corresponde, canjea la promoción del huésped
+    en una misma transacción: o quedan ambas cosas guardadas o ninguna.
+    El canje descuenta el cupo de la promoción (ver promotions.redeem) y
+    puede lanzar PromotionExhausted o PromotionLimitReached.
+    El total cotizado de la estadía queda guardado en la reserva. Con
+    room_locked la reserva queda fija en esa habitación (ver assignment.py).
+    El correo de confirmación se encola en la misma transacción y lo manda
+    el comando run_jobs: no alarga la reserva y no se pierde si algo falla
+    entre el commit y el envío.
+
+    En motores con SELECT ... FOR UPDATE se bloquea la fila de la habitación
+    antes de revisar cruces. En SQLite la primera sentencia de la transacción
+    es el INSERT, que toma el candado de escritura de la base (equivalente a
+    BEGIN IMMEDIATE) y el trigger reservation_no_overlap_insert rechaza
+    cualquier cruce, así que nunca se lee antes de escribir.
+    """
+    if check_out_date <= check_in_date:
+        raise BookingError('La fecha de salida debe ser posterior a la fecha de entrada.')
+
+    reservation = Reservation(
+        guest=guest,
+        room=room,
+        check_in_date=check_in_date,
+        check_out_date=check_out_date,
+        promotion=promotion,
+        room_locked=room_locked,
+        total_price=quote_room(room, check_in_date, check_out_date, promotion=promotion),
+    )
+    using = router.db_for_write(Reservation, instance=reservation)
+    with transaction.atomic(using=using):
+        if connections[using].features.has_select_for_update:
+            Room.objects.select_for_update().filter(pk=room.pk).exists()
+            if overlapping_reservations(check_in_date, check_out_date).filter(room=room).exists():
+                raise RoomUnavailable(room)
+        try:
+            with transaction.atomic(using=using):
+                reservation.save()
+        except IntegrityError as exc:
+            raise RoomUnavailable(room) from exc
+
+        if promotion is not None:
+            claimed = Guest.objects.filter(pk=guest.pk, has_used_promotion=False).update(has_used_promotion=True)
+            if not claimed:
+                raise PromotionAlreadyUsed(guest)
+            guest.has_used_promotion = True
+            # update() no dispara señales: el usuario en caché aún tiene el
+            # Guest con la promoción sin usar.
+            transaction.on_commit(lambda: backends.forget_user(guest.user_id), using=using)
+            promotions.redeem(promotion, guest, reservation)
+        jobs.enqueue(tasks.SEND_CONFIRMATION, {'reservation_id': reservation.pk}, key=tasks.confirmation_key(reservation.pk))
+    return reservation
+
+
+def book_room_type(guest, room_type, check_in_date, check_out_date, promotion=None):
+    """
+    Reserva cualquier habitación libre del tipo pedido.
+
+    Primero se leen los contadores de inventario (una fila por noche): si
+    alguna noche está completa se rechaza sin mirar reservas. Después se
+    asigna la primera habitación libre todo el rango, por número; si otra
+    reserva la toma en el intertanto, se prueba con la siguiente. Ambas
+    lecturas van fuera de la transacción de book_room, que sigue
+    empezando por el INSERT.
+    """
+    if check_out_date <= check_in_date:
+        raise BookingError('La fecha de salida debe ser posterior a la fecha de entrada.')
+    if inventory.vacancies(check_in_date, check_out_date, room_type=room_type)[room_type] <= 0:
+        raise RoomUnavailable(room_type)
+    for room in available_rooms(check_in_date, check_out_date, room_type=room_type):
+        try:
+            return book_room(guest, room, check_in_date, check_out_date, promotion=promotion)
+        except RoomUnavailable:
+            continue
+    # Hay cupo cada noche, pero ninguna habitación queda libre todo el rango.
+    raise RoomUnavailable(room_type)
@@ -0,0 +1,126 @@
+import hashlib
+from collections import defaultdict
+from datetime import date, timedelta
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Reservation, RoomCalendar
+
+# Feeds iCalendar (RFC 5545) con las noches ocupadas de cada habitación,
+# para los channel managers. Solo llevan fechas: nada del huésped.
+#
+# Los eventos de cada habitación se guardan ya generados en RoomCalendar.
+# Cada cambio de reservas sube la versión de su habitación (signals.py, y a
+# mano en las cargas masivas), y al pedir un feed solo se regeneran las
+# habitaciones cuya versión cambió o cuyo feed es de otro día (la ventana
+# parte CALENDAR_PAST_DAYS antes de hoy). Un feed sin cambios se responde
+# con un 304 después de una consulta a RoomCalendar.
+PRODID = '-//Hotel Veranum//Disponibilidad//ES'
+
+
+def touch(room_ids):
+    """
+    Marca como desactualizados los feeds de estas habitaciones. Va en la
+    transacción del cambio de reservas.
+    """
+    room_ids = {room_id for room_id in room_ids if room_id is not None}
+    if room_ids:
+        RoomCalendar.objects.filter(room_id__in=room_ids).update(version=F('version') + 1)
+
+
+def touch_all():
+    RoomCalendar.objects.update(version=F('version') + 1)
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+# Un VEVENT por reserva, con las líneas ya terminadas en CRLF. Las fechas
+# van como AAAAMMDD (_ical_date).
+EVENT = (
+    'BEGIN:VEVENT\r\n'
+    'UID:reservation-{id}@veranum\r\n'
+    'DTSTAMP:{stamp}\r\n'
+    'DTSTART;VALUE=DATE:{check_in}\r\n'
+    'DTEND;VALUE=DATE:{check_out}\r\n'
+    'SUMMARY:Ocupada\r\n'
+    'TRANSP:OPAQUE\r\n'
+    'END:VEVENT\r\n'
+)
+
+
+def _ical_date(value):
+    # isoformat() sin guiones: bastante más rápido que '{:%Y%m%d}', y en un
+    # feed de tipo se formatean dos fechas por cada una de miles de reservas.
+    return value.isoformat().replace('-', '')
+
+
+def rebuild(room_ids, today=None):
+    """
+    Regenera los eventos de estas habitaciones con una sola consulta a
+    Reservation (por el índice reservation_room_dates_idx). Devuelve
+    {room_id: etag}.
+    """
+    today = today or date.today()
+    since = today - timedelta(days=settings.CALENDAR_PAST_DAYS)
+    RoomCalendar.objects.bulk_create([RoomCalendar(room_id=room_id) for room_id in room_ids], ignore_conflicts=True)
+    # La versión se lee antes que las reservas: un cambio que llegue en
+    # medio deja el feed con una versión vieja y se regenera la próxima vez.
+    versions = dict(RoomCalendar.objects.filter(room_id__in=room_ids).values_list('room_id', 'version'))
+    stays = (
+        Reservation.objects.filter(room_id__in=room_ids, check_out_date__gte=since)
+        .order_by('room_id', 'check_in_date', 'id')
+        .values_list('id', 'room_id', 'check_in_date', 'check_out_date')
+    )
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%SZ')
+    events = defaultdict(list)
+    digests = defaultdict(lambda: hashlib.md5(usedforsecurity=False))
+    for reservation_id, room_id, check_in_date, check_out_date in stays.iterator():
+        events[room_id].append(EVENT.format(
+            id=reservation_id, stamp=stamp, check_in=_ical_date(check_in_date), check_out=_ical_date(check_out_date),
+        ))
+        # El ETag sale de las estadías y no del texto, que lleva DTSTAMP:
+        # regenerar sin cambios no obliga a los canales a bajar el feed.
+        digests[room_id].update(f'{reservation_id}|{check_in_date}|{check_out_date};'.encode())
+
+    etags = {}
+    with transaction.atomic(using=router.db_for_write(RoomCalendar)):
+        for room_id, version in versions.items():
+            etags[room_id] = digests[room_id].hexdigest()
+            RoomCalendar.objects.filter(room_id=room_id).update(
+                events=''.join(events[room_id]), etag=etags[room_id], built_version=version, built_on=today,
+            )
+    return etags
+
+
+def etag(room_ids, today=None):
+    """
+    ETag del feed de estas habitaciones, regenerando antes solo las que
+    cambiaron. Con todo al día es una consulta.
+    """
+    today = today or date.today()
+    rows = RoomCalendar.objects.filter(room_id__in=room_ids).values_list('room_id', 'version', 'built_version', 'built_on', 'etag')
+    current = {
+        room_id: etag for room_id, version, built_version, built_on, etag in rows
+        if version == built_version and built_on == today
+    }
+    stale = [room_id for room_id in room_ids if room_id not in current]
+    if stale:
+        current.update(rebuild(stale, today))
+    key = '|'.join(f'{room_id}:{current[room_id]}' for room_id in room_ids)
+    return hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def render(name, room_ids):
+    """
+    El feed completo de estas habitaciones, con los eventos ya generados.
+    """
+    events = dict(RoomCalendar.objects.filter(room_id__in=room_ids).values_list('room_id', 'events'))
+    header = ['BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN', f'X-WR-CALNAME:{_escape(name)}']
+    return (
+        ''.join(f'{line}\r\n' for line in header)
+        + ''.join(events.get(room_id, '') for room_id in room_ids)
+        + 'END:VCALENDAR\r\n'
+    )
@@ -0,0 +1,147 @@
+import threading
+import time
+from datetime import date
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Q
+from . import properties
+from .models import Promotion, Room
+
+# Todas las entradas del catálogo se guardan con la versión vigente
+# (parámetro `version` del caché de Django). Invalidar es solo subir la
+# versión: las entradas viejas quedan huérfanas y expiran solas.
+# Cada propiedad tiene su catálogo y su versión (primer {} de las claves).
+VERSION_KEY = 'reservations:catalog:{}:version'
+ROOMS_KEY = 'reservations:catalog:{}:rooms'
+PROMOTIONS_KEY = 'reservations:catalog:{}:promotions:{}'
+PROMOTION_INDEX_KEY = 'reservations:catalog:{}:promotion-index:{}'
+
+_counters = {'hits': 0, 'misses': 0}
+_counters_lock = threading.Lock()
+
+
+def _key(template, *args):
+    return template.format(properties.current(), *args)
+
+
+def _cache():
+    return caches[settings.CATALOG_CACHE_ALIAS]
+
+
+def _record(hit):
+    with _counters_lock:
+        _counters['hits' if hit else 'misses'] += 1
+
+
+def stats():
+    """
+    Aciertos y fallos del caché del catálogo en este proceso.
+    """
+    with _counters_lock:
+        return dict(_counters)
+
+
+def current_version():
+    cache = _cache()
+    version = cache.get(_key(VERSION_KEY))
+    if version is None:
+        # Se parte de un timestamp y no de 1: si el caché descarta la
+        # clave, la nueva versión nunca coincide con entradas antiguas.
+        cache.add(_key(VERSION_KEY), time.time_ns(), timeout=None)
+        version = cache.get(_key(VERSION_KEY))
+    return version
+
+
+async def acurrent_version():
+    cache = _cache()
+    version = await cache.aget(_key(VERSION_KEY))
+    if version is None:
+        await cache.aadd(_key(VERSION_KEY), time.time_ns(), timeout=None)
+        version = await cache.aget(_key(VERSION_KEY))
+    return version
+
+
+def invalidate():
+    cache = _cache()
+    try:
+        cache.incr(_key(VERSION_KEY))
+    except ValueError:
+        cache.add(_key(VERSION_KEY), time.time_ns(), timeout=None)
+
+
+def _cached(key, loader):
+    cache = _cache()
+    version = current_version()
+    value = cache.get(key, version=version)
+    if value is not None:
+        _record(True)
+        return value
+    _record(False)
+    value = loader()
+    cache.set(key, value, timeout=settings.CATALOG_CACHE_TIMEOUT, version=version)
+    return value
+
+
+async def _acached(key, loader):
+    cache = _cache()
+    version = await acurrent_version()
+    value = await cache.aget(key, version=version)
+    if value is not None:
+        _record(True)
+        return value
+    _record(False)
+    value = [obj async for obj in loader()]
+    await cache.aset(key, value, timeout=settings.CATALOG_CACHE_TIMEOUT, version=version)
+    return value
+
+
+def _rooms():
+    return Room.objects.select_related('promotion').order_by('room_number')
+
+
+def _active_promotions(on):
+    # Vigentes ese día y con cupo; promotions.redeem() invalida el catálogo
+    # cuando una se agota.
+    has_room = Q(max_uses__isnull=True) | Q(uses_count__lt=F('max_uses'))
+    return Promotion.objects.filter(has_room, start_date__lte=on, end_date__gte=on).order_by('code')
+
+
+def get_rooms():
+    """
+    Todas las habitaciones, con su promoción, ordenadas por número.
+    """
+    return _cached(_key(ROOMS_KEY), lambda: list(_rooms()))
+
+
+def get_active_promotions(on=None):
+    """
+    Promociones vigentes en la fecha indicada (hoy por defecto).
+    """
+    on = on or date.today()
+    return _cached(_key(PROMOTIONS_KEY, on.isoformat()), lambda: list(_active_promotions(on)))
+
+
+def get_promotion_index(on=None):
+    """
+    Las promociones vigentes en la fecha indicada, por código en mayúsculas.
+    """
+    on = on or date.today()
+    return _cached(
+        _key(PROMOTION_INDEX_KEY, on.isoformat()),
+        lambda: {promotion.code.upper(): promotion for promotion in get_active_promotions(on)},
+    )
+
+
+async def aget_rooms():
+    """
+    Variante async de get_rooms(), para las vistas async.
+    """
+    return await _acached(_key(ROOMS_KEY), _rooms)
+
+
+async def aget_active_promotions(on=None):
+    """
+    Variante async de get_active_promotions().
+    """
+    on = on or date.today()
+    return await _acached(_key(PROMOTIONS_KEY, on.isoformat()), lambda: _active_promotions(on))
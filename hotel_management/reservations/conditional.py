@@ -0,0 +1,91 @@
+import hashlib
+from datetime import date, datetime, time
+from functools import wraps
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib.messages import get_messages
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from . import versions
+
+
+def _validators(request, user, stamps, per_day):
+    """
+    Calcula (ETag, Last-Modified) de la respuesta. El ETag cubre los sellos
+    de versión, el usuario (las páginas muestran su nombre y sus permisos),
+    la URL con sus parámetros, el secreto CSRF del navegador y, en las
+    páginas que dependen de la fecha, el día de hoy.
+
+    El secreto CSRF cambia al iniciar sesión (rotate_token): sin él, quien
+    sale y vuelve a entrar recibiría un 304 y seguiría con la página vieja,
+    cuyos formularios llevan un token que ya no sirve y fallan con 403.
+    """
+    model_versions, last_modified = stamps
+    today = date.today() if per_day else None
+    # CSRF_COOKIE es el secreto sin enmascarar que dejó CsrfViewMiddleware;
+    # get_token() devuelve uno enmascarado distinto en cada llamada.
+    csrf_secret = request.META.get('CSRF_COOKIE', '')
+    key = f'{model_versions}|{user.pk}|{csrf_secret}|{request.get_full_path()}|{today}'
+    etag = quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+    if today is not None:
+        midnight = timezone.make_aware(datetime.combine(today, time.min))
+        last_modified = max(last_modified or midnight, midnight)
+    return etag, int(last_modified.timestamp()) if last_modified else None
+
+
+def _pending_messages(request):
+    # Una página con mensajes pendientes se genera siempre: si no, el mensaje
+    # quedaría para la petición siguiente.
+    return bool(len(get_messages(request)))
+
+
+def _finish(request, response, etag, last_modified):
+    if request.method in ('GET', 'HEAD'):
+        response.headers.setdefault('ETag', etag)
+        if last_modified and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+    # Que el navegador guarde la página pero la revalide en cada visita, y
+    # que ningún caché compartido la guarde.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def versioned(*models, per_day=False):
+    """
+    Decorador de vista para GET condicionales. El ETag y el Last-Modified
+    salen de los sellos de versión de `models` (versions.py), así que si
+    nada cambió la vista responde 304 con una sola consulta a la tabla de
+    sellos, sin leer las tablas de datos ni renderizar la plantilla.
+    Va debajo de login_required/permission_required. Sirve para vistas
+    sync y async.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or await sync_to_async(_pending_messages)(request):
+                    return await view(request, *args, **kwargs)
+                user = await request.auser()
+                stamps = await versions.astamps(*models)
+                etag, last_modified = _validators(request, user, stamps, per_day)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                    etag, last_modified = _validators(request, user, stamps, per_day)
+                return _finish(request, response, etag, last_modified)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or _pending_messages(request):
+                    return view(request, *args, **kwargs)
+                stamps = versions.stamps(*models)
+                etag, last_modified = _validators(request, request.user, stamps, per_day)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                    # Se recalcula: la plantilla ({% csrf_token %}) pudo crear
+                    # el secreto CSRF recién ahora, y va con la cookie nueva.
+                    etag, last_modified = _validators(request, request.user, stamps, per_day)
+                return _finish(request, response, etag, last_modified)
+        return inner
+    return decorator
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db import connections, router
+from .models import Reservation
+
+# SQLite no tiene restricciones de exclusión, así que el "no se cruzan dos
+# reservas de la misma habitación" se garantiza con triggers. Se instalan en
+# post_migrate porque SQLite reconstruye la tabla (y pierde sus triggers)
+# cada vez que una migración altera Reservation.
+OVERLAP_CHECK = """
+    SELECT RAISE(ABORT, 'reservation overlaps an existing stay for this room')
+    WHERE EXISTS (
+        SELECT 1 FROM reservations_reservation
+        WHERE room_id = NEW.room_id
+          AND check_out_date > NEW.check_in_date
+          AND check_in_date < NEW.check_out_date
+          {extra}
+    );
+"""
+
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS reservation_no_overlap_insert
+    BEFORE INSERT ON reservations_reservation
+    BEGIN {OVERLAP_CHECK.format(extra='')} END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS reservation_no_overlap_update
+    BEFORE UPDATE OF room_id, check_in_date, check_out_date ON reservations_reservation
+    BEGIN {OVERLAP_CHECK.format(extra='AND id <> NEW.id')} END;
+    """,
+]
+
+
+# Índice de texto completo de los huéspedes (ver search.py). Es una tabla
+# FTS5 de contenido externo: guarda solo el índice y lee los textos de
+# reservations_guest por rowid (= id). Los triggers la mantienen al día con
+# cualquier escritura, incluidos bulk_create y update(). unicode61 con
+# remove_diacritics hace que "gonzalez" encuentre "González"; los índices
+# de prefijos de 2 y 3 caracteres aceleran las búsquedas que se tipean.
+GUEST_FTS_TABLE = 'reservations_guest_fts'
+GUEST_FTS_FIELDS = ('first_name', 'last_name', 'email', 'phone_number', 'address')
+GUEST_FTS_COLUMNS = ', '.join(GUEST_FTS_FIELDS)
+NEW_GUEST = ', '.join(f'NEW.{field}' for field in GUEST_FTS_FIELDS)
+OLD_GUEST = ', '.join(f'OLD.{field}' for field in GUEST_FTS_FIELDS)
+
+SQLITE_GUEST_FTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {GUEST_FTS_TABLE} USING fts5(
+        {GUEST_FTS_COLUMNS},
+        content='reservations_guest', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS reservation_guest_fts_insert
+    AFTER INSERT ON reservations_guest
+    BEGIN
+        INSERT INTO {GUEST_FTS_TABLE} (rowid, {GUEST_FTS_COLUMNS})
+        VALUES (NEW.id, {NEW_GUEST});
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS reservation_guest_fts_delete
+    AFTER DELETE ON reservations_guest
+    BEGIN
+        INSERT INTO {GUEST_FTS_TABLE} ({GUEST_FTS_TABLE}, rowid, {GUEST_FTS_COLUMNS})
+        VALUES ('delete', OLD.id, {OLD_GUEST});
+    END;
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS reservation_guest_fts_update
+    AFTER UPDATE OF {GUEST_FTS_COLUMNS} ON reservations_guest
+    BEGIN
+        INSERT INTO {GUEST_FTS_TABLE} ({GUEST_FTS_TABLE}, rowid, {GUEST_FTS_COLUMNS})
+        VALUES ('delete', OLD.id, {OLD_GUEST});
+        INSERT INTO {GUEST_FTS_TABLE} (rowid, {GUEST_FTS_COLUMNS})
+        VALUES (NEW.id, {NEW_GUEST});
+    END;
+    """,
+]
+
+
+def install_sqlite_triggers(using='default', **kwargs):
+    """
+    Crea (si faltan) los triggers de integridad de la app en bases SQLite,
+    y el índice de texto completo de huéspedes. Si el índice no existía se
+    llena con los huéspedes actuales.
+    """
+    connection = connections[using]
+    # Con varias propiedades, la base compartida no tiene estas tablas.
+    if connection.vendor != 'sqlite' or not router.allow_migrate_model(using, Reservation):
+        return
+    with connection.cursor() as cursor:
+        for statement in SQLITE_TRIGGERS:
+            cursor.execute(statement)
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [GUEST_FTS_TABLE])
+        created = cursor.fetchone() is None
+        for statement in SQLITE_GUEST_FTS:
+            cursor.execute(statement)
+        if created:
+            cursor.execute(f"INSERT INTO {GUEST_FTS_TABLE} ({GUEST_FTS_TABLE}) VALUES ('rebuild')")
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    Aplica settings.SQLITE_PRAGMAS a cada conexión SQLite nueva (señal
+    connection_created). La conexión de lectura (READ_DATABASE_ALIAS)
+    además queda en query_only, así que cualquier escritura que el router
+    mande ahí por error falla en vez de competir por el candado.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        if connection.alias == getattr(settings, 'READ_DATABASE_ALIAS', None):
+            cursor.execute('PRAGMA query_only = ON')
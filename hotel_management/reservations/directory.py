@@ -0,0 +1,62 @@
+from django.db import transaction
+from . import properties
+from .models import Guest, GuestDirectory
+
+# Directorio compartido de huéspedes (GuestDirectory, en 'default'). Cada
+# propiedad guarda sus huéspedes en su base; el directorio copia solo lo
+# necesario para encontrarlos desde cualquier hotel. Lo mantienen las
+# señales de Guest al confirmar cada cambio, y rebuild() tras las cargas
+# masivas.
+FIELDS = ('user_id', 'first_name', 'last_name', 'email', 'phone_number')
+
+
+def _values(values):
+    # El correo va en minúsculas para buscarlo con igualdad, por su índice.
+    values = dict(zip(FIELDS, values))
+    values['email'] = values['email'].lower()
+    return values
+
+
+def record(guest):
+    GuestDirectory.objects.update_or_create(
+        property=guest.property,
+        guest_id=guest.pk,
+        defaults=_values(getattr(guest, field) for field in FIELDS),
+    )
+
+
+def forget(name, guest_id):
+    GuestDirectory.objects.filter(property=name, guest_id=guest_id).delete()
+
+
+def rebuild(name=None, batch_size=5000):
+    """
+    Rehace las entradas de una propiedad (la activa si no se indica) desde
+    su base. Devuelve cuántas quedaron.
+    """
+    name = name or properties.current()
+    with properties.using(name):
+        rows = Guest.objects.order_by('id').values_list('id', *FIELDS)
+        entries = [
+            GuestDirectory(property=name, guest_id=guest_id, **_values(values))
+            for guest_id, *values in rows.iterator(chunk_size=batch_size)
+        ]
+    with transaction.atomic():
+        GuestDirectory.objects.filter(property=name).delete()
+        GuestDirectory.objects.bulk_create(entries, batch_size=batch_size)
+    return len(entries)
+
+
+def lookup(email=None, phone_number=None, user=None):
+    """
+    Entradas de todas las propiedades con ese correo, teléfono o usuario,
+    en una consulta y sin tocar las bases de los hoteles.
+    """
+    entries = GuestDirectory.objects.none()
+    if email:
+        entries |= GuestDirectory.objects.filter(email=email.lower())
+    if phone_number:
+        entries |= GuestDirectory.objects.filter(phone_number=phone_number)
+    if user is not None:
+        entries |= GuestDirectory.objects.filter(user_id=user.pk)
+    return list(entries.order_by('property', 'guest_id'))
@@ -0,0 +1,105 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import Reservation, ReservationArchive
+
+# (lookup del ORM, nombre de la columna exportada)
+COLUMNS = (
+    ('id', 'reservation_id'),
+    ('check_in_date', 'check_in_date'),
+    ('check_out_date', 'check_out_date'),
+    ('total_price', 'total_price'),
+    ('guest_id', 'guest_id'),
+    ('guest__first_name', 'guest_first_name'),
+    ('guest__last_name', 'guest_last_name'),
+    ('guest__email', 'guest_email'),
+    ('room_id', 'room_id'),
+    ('room__room_number', 'room_number'),
+    ('room__room_type', 'room_type'),
+    ('promotion__code', 'promotion_code'),
+    ('promotion__discount_percentage', 'promotion_discount_percentage'),
+)
+HEADERS = [name for _, name in COLUMNS]
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+# Una planilla toma como fórmula la celda que empieza con alguno de estos
+# caracteres (inyección de CSV). Nombres, correos y direcciones los escribe
+# el huésped, así que esos textos salen con un apóstrofo adelante.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def export_rows(check_in_from=None, check_in_to=None, room=None, history=False, chunk_size=CHUNK_SIZE):
+    """
+    Itera las reservas como tuplas (en el orden de COLUMNS) con los datos
+    del huésped, la habitación y la promoción resueltos en la misma consulta.
+    Con history se suman las archivadas (UNION ALL). Usa iterator() para
+    leer del cursor por bloques sin cargar la tabla.
+    """
+    filters = {}
+    if check_in_from:
+        filters['check_in_date__gte'] = check_in_from
+    if check_in_to:
+        filters['check_in_date__lte'] = check_in_to
+    if room:
+        filters['room'] = room
+    lookups = [lookup for lookup, _ in COLUMNS]
+    queryset = Reservation.objects.filter(**filters).values_list(*lookups)
+    if history:
+        queryset = queryset.union(ReservationArchive.objects.filter(**filters).values_list(*lookups), all=True)
+    return queryset.order_by('id').iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """
+    Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADERS)
+    for row in rows:
+        yield writer.writerow([csv_cell(value) for value in row])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(HEADERS, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def buffered(lines, size=BUFFER_SIZE):
+    """
+    Junta líneas en bloques de ~64 KB para no emitir un chunk por fila.
+    """
+    buffer = []
+    length = 0
+    for line in lines:
+        buffer.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def render(rows, export_format):
+    """
+    Devuelve un generador de bloques de texto en el formato pedido.
+    """
+    lines = csv_lines(rows) if export_format == 'csv' else ndjson_lines(rows)
+    return buffered(lines)
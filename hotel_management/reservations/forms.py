@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from .models import Guest, Reservation, Room, Promotion
+from . import promotions
 
 class GuestForm(forms.ModelForm):
     class Meta:
@@ -39,6 +40,12 @@ class ReservationForm(forms.ModelForm):
             'promotion': 'Promoción',
         }
 
+    def clean_promotion(self):
+        promotion = self.cleaned_data.get('promotion')
+        if promotion is not None and promotions.lookup(promotion.code) is None:
+            raise forms.ValidationError('La promoción no está vigente o ya no tiene cupo.')
+        return promotion
+
 class RoomForm(forms.ModelForm):
     class Meta:
         model = Room
@@ -61,13 +68,15 @@ class RoomForm(forms.ModelForm):
 class PromotionForm(forms.ModelForm):
     class Meta:
         model = Promotion
-        fields = ['code', 'description', 'discount_percentage', 'start_date', 'end_date']
+        fields = ['code', 'description', 'discount_percentage', 'start_date', 'end_date', 'max_uses', 'max_uses_per_guest']
         widgets = {
             'code': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control'}),
             'discount_percentage': forms.NumberInput(attrs={'class': 'form-control'}),
             'start_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'end_date': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+            'max_uses': forms.NumberInput(attrs={'class': 'form-control'}),
+            'max_uses_per_guest': forms.NumberInput(attrs={'class': 'form-control'}),
         }
         labels = {
             'code': 'Código',
@@ -75,6 +84,12 @@ class PromotionForm(forms.ModelForm):
             'discount_percentage': 'Porcentaje de Descuento',
             'start_date': 'Fecha de Inicio',
             'end_date': 'Fecha de Fin',
+            'max_uses': 'Máximo de Canjes',
+            'max_uses_per_guest': 'Máximo de Canjes por Huésped',
+        }
+        help_texts = {
+            'max_uses': 'Vacío para no limitar.',
+            'max_uses_per_guest': 'Vacío para no limitar.',
         }
 
 class SignUpForm(UserCreationForm):
@@ -105,3 +120,83 @@ class SignUpForm(UserCreationForm):
 class LoginForm(AuthenticationForm):
     username = forms.CharField(max_length=254, widget=forms.TextInput(attrs={'autofocus': True, 'class': 'form-control'}))
     password = forms.CharField(label="Contraseña", strip=False, widget=forms.PasswordInput(attrs={'autocomplete': 'current-password', 'class': 'form-control'}))
+
+class AvailabilitySearchForm(forms.Form):
+    check_in_date = forms.DateField(label='Fecha de Entrada', widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    check_out_date = forms.DateField(label='Fecha de Salida', widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    room_type = forms.CharField(label='Tipo de Habitación', max_length=50, required=False, widget=forms.TextInput(attrs={'class': 'form-control'}))
+    max_price = forms.DecimalField(label='Precio Máximo por Noche', max_digits=6, decimal_places=2, min_value=0, required=False, widget=forms.NumberInput(attrs={'class': 'form-control'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in_date = cleaned_data.get('check_in_date')
+        check_out_date = cleaned_data.get('check_out_date')
+        if check_in_date and check_out_date and check_out_date <= check_in_date:
+            raise forms.ValidationError('La fecha de salida debe ser posterior a la fecha de entrada.')
+        return cleaned_data
+
+class RoomTypeBookingForm(forms.Form):
+    # Convive en la misma página con el formulario de búsqueda.
+    prefix = 'booking'
+
+    room_type = forms.ChoiceField(label='Tipo de Habitación', widget=forms.Select(attrs={'class': 'form-control'}))
+    check_in_date = forms.DateField(widget=forms.HiddenInput)
+    check_out_date = forms.DateField(widget=forms.HiddenInput)
+    promotion_code = forms.CharField(label='Código promocional', max_length=50, required=False, widget=forms.TextInput(attrs={'class': 'form-control'}))
+
+    def __init__(self, *args, room_types=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['room_type'].choices = [(room_type, room_type) for room_type in room_types]
+
+    def clean_promotion_code(self):
+        # Deja la promoción en cleaned_data['promotion'] (None sin código).
+        code = self.cleaned_data['promotion_code']
+        self.cleaned_data['promotion'] = None
+        if code:
+            self.cleaned_data['promotion'] = promotions.lookup(code)
+            if self.cleaned_data['promotion'] is None:
+                raise forms.ValidationError('El código no existe, no está vigente o ya no tiene cupo.')
+        return code
+
+    def clean(self):
+        cleaned_data = super().clean()
+        check_in_date = cleaned_data.get('check_in_date')
+        check_out_date = cleaned_data.get('check_out_date')
+        if check_in_date and check_out_date and check_out_date <= check_in_date:
+            raise forms.ValidationError('La fecha de salida debe ser posterior a la fecha de entrada.')
+        return cleaned_data
+
+class GuestSearchForm(forms.Form):
+    q = forms.CharField(label='Buscar', max_length=100, required=False, widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Nombre, correo o teléfono', 'type': 'search'}))
+
+class ReservationFilterForm(forms.Form):
+    SORT_CHOICES = [
+        ('-check_in_date', 'Entrada (más recientes primero)'),
+        ('check_in_date', 'Entrada (más antiguas primero)'),
+        ('-check_out_date', 'Salida (más recientes primero)'),
+        ('check_out_date', 'Salida (más antiguas primero)'),
+    ]
+
+    check_in_from = forms.DateField(label='Entrada desde', required=False, widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    check_in_to = forms.DateField(label='Entrada hasta', required=False, widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    room = forms.ModelChoiceField(label='Habitación', queryset=Room.objects.only('room_number', 'room_type').order_by('room_number'), required=False, widget=forms.Select(attrs={'class': 'form-control'}))
+    sort = forms.ChoiceField(label='Ordenar por', choices=SORT_CHOICES, required=False, widget=forms.Select(attrs={'class': 'form-control'}))
+    history = forms.BooleanField(label='Incluir archivadas', required=False, widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}))
+
+class OccupancyReportForm(forms.Form):
+    MAX_DAYS = 366
+
+    start = forms.DateField(label='Desde', widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    end = forms.DateField(label='Hasta', widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    room_type = forms.CharField(label='Tipo de Habitación', max_length=50, required=False, widget=forms.TextInput(attrs={'class': 'form-control'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('start')
+        end = cleaned_data.get('end')
+        if start and end:
+            if end < start:
+                raise forms.ValidationError('La fecha final debe ser igual o posterior a la inicial.')
+            if (end - start).days >= self.MAX_DAYS:
+                raise forms.ValidationError(f'El rango no puede superar {self.MAX_DAYS} días.')
+        return cleaned_data
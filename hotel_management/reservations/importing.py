@@ -0,0 +1,331 @@
+import csv
+import json
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from pathlib import Path
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, router, transaction
+from . import calendars, catalog, directory, inventory, live, rollups, versions
+from .models import Guest, Promotion, Reservation, Room
+from .pricing import quote_room
+
+TRUE_VALUES = {'1', 'true', 't', 'si', 'sí', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'f', 'no', 'n'}
+
+
+def read_records(path):
+    """
+    Lee un archivo CSV (con encabezado) o JSONL y produce (línea, dict).
+    """
+    path = Path(path)
+    if path.suffix.lower() in ('.jsonl', '.ndjson'):
+        with path.open(encoding='utf-8') as source:
+            for line_number, line in enumerate(source, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    yield line_number, exc
+                    continue
+                yield line_number, record
+    else:
+        with path.open(newline='', encoding='utf-8') as source:
+            reader = csv.DictReader(source)
+            for record in reader:
+                yield reader.line_num, record
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def clean_fields(model, record, names):
+    """
+    Convierte y valida los valores crudos con los campos del modelo.
+    Lanza ValidationError con todos los errores de la fila.
+    """
+    values = {}
+    errors = {}
+    for name in names:
+        field = model._meta.get_field(name)
+        raw = record.get(name)
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw in (None, ''):
+            raw = field.get_default() if field.has_default() else (None if field.null else '')
+        if field.get_internal_type() == 'BooleanField' and isinstance(raw, str):
+            lowered = raw.lower()
+            raw = True if lowered in TRUE_VALUES else False if lowered in FALSE_VALUES else raw
+        try:
+            values[name] = field.clean(raw, None)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    if errors:
+        raise ValidationError(errors)
+    return values
+
+
+class RoomStays:
+    """
+    Estadías por habitación como arreglos ordenados de ordinales de fecha.
+    Como las estadías de una habitación no se cruzan, basta mirar la que
+    empieza justo antes de la salida pedida para detectar un cruce. Con
+    load=False no se leen las reservas de la base (para las filas de un
+    lote que aún no se escriben).
+    """
+
+    def __init__(self, load=True):
+        self.load = load
+        self.starts = {}
+        self.ends = {}
+
+    def _stays(self, room_id):
+        if room_id not in self.starts:
+            starts, ends = array('l'), array('l')
+            if self.load:
+                stays = Reservation.objects.filter(room_id=room_id).order_by('check_in_date').values_list('check_in_date', 'check_out_date')
+                for check_in_date, check_out_date in stays.iterator():
+                    starts.append(check_in_date.toordinal())
+                    ends.append(check_out_date.toordinal())
+            self.starts[room_id], self.ends[room_id] = starts, ends
+        return self.starts[room_id], self.ends[room_id]
+
+    def free(self, room_id, check_in_date, check_out_date):
+        """
+        True si la estadía no se cruza con ninguna registrada.
+        """
+        starts, ends = self._stays(room_id)
+        index = bisect_left(starts, check_out_date.toordinal())
+        return not (index and ends[index - 1] > check_in_date.toordinal())
+
+    def add(self, room_id, check_in_date, check_out_date):
+        starts, ends = self._stays(room_id)
+        index = bisect_left(starts, check_out_date.toordinal())
+        starts.insert(index, check_in_date.toordinal())
+        ends.insert(index, check_out_date.toordinal())
+
+    def reserve(self, room_id, check_in_date, check_out_date):
+        """
+        Registra la estadía si la habitación está libre; devuelve False si se cruza.
+        """
+        if not self.free(room_id, check_in_date, check_out_date):
+            return False
+        self.add(room_id, check_in_date, check_out_date)
+        return True
+
+
+class HotelDataImporter:
+    """
+    Carga masiva de promociones, habitaciones, huéspedes y reservas.
+
+    Cada archivo se procesa en lotes: se validan las filas del lote, las
+    claves foráneas se resuelven con diccionarios en memoria (código de
+    promoción, número de habitación, correo del huésped) y las filas
+    válidas se escriben con bulk_create dentro de una transacción. Las
+    filas rechazadas se acumulan en `rejected` como (archivo, línea, motivo).
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.created = {}
+        self.rejected = []
+        self.promotions = {promotion.code: promotion for promotion in Promotion.objects.all()}
+        self.rooms = {room.room_number: room for room in Room.objects.select_related('promotion')}
+        self.guests = dict(Guest.objects.values_list('email', 'id'))
+        self.phone_numbers = set(Guest.objects.values_list('phone_number', flat=True))
+        self.usernames = set(User.objects.values_list('username', flat=True))
+        self.stays = RoomStays()
+
+    def reject(self, path, line, reason):
+        if isinstance(reason, ValidationError):
+            reason = '; '.join(f'{field}: {" ".join(messages)}' for field, messages in reason.message_dict.items())
+        self.rejected.append((str(path), line, str(reason)))
+
+    def _count(self, model, amount):
+        label = model._meta.verbose_name_plural
+        self.created[label] = self.created.get(label, 0) + amount
+
+    def _records(self, path):
+        for line, record in read_records(path):
+            if isinstance(record, Exception):
+                self.reject(path, line, record)
+            else:
+                yield line, record
+
+    def _write(self, path, model, rows):
+        """
+        Inserta un lote. Si la base rechaza el lote completo, reintenta
+        fila por fila para rechazar solo las que fallan.
+        """
+        using = router.db_for_write(model)
+        try:
+            with transaction.atomic(using=using):
+                model.objects.bulk_create([obj for _, obj in rows], batch_size=self.batch_size)
+            self._count(model, len(rows))
+            return [obj for _, obj in rows]
+        except IntegrityError:
+            pass
+        written = []
+        with transaction.atomic(using=using):
+            for line, obj in rows:
+                try:
+                    with transaction.atomic(using=using):
+                        obj.save(force_insert=True)
+                except IntegrityError as exc:
+                    self.reject(path, line, exc)
+                else:
+                    written.append(obj)
+        self._count(model, len(written))
+        return written
+
+    def import_promotions(self, path):
+        fields = ['code', 'description', 'discount_percentage', 'start_date', 'end_date']
+        for batch in batched(self._records(path), self.batch_size):
+            rows = []
+            for line, record in batch:
+                try:
+                    values = clean_fields(Promotion, record, fields)
+                except ValidationError as exc:
+                    self.reject(path, line, exc)
+                    continue
+                # bulk_create no pasa por Promotion.save(), que deja el código
+                # en mayúsculas.
+                values['code'] = values['code'].upper()
+                if values['code'] in self.promotions:
+                    self.reject(path, line, f'La promoción {values["code"]} ya existe.')
+                    continue
+                if values['end_date'] < values['start_date']:
+                    self.reject(path, line, 'La fecha de fin es anterior a la de inicio.')
+                    continue
+                promotion = Promotion(**values)
+                self.promotions[promotion.code] = promotion
+                rows.append((line, promotion))
+            self._write(path, Promotion, rows)
+        catalog.invalidate()
+        versions.bump(Promotion)
+
+    def import_rooms(self, path):
+        fields = ['room_number', 'room_type', 'description', 'price_per_night', 'available']
+        for batch in batched(self._records(path), self.batch_size):
+            rows = []
+            for line, record in batch:
+                try:
+                    values = clean_fields(Room, record, fields)
+                    promotion = self._promotion(record.get('promotion_code'))
+                except ValidationError as exc:
+                    self.reject(path, line, exc)
+                    continue
+                if values['room_number'] in self.rooms:
+                    self.reject(path, line, f'La habitación {values["room_number"]} ya existe.')
+                    continue
+                room = Room(promotion=promotion, **values)
+                self.rooms[room.room_number] = room
+                rows.append((line, room))
+            self._write(path, Room, rows)
+        catalog.invalidate()
+        versions.bump(Room)
+
+    def import_guests(self, path):
+        fields = ['first_name', 'last_name', 'email', 'phone_number', 'address']
+        for batch in batched(self._records(path), self.batch_size):
+            rows = []
+            for line, record in batch:
+                try:
+                    values = clean_fields(Guest, record, fields)
+                except ValidationError as exc:
+                    self.reject(path, line, exc)
+                    continue
+                username = (record.get('username') or values['email']).strip()
+                if values['email'] in self.guests or values['phone_number'] in self.phone_numbers or username in self.usernames:
+                    self.reject(path, line, 'Ya existe un huésped o usuario con ese correo, teléfono o nombre de usuario.')
+                    continue
+                user = User(username=username, email=values['email'], first_name=values['first_name'], last_name=values['last_name'])
+                if record.get('password'):
+                    # Cada hash es PBKDF2 con las iteraciones de Django (~0,3 s
+                    # por fila): un archivo con contraseñas se importa a unas
+                    # pocas filas por segundo. Conviene dejarlas vacías y que
+                    # cada huésped restablezca la suya.
+                    user.set_password(record['password'])
+                else:
+                    # Sin contraseña la cuenta queda sin acceso hasta que se
+                    # restablezca; no se calcula ningún hash.
+                    user.set_unusable_password()
+                self.guests[values['email']] = None
+                self.phone_numbers.add(values['phone_number'])
+                self.usernames.add(username)
+                rows.append((line, user, Guest(**values)))
+
+            with transaction.atomic():
+                User.objects.bulk_create([user for _, user, _ in rows], batch_size=self.batch_size)
+                for _, user, guest in rows:
+                    guest.user = user
+                written = self._write(path, Guest, [(line, guest) for line, _, guest in rows])
+                orphans = {user.pk for _, user, _ in rows} - {guest.user_id for guest in written}
+                if orphans:
+                    User.objects.filter(pk__in=orphans).delete()
+            for guest in written:
+                self.guests[guest.email] = guest.pk
+        versions.bump(Guest)
+        directory.rebuild()
+
+    def import_reservations(self, path):
+        fields = ['check_in_date', 'check_out_date', 'total_price']
+        first_day = last_day = None
+        for batch in batched(self._records(path), self.batch_size):
+            rows = []
+            pending = RoomStays(load=False)
+            for line, record in batch:
+                try:
+                    values = clean_fields(Reservation, record, fields)
+                    promotion = self._promotion(record.get('promotion_code'))
+                except ValidationError as exc:
+                    self.reject(path, line, exc)
+                    continue
+                room = self.rooms.get((record.get('room_number') or '').strip())
+                guest_id = self.guests.get((record.get('guest_email') or '').strip())
+                if room is None or room.pk is None:
+                    self.reject(path, line, 'Habitación desconocida.')
+                    continue
+                if guest_id is None:
+                    self.reject(path, line, 'Huésped desconocido.')
+                    continue
+                if values['check_out_date'] <= values['check_in_date']:
+                    self.reject(path, line, 'La fecha de salida debe ser posterior a la fecha de entrada.')
+                    continue
+                # Las estadías del lote se registran en self.stays solo una vez
+                # escritas: si el trigger rechaza una fila, no queda bloqueando
+                # la habitación.
+                free = self.stays.free(room.pk, values['check_in_date'], values['check_out_date'])
+                if not (free and pending.reserve(room.pk, values['check_in_date'], values['check_out_date'])):
+                    self.reject(path, line, 'La habitación ya está reservada para esas fechas.')
+                    continue
+                if values['total_price'] is None:
+                    values['total_price'] = quote_room(room, values['check_in_date'], values['check_out_date'], promotion=promotion)
+                rows.append((line, Reservation(room=room, guest_id=guest_id, promotion=promotion, **values)))
+            for reservation in self._write(path, Reservation, rows):
+                self.stays.add(reservation.room_id, reservation.check_in_date, reservation.check_out_date)
+                first_day = min(first_day or reservation.check_in_date, reservation.check_in_date)
+                last_day = max(last_day or reservation.check_out_date, reservation.check_out_date)
+        if first_day is not None:
+            # bulk_create no dispara las señales que mantienen el rollup, el
+            # inventario, los sellos de versión, los feeds .ics y la disponibilidad
+            # en vivo.
+            rollups.rebuild(first_day, last_day)
+            inventory.rebuild(first_day, last_day)
+            versions.bump(Reservation)
+            calendars.touch_all()
+            live.publish_reset()
+
+    def _promotion(self, code):
+        code = (code or '').strip()
+        if not code:
+            return None
+        promotion = self.promotions.get(code.upper())
+        if promotion is None or promotion.pk is None:
+            raise ValidationError({'promotion_code': [f'Promoción desconocida: {code}']})
+        return promotion
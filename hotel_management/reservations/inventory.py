@@ -0,0 +1,98 @@
+from collections import Counter, defaultdict
+from django.db import router, transaction
+from django.db.models import F, Max
+from . import archive, catalog
+from .models import RoomTypeInventory
+from .pricing import stay_nights
+
+
+def apply_stay(room_type, check_in_date, check_out_date, sign=1):
+    """
+    Suma (sign=1) o resta (sign=-1) una estadía a los contadores de su tipo
+    de habitación: asegurar las filas de las noches y un UPDATE con F().
+    """
+    nights = stay_nights(check_in_date, check_out_date)
+    if not nights:
+        return
+    RoomTypeInventory.objects.bulk_create(
+        [RoomTypeInventory(room_type=room_type, date=night) for night in nights],
+        ignore_conflicts=True,
+    )
+    RoomTypeInventory.objects.filter(
+        room_type=room_type, date__gte=check_in_date, date__lt=check_out_date,
+    ).update(booked=F('booked') + sign)
+
+
+def capacity(rooms):
+    """
+    Habitaciones habilitadas por tipo, a partir de una lista del catálogo.
+    """
+    return Counter(room.room_type for room in rooms if room.available)
+
+
+def _peak_booked(check_in_date, check_out_date, room_types):
+    # El índice único (room_type, date) deja cada tipo como un rango de
+    # `noches` filas: el costo depende del largo de la estadía, no del historial.
+    return RoomTypeInventory.objects.filter(
+        room_type__in=room_types, date__gte=check_in_date, date__lt=check_out_date,
+    ).values('room_type').annotate(peak=Max('booked')).order_by().values_list('room_type', 'peak')
+
+
+def _vacancies(totals, peaks):
+    return {room_type: total - peaks.get(room_type, 0) for room_type, total in sorted(totals.items())}
+
+
+def vacancies(check_in_date, check_out_date, room_type=None):
+    """
+    Habitaciones libres por tipo en la noche más ocupada del rango.
+
+    Es una cota superior: que cada noche tenga una habitación libre no
+    garantiza que sea la misma todas las noches. La habitación concreta
+    se busca después, al reservar (booking.book_room_type).
+    """
+    totals = capacity(catalog.get_rooms())
+    if room_type:
+        totals = {room_type: totals.get(room_type, 0)}
+    return _vacancies(totals, dict(_peak_booked(check_in_date, check_out_date, list(totals))))
+
+
+async def avacancies(check_in_date, check_out_date, room_type=None):
+    """
+    Variante async de vacancies().
+    """
+    totals = capacity(await catalog.aget_rooms())
+    if room_type:
+        totals = {room_type: totals.get(room_type, 0)}
+    peaks = {key: peak async for key, peak in _peak_booked(check_in_date, check_out_date, list(totals))}
+    return _vacancies(totals, peaks)
+
+
+def rebuild(start=None, end=None, batch_size=1000):
+    """
+    Recalcula los contadores desde las reservas, activas y archivadas,
+    para las noches en [start, end] (todo el historial si no se indican). Devuelve la
+    cantidad de filas escritas.
+    """
+    with transaction.atomic(using=router.db_for_write(RoomTypeInventory)):
+        filters = {}
+        stale = RoomTypeInventory.objects.all()
+        if start is not None:
+            filters['check_out_date__gt'] = start
+            stale = stale.filter(date__gte=start)
+        if end is not None:
+            filters['check_in_date__lte'] = end
+            stale = stale.filter(date__lte=end)
+
+        booked = defaultdict(int)
+        stays = archive.stays(('room__room_type', 'check_in_date', 'check_out_date'), **filters)
+        for room_type, check_in_date, check_out_date in stays.iterator(chunk_size=batch_size):
+            for night in stay_nights(check_in_date, check_out_date):
+                if (start is None or night >= start) and (end is None or night <= end):
+                    booked[room_type, night] += 1
+
+        stale.delete()
+        RoomTypeInventory.objects.bulk_create(
+            [RoomTypeInventory(room_type=room_type, date=night, booked=count) for (room_type, night), count in booked.items()],
+            batch_size=batch_size,
+        )
+    return len(booked)
@@ -0,0 +1,194 @@
+import logging
+import multiprocessing
+import traceback
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from . import properties, worker
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Tareas registradas con @task, por nombre. Un Job guarda solo el nombre y
+# el payload (JSON), así el worker puede ser otro proceso.
+TASKS = {}
+# Espera antes del reintento n: RETRY_BASE_SECONDS * 2 ** (n - 1), con tope.
+RETRY_BASE_SECONDS = 10
+RETRY_MAX_SECONDS = 60 * 60
+
+
+class Task:
+    def __init__(self, func, name, priority, max_attempts):
+        self.func = func
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, **payload):
+        return self.func(**payload)
+
+
+def task(name, priority=0, max_attempts=5):
+    """
+    Registra una función como tarea encolable. La función recibe el
+    payload como argumentos con nombre y debe tolerar ejecutarse más de una
+    vez: si el worker cae después de correrla pero antes de marcarla como
+    terminada, se reintenta.
+    """
+    def register(func):
+        TASKS[name] = Task(func, name, priority, max_attempts)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, key=None, priority=None, delay=None):
+    """
+    Encola la tarea `name`. Dentro de una transacción el Job se guarda con
+    ella: el worker no lo ve hasta el commit y, si hay rollback, desaparece
+    junto con lo demás.
+
+    Con `key`, un segundo enqueue con la misma clave no crea otro Job y
+    devuelve el existente.
+    """
+    if name not in TASKS:
+        raise ValueError(f'Tarea desconocida: {name}')
+    registered = TASKS[name]
+    job = Job(
+        task=name,
+        payload=payload or {},
+        idempotency_key=key,
+        priority=registered.priority if priority is None else priority,
+        max_attempts=registered.max_attempts,
+        run_at=timezone.now() + (delay or timedelta()),
+    )
+    try:
+        with transaction.atomic(using=router.db_for_write(Job)):
+            job.save()
+    except IntegrityError:
+        if key is None:
+            raise
+        return Job.objects.get(idempotency_key=key)
+    return job
+
+
+def enqueue_many(name, items):
+    """
+    Encola la tarea `name` una vez por cada par (payload, key) con un
+    bulk_create, para los procesos masivos. Las claves ya encoladas se
+    ignoran.
+    """
+    if name not in TASKS:
+        raise ValueError(f'Tarea desconocida: {name}')
+    registered = TASKS[name]
+    now = timezone.now()
+    Job.objects.bulk_create([
+        Job(
+            task=name, payload=payload, idempotency_key=key, priority=registered.priority,
+            max_attempts=registered.max_attempts, run_at=now,
+        )
+        for payload, key in items
+    ], ignore_conflicts=True)
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+def claim(limit):
+    """
+    Toma hasta `limit` trabajos listos, los de mayor prioridad primero, y
+    los marca como en ejecución por JOB_LEASE_SECONDS. Cada uno se toma con
+    un UPDATE condicional sobre su estado, así dos workers nunca corren el
+    mismo trabajo (no hace falta SELECT ... FOR UPDATE SKIP LOCKED, que
+    SQLite no tiene).
+    """
+    now = timezone.now()
+    ready = Q(status=Job.PENDING, run_at__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+    candidates = Job.objects.filter(ready).order_by('-priority', 'run_at', 'id').values_list('id', 'status')[:limit * 2]
+    lease = now + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    claimed = []
+    for job_id, status in candidates:
+        taken = Job.objects.filter(Q(status=Job.PENDING) | Q(locked_until__lt=now), pk=job_id, status=status).update(
+            status=Job.RUNNING, locked_until=lease,
+        )
+        if taken:
+            claimed.append(job_id)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def execute(job_id):
+    """
+    Corre un trabajo ya tomado y guarda el resultado: terminado, pendiente
+    de reintento o fallido cuando agotó sus intentos. Devuelve el estado.
+    """
+    job = Job.objects.get(pk=job_id)
+    job.attempts += 1
+    try:
+        registered = TASKS[job.task]
+        registered(**job.payload)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+            logger.error('Trabajo %s falló definitivamente', job, extra={'job_id': job.pk})
+        else:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+            logger.warning('Trabajo %s falló; reintento %s', job, job.attempts, extra={'job_id': job.pk})
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+    job.locked_until = None
+    job.save(update_fields=['attempts', 'status', 'run_at', 'locked_until', 'last_error', 'finished_at'])
+    return job.status
+
+
+def execute_in_worker(job_id, name):
+    # Cada hilo o proceso del pool tiene su conexión; se cierra si venció
+    # o quedó rota, como al final de una petición. Los hilos del pool no
+    # heredan la propiedad activa: llega como argumento.
+    close_old_connections()
+    try:
+        with properties.using(name):
+            return execute(job_id)
+    finally:
+        close_old_connections()
+
+
+def make_executor(workers, processes=False):
+    """
+    Pool para run_pending(): hilos por defecto (los trabajos esperan sobre
+    todo a la red o a la base) o procesos.
+    """
+    if processes:
+        # spawn y no fork: un hijo no debe heredar las conexiones abiertas
+        # del padre. Parte de cero y configura Django por su cuenta.
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=worker.setup)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def run_pending(limit=100, executor=None):
+    """
+    Toma hasta `limit` trabajos de la cola de la propiedad activa (cada
+    hotel tiene la suya, en su base) y los corre en `executor` (o aquí
+    mismo si es None). Devuelve {estado: cantidad}.
+    """
+    job_ids = claim(limit)
+    name = properties.current()
+    if executor is None:
+        results = [execute(job_id) for job_id in job_ids]
+    elif isinstance(executor, ProcessPoolExecutor):
+        results = list(executor.map(worker.execute, job_ids, repeat(name)))
+    else:
+        results = list(executor.map(execute_in_worker, job_ids, repeat(name)))
+    counts = {}
+    for status in results:
+        counts[status] = counts.get(status, 0) + 1
+    return counts
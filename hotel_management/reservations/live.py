@@ -0,0 +1,260 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+import weakref
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from . import properties
+from .models import LiveEvent
+
+# Cambios de disponibilidad y precio empujados al navegador con
+# server-sent events (async_views.live_availability), para que el tablero no
+# tenga que recargarse para saber si una habitación sigue libre.
+#
+# Las señales publican cada cambio de Room y Reservation al confirmarse la
+# transacción. Cada proceso ASGI tiene un Hub por bucle de eventos: una sola
+# tarea lee del backend y reparte a los suscriptores, que no consultan la
+# base. Un suscriptor es una lista acotada y un asyncio.Event; una conexión
+# que no alcanza a leer recibe un evento `reset` en vez de acumular memoria.
+#
+# El backend decide cómo llega un evento a cada proceso (LIVE_EVENTS_BACKEND):
+# - LocalBackend: dentro del mismo proceso, sin broker.
+# - DatabaseBackend: por la tabla LiveEvent, para varios procesos.
+# Un backend sobre un broker solo necesita publish(event), que puede
+# llamarse desde cualquier hilo, y listen(), un generador async.
+
+
+class LocalBackend:
+    """
+    Reparte los eventos dentro del proceso. Basta con un solo proceso ASGI
+    (y en desarrollo y pruebas); con varios, cada uno vería solo lo que él
+    mismo publica.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def publish(self, event):
+        event = {**event, 'id': next(self._ids)}
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            loop, queue = listener
+            # Las señales corren en el hilo de la petición, no en el bucle.
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # El bucle ya se cerró sin que listen() llegara a retirarse
+                # (cliente desconectado). La reserva ya se confirmó: se
+                # descarta el oyente y se sigue con los demás.
+                self._forget(listener)
+
+    def _forget(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    async def listen(self):
+        listener = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._listeners.append(listener)
+        try:
+            while True:
+                yield await listener[1].get()
+        finally:
+            self._forget(listener)
+
+
+class DatabaseBackend:
+    """
+    Los eventos pasan por la tabla LiveEvent: cada proceso la consulta cada
+    LIVE_POLL_SECONDS mientras tenga suscriptores (una consulta por
+    proceso, no por conexión). Reemplaza a un broker cuando hay varios
+    procesos y no hay uno disponible.
+    """
+
+    def publish(self, event):
+        LiveEvent.objects.create(data=event)
+
+    async def listen(self):
+        last = (await LiveEvent.objects.aaggregate(last=Max('id')))['last'] or 0
+        pruned = time.monotonic()
+        while True:
+            await asyncio.sleep(settings.LIVE_POLL_SECONDS)
+            async for event_id, data in LiveEvent.objects.filter(id__gt=last).order_by('id').values_list('id', 'data'):
+                last = event_id
+                yield {**data, 'id': event_id}
+            if time.monotonic() - pruned > settings.LIVE_EVENT_RETENTION_SECONDS:
+                pruned = time.monotonic()
+                limit = timezone.now() - timedelta(seconds=settings.LIVE_EVENT_RETENTION_SECONDS)
+                await LiveEvent.objects.filter(created_at__lt=limit).adelete()
+
+
+_backends = {}
+
+
+def get_backend():
+    path = settings.LIVE_EVENTS_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def publish(event):
+    """
+    Publica el evento cuando se confirme la transacción en curso en la base
+    de la propiedad (o ya mismo, fuera de una): nunca se anuncia un cambio
+    que luego se deshace. El evento lleva su propiedad y solo llega a los
+    suscriptores de esa propiedad.
+    """
+    name = properties.current()
+    event = {**event, 'property': name}
+    transaction.on_commit(lambda: get_backend().publish(event), using=properties.database(name))
+
+
+def publish_room(room, deleted=False):
+    publish({
+        'type': 'room',
+        'room': room.pk,
+        'room_number': room.room_number,
+        'room_type': room.room_type,
+        'price_per_night': str(room.price_per_night),
+        'available': room.available and not deleted,
+    })
+
+
+def publish_stay(room_id, check_in_date, check_out_date, booked):
+    # Solo la habitación y las fechas: nada del huésped.
+    publish({
+        'type': 'stay',
+        'room': room_id,
+        'check_in_date': check_in_date.isoformat(),
+        'check_out_date': check_out_date.isoformat(),
+        'booked': booked,
+    })
+
+
+def publish_reset():
+    """
+    Para las cargas masivas: los clientes vuelven a pedir el tablero.
+    """
+    publish({'type': 'reset'})
+
+
+def format_event(event):
+    lines = [f'event: {event["type"]}', f'data: {json.dumps(event)}']
+    if event.get('id') is not None:
+        lines.insert(0, f'id: {event["id"]}')
+    return '\n'.join(lines) + '\n\n'
+
+
+RESET = format_event({'type': 'reset'})
+
+
+class Subscriber:
+    # Los mensajes llegan ya formateados: se serializa una vez por evento y
+    # no una vez por conexión.
+    __slots__ = ('events', 'ready', 'size')
+
+    def __init__(self, size):
+        self.events = []
+        self.ready = asyncio.Event()
+        self.size = size
+
+    def push(self, message):
+        if len(self.events) >= self.size:
+            # Se quedó atrás: lo pendiente se cambia por un reset.
+            self.events = [RESET]
+        else:
+            self.events.append(message)
+        self.ready.set()
+
+    async def next_events(self, timeout):
+        """
+        Los mensajes pendientes, o [] si pasan `timeout` segundos sin ninguno.
+        """
+        if not self.events:
+            # Un temporizador que despierta la espera, y no wait_for(), que
+            # crea una tarea más por conexión en cada vuelta.
+            timer = asyncio.get_running_loop().call_later(timeout, self.ready.set)
+            try:
+                await self.ready.wait()
+            finally:
+                timer.cancel()
+        events, self.events = self.events, []
+        self.ready.clear()
+        return events
+
+
+class Hub:
+    """
+    Reparte los eventos del backend a los suscriptores de un bucle, según
+    su propiedad. La tarea que lee del backend corre solo mientras haya
+    suscriptores.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.subscribers = defaultdict(set)
+        self.task = None
+
+    def subscribe(self, name):
+        subscriber = Subscriber(settings.LIVE_QUEUE_SIZE)
+        self.subscribers[name].add(subscriber)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return subscriber
+
+    def unsubscribe(self, name, subscriber):
+        self.subscribers[name].discard(subscriber)
+        if not any(self.subscribers.values()) and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def run(self):
+        async for event in self.backend.listen():
+            subscribers = self.subscribers.get(event.get('property'))
+            if subscribers:
+                message = format_event(event)
+                for subscriber in list(subscribers):
+                    subscriber.push(message)
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None or hub.backend is not get_backend():
+        hub = _hubs[loop] = Hub(get_backend())
+    return hub
+
+
+async def stream(name=None):
+    """
+    Cuerpo de la respuesta text/event-stream con los cambios de la
+    propiedad `name` (la activa si no se indica). Sin eventos manda un
+    comentario cada LIVE_KEEPALIVE_SECONDS para que los proxies no corten
+    la conexión. Al desconectarse el cliente, Django cancela el generador y
+    el suscriptor se retira.
+    """
+    name = name or properties.current()
+    hub = get_hub()
+    subscriber = hub.subscribe(name)
+    try:
+        yield f'retry: {settings.LIVE_RETRY_MILLISECONDS}\n\n'
+        while True:
+            events = await subscriber.next_events(settings.LIVE_KEEPALIVE_SECONDS)
+            yield ''.join(events) if events else ': keepalive\n\n'
+    finally:
+        hub.unsubscribe(name, subscriber)
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from reservations import archive
+from reservations.models import Reservation
+from reservations.properties import PropertyCommandMixin
+
+
+class Command(PropertyCommandMixin, BaseCommand):
+    help = (
+        'Mueve a la tabla de archivo las reservas cuya salida fue hace más de --days días '
+        '(RESERVATION_ARCHIVE_AFTER_DAYS por defecto), por lotes. Cada lote se confirma por '
+        'separado, así que se puede interrumpir y volver a correr.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Antigüedad mínima de la salida, en días.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Solo cuenta las reservas que se moverían.')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError('--days no puede ser negativo.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size debe ser mayor que cero.')
+        before = archive.cutoff(days=options['days'])
+        if options['dry_run']:
+            count = Reservation.objects.filter(check_out_date__lt=before).count()
+            self.stdout.write(f'{count} reservas con salida anterior a {before} se archivarían.')
+            return
+        started = time.perf_counter()
+        moved = archive.archive(before, batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'{moved} reservas con salida anterior a {before} archivadas ({elapsed:.1f} s).'))
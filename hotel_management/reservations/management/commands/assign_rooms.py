@@ -0,0 +1,56 @@
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from django.utils.dateparse import parse_date
+from reservations import assignment
+from reservations.properties import PropertyCommandMixin
+
+
+class Command(PropertyCommandMixin, BaseCommand):
+    help = (
+        'Reasigna habitaciones dentro de cada tipo para las reservas movibles de una ventana de '
+        'fechas, juntando las estadías para no dejar huecos de una o dos noches. Por defecto solo '
+        'muestra el informe; con --apply guarda los cambios.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='Primera noche de la ventana (AAAA-MM-DD). Por defecto, mañana.')
+        parser.add_argument('--days', type=int, default=90, help='Largo de la ventana en noches.')
+        parser.add_argument('--room-type', help='Solo este tipo de habitación.')
+        parser.add_argument('--apply', action='store_true', help='Guarda la nueva asignación.')
+
+    def handle(self, *args, **options):
+        start = date.today() + timedelta(days=1)
+        if options['start']:
+            start = parse_date(options['start'])
+            if start is None:
+                raise CommandError(f'Fecha inválida: {options["start"]}')
+        if options['days'] < 1:
+            raise CommandError('--days debe ser mayor que cero.')
+        started = time.perf_counter()
+        result = assignment.plan(start, start + timedelta(days=options['days']), room_type=options['room_type'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f'Ventana {result.start} a {result.end} ({elapsed:.2f} s)')
+        for room_type, summary in result.room_types.items():
+            before, after = summary['before'], summary['after']
+            note = ' (sin cambios)' if summary['skipped'] else ''
+            self.stdout.write(
+                f'{room_type:<12} habitaciones {summary["rooms"]:>4}  estadías {summary["stays"]:>6}  '
+                f'movibles {summary["movable"]:>6}  movidas {summary["moves"]:>5}  '
+                f'huecos cortos {before["short_gaps"]:>5} -> {after["short_gaps"]:<5} '
+                f'({before["short_gap_nights"]} -> {after["short_gap_nights"]} noches)  '
+                f'habitaciones libres {before["empty_rooms"]} -> {after["empty_rooms"]}{note}'
+            )
+
+        if not options['apply']:
+            self.stdout.write(f'{len(result.moves)} reservas cambiarían de habitación. Usa --apply para guardarlas.')
+            return
+        try:
+            moved = assignment.apply_plan(result)
+        except IntegrityError as exc:
+            raise CommandError(f'Las reservas cambiaron mientras se calculaba el plan; no se movió nada ({exc}).')
+        self.stdout.write(self.style.SUCCESS(f'{moved} reservas cambiaron de habitación; se avisó a cada huésped.'))
+        if result.skipped:
+            self.stdout.write(self.style.WARNING(f'{result.skipped} reservas cambiaron después del plan y quedaron como estaban.'))
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.urls import reverse
+from reservations import benchmarking
+from reservations.models import Room
+
+MODES = {
+    'wsgi': 'hotel_management.urls',
+    'asgi': 'hotel_management.asgi_urls',
+}
+
+
+def split(total, parts):
+    return [total // parts + (1 if index < total % parts else 0) for index in range(parts)]
+
+
+class Command(benchmarking.BenchmarkCommandMixin, BaseCommand):
+    help = (
+        'Compara las vistas de lectura servidas por WSGI (vistas sync, hilos de trabajo '
+        'limitados) y por ASGI (vistas async en el bucle de eventos) con muchos clientes '
+        'concurrentes, llamando directamente a los handlers de Django.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Peticiones por endpoint y modo.')
+        parser.add_argument('--clients', type=int, default=64, help='Clientes concurrentes.')
+        parser.add_argument('--threads', type=int, default=8, help='Hilos de trabajo del servidor WSGI.')
+        parser.add_argument('--db-latency-ms', type=float, default=0, help='Demora artificial por consulta, para simular una base lenta.')
+        parser.add_argument('--modes', nargs='*', choices=sorted(MODES), default=sorted(MODES, reverse=True))
+        parser.add_argument('--output', help='Archivo JSON donde guardar los resultados.')
+
+    def handle(self, *args, **options):
+        if not Room.objects.exists():
+            raise CommandError('No hay habitaciones. Ejecuta primero manage.py seed_data.')
+        staff, guest_user = benchmarking.bench_users()
+        client = Client()
+        client.force_login(guest_user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        today = date.today()
+        endpoints = {
+            'user_dashboard': (reverse('user_dashboard'), ''),
+            'user_reservations': (reverse('user_reservations'), ''),
+            'room_search': (reverse('room_search'), urlencode({
+                'check_in_date': today + timedelta(days=7),
+                'check_out_date': today + timedelta(days=10),
+            })),
+        }
+
+        delay = options['db_latency_ms'] / 1000
+        slow_database = self.slow_database(delay)
+        if delay:
+            connection_created.connect(slow_database)
+        results = {'environment': benchmarking.environment(), 'options': {
+            key: options[key] for key in ('requests', 'clients', 'threads', 'db_latency_ms')
+        }, 'endpoints': {}}
+        try:
+            for name, (path, query) in endpoints.items():
+                results['endpoints'][name] = {}
+                for mode in options['modes']:
+                    with override_settings(ROOT_URLCONF=MODES[mode], ALLOWED_HOSTS=['testserver'], SLOW_REQUEST_THRESHOLD_MS=None):
+                        if mode == 'wsgi':
+                            latencies, statuses, elapsed = self.run_wsgi(path, query, cookie, options)
+                        else:
+                            latencies, statuses, elapsed = asyncio.run(self.run_asgi(path, query, cookie, options))
+                    summary = benchmarking.summarize(latencies, statuses=statuses)
+                    summary['throughput_rps'] = round(len(latencies) / elapsed, 1)
+                    results['endpoints'][name][mode] = summary
+                    self.stdout.write(
+                        f'{name:<20} {mode:<5} {summary["throughput_rps"]:>8.1f} req/s  '
+                        f'p50 {summary["p50_ms"]:>9.2f} ms  p95 {summary["p95_ms"]:>9.2f} ms  '
+                        f'p99 {summary["p99_ms"]:>9.2f} ms  {summary["status_codes"]}'
+                    )
+        finally:
+            connection_created.disconnect(slow_database)
+
+        if options['output']:
+            benchmarking.write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f'Resultados guardados en {options["output"]}'))
+
+    @staticmethod
+    def slow_database(delay):
+        def wrapper(execute, sql, params, many, context):
+            time.sleep(delay)
+            return execute(sql, params, many, context)
+
+        def install(sender, connection, **kwargs):
+            # Al principio de la lista: connection.execute_wrapper() saca
+            # siempre el último, y así no se lleva este por error.
+            if wrapper not in connection.execute_wrappers:
+                connection.execute_wrappers.insert(0, wrapper)
+        return install
+
+    def run_wsgi(self, path, query, cookie, options):
+        handler = WSGIHandler()
+        workers = threading.BoundedSemaphore(options['threads'])
+        latencies, statuses = [], []
+        lock = threading.Lock()
+
+        def client(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                # El servidor solo atiende `threads` peticiones a la vez; el
+                # resto espera en cola y esa espera cuenta en la latencia.
+                with workers:
+                    status = benchmarking.wsgi_get(handler, path, query, cookie)
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    statuses.append(status)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['clients']) as pool:
+            list(pool.map(client, split(options['requests'], options['clients'])))
+        return latencies, statuses, time.perf_counter() - started
+
+    async def run_asgi(self, path, query, cookie, options):
+        application = ASGIHandler()
+        latencies, statuses = [], []
+
+        async def client(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                status = await benchmarking.asgi_get(application, path, query, cookie)
+                latencies.append(time.perf_counter() - started)
+                statuses.append(status)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(count) for count in split(options['requests'], options['clients'])))
+        return latencies, statuses, time.perf_counter() - started
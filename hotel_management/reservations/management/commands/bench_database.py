@@ -0,0 +1,161 @@
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections
+from reservations import benchmarking
+from reservations.availability import available_rooms
+from reservations.booking import RoomUnavailable, book_room
+from reservations.models import Guest, Room
+
+PROFILES = ('default', 'production')
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide lecturas y escrituras concurrentes (búsqueda de disponibilidad y book_room) con '
+        'el perfil de base por defecto y con HOTEL_DB_PROFILE=production. Cada perfil corre en '
+        'su propio proceso sobre una copia de la base configurada; la base original no se toca.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help='Hilos que leen.')
+        parser.add_argument('--writers', type=int, default=4, help='Hilos que reservan.')
+        parser.add_argument('--duration', type=float, default=10, help='Segundos por perfil.')
+        parser.add_argument('--profiles', nargs='*', choices=PROFILES, default=list(PROFILES))
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Archivo JSON donde guardar los resultados.')
+        parser.add_argument(
+            '--run', action='store_true',
+            help='Corre la carga directamente sobre la base configurada (la modifica). Lo usan los subprocesos.',
+        )
+
+    def handle(self, *args, **options):
+        if options['run']:
+            results = self.run(options)
+        else:
+            results = self.compare(options)
+        if options['output']:
+            benchmarking.write_results(options['output'], results)
+            if not options['run']:
+                self.stdout.write(self.style.SUCCESS(f'Resultados guardados en {options["output"]}'))
+
+    def compare(self, options):
+        source = settings.DATABASES['default']['NAME']
+        results = {'environment': benchmarking.environment(), 'profiles': {}}
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in options['profiles']:
+                copy = Path(directory) / f'{profile}.sqlite3'
+                output = Path(directory) / f'{profile}.json'
+                self.copy_database(source, copy, wal=profile == 'production')
+                env = dict(os.environ, HOTEL_DB_NAME=str(copy), HOTEL_DB_PROFILE=profile)
+                command = [
+                    sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'bench_database', '--run',
+                    '--readers', str(options['readers']), '--writers', str(options['writers']),
+                    '--duration', str(options['duration']), '--seed', str(options['seed']),
+                    '--output', str(output),
+                ]
+                completed = subprocess.run(command, env=env, capture_output=True, text=True)
+                if completed.returncode:
+                    raise CommandError(f'El perfil {profile} falló:\n{completed.stderr}')
+                with open(output, encoding='utf-8') as data:
+                    summary = results['profiles'][profile] = json.load(data)
+                self.stdout.write(
+                    f'{profile:<11} lecturas {summary["reads_per_second"]:>8.1f}/s '
+                    f'(p95 {summary["reads"]["p95_ms"]} ms)  '
+                    f'escrituras {summary["writes_per_second"]:>7.1f}/s '
+                    f'(p95 {summary["writes"]["p95_ms"]} ms)  '
+                    f'conflictos {summary["conflicts"]}  errores {summary["errors"]}'
+                )
+        return results
+
+    @staticmethod
+    def copy_database(source, destination, wal):
+        # La API de respaldo de SQLite incluye lo que aún esté en el -wal.
+        with sqlite3.connect(source) as original, sqlite3.connect(destination) as copy:
+            original.backup(copy)
+            copy.execute(f'PRAGMA journal_mode = {"WAL" if wal else "DELETE"}')
+
+    def run(self, options):
+        rooms = list(Room.objects.select_related('promotion'))
+        guests = list(Guest.objects.only('pk')[:1000])
+        if not rooms or not guests:
+            raise CommandError('No hay habitaciones o huéspedes. Ejecuta primero manage.py seed_data.')
+        today = date.today()
+        deadline = time.monotonic() + options['duration']
+        lock = threading.Lock()
+        reads, writes = [], []
+        counters = {'conflicts': 0, 'errors': 0}
+
+        def count(key):
+            with lock:
+                counters[key] += 1
+
+        def reader(index):
+            randomizer = random.Random(options['seed'] + index)
+            while time.monotonic() < deadline:
+                check_in = today + timedelta(days=randomizer.randrange(365))
+                started = time.perf_counter()
+                try:
+                    list(available_rooms(check_in, check_in + timedelta(days=3)))
+                except OperationalError:
+                    count('errors')
+                else:
+                    with lock:
+                        reads.append(time.perf_counter() - started)
+                finally:
+                    # Fin de la "petición": sin CONN_MAX_AGE se cierra la conexión.
+                    close_old_connections()
+            connections.close_all()
+
+        def writer(index):
+            randomizer = random.Random(options['seed'] + 1000 + index)
+            while time.monotonic() < deadline:
+                # Fechas lejanas para que la mayoría de las reservas se acepten.
+                check_in = today + timedelta(days=randomizer.randrange(5 * 365, 15 * 365))
+                started = time.perf_counter()
+                try:
+                    book_room(
+                        randomizer.choice(guests), randomizer.choice(rooms),
+                        check_in, check_in + timedelta(days=randomizer.randint(1, 5)),
+                    )
+                except RoomUnavailable:
+                    count('conflicts')
+                except OperationalError:
+                    count('errors')
+                else:
+                    with lock:
+                        writes.append(time.perf_counter() - started)
+                finally:
+                    close_old_connections()
+            connections.close_all()
+
+        threads = [threading.Thread(target=reader, args=(index,)) for index in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(index,)) for index in range(options['writers'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'profile': os.environ.get('HOTEL_DB_PROFILE') or 'default',
+            'readers': options['readers'],
+            'writers': options['writers'],
+            'seconds': round(elapsed, 2),
+            'reads_per_second': round(len(reads) / elapsed, 1),
+            'writes_per_second': round(len(writes) / elapsed, 1),
+            'reads': benchmarking.summarize(reads),
+            'writes': benchmarking.summarize(writes),
+            **counters,
+        }
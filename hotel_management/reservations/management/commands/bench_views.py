@@ -0,0 +1,94 @@
+import random
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.urls import reverse
+from reservations import benchmarking
+from reservations.models import Guest, Promotion, Reservation, Room
+
+
+class Command(benchmarking.BenchmarkCommandMixin, BaseCommand):
+    help = (
+        'Mide latencia (p50/p95/p99), consultas por petición y memoria máxima de las vistas '
+        'usando el cliente de pruebas de Django contra la base configurada.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help='Peticiones por endpoint.')
+        parser.add_argument('--endpoints', nargs='*', help='Limita la corrida a estos endpoints.')
+        parser.add_argument('--writes', action='store_true', help='Incluye POST a create_reservation (crea reservas reales).')
+        parser.add_argument('--output', help='Archivo JSON donde guardar los resultados.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if not Room.objects.exists():
+            raise CommandError('No hay habitaciones. Ejecuta primero manage.py seed_data.')
+        self.random = random.Random(options['seed'])
+        staff, guest_user = benchmarking.bench_users()
+        endpoints = self.endpoints(staff, guest_user, options['writes'])
+        if options['endpoints']:
+            unknown = set(options['endpoints']) - set(endpoints)
+            if unknown:
+                raise CommandError(f'Endpoints desconocidos: {", ".join(sorted(unknown))}')
+            endpoints = {name: endpoints[name] for name in options['endpoints']}
+
+        results = {
+            'environment': benchmarking.environment(),
+            'dataset': {
+                'rooms': Room.objects.count(),
+                'guests': Guest.objects.count(),
+                'promotions': Promotion.objects.count(),
+                'reservations': Reservation.objects.count(),
+            },
+            'endpoints': {},
+        }
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name, call in endpoints.items():
+                latencies, queries, statuses = benchmarking.measure(call, options['requests'])
+                summary = benchmarking.summarize(latencies, queries, statuses)
+                summary['peak_memory_kb'] = benchmarking.peak_memory(call)
+                results['endpoints'][name] = summary
+                self.stdout.write(
+                    f'{name:<28} p50 {summary["p50_ms"]:>9.2f} ms  p95 {summary["p95_ms"]:>9.2f} ms  '
+                    f'p99 {summary["p99_ms"]:>9.2f} ms  consultas {summary["queries_mean"]:>6}  '
+                    f'memoria {summary["peak_memory_kb"]:>9} KB'
+                )
+
+        if options['output']:
+            benchmarking.write_results(options['output'], results)
+            self.stdout.write(self.style.SUCCESS(f'Resultados guardados en {options["output"]}'))
+
+    def endpoints(self, staff, guest_user, writes):
+        staff_client = Client()
+        staff_client.force_login(staff)
+        guest_client = Client()
+        guest_client.force_login(guest_user)
+        today = date.today()
+        search = {
+            'check_in_date': today + timedelta(days=7),
+            'check_out_date': today + timedelta(days=10),
+        }
+        endpoints = {
+            'user_dashboard': lambda: guest_client.get(reverse('user_dashboard')),
+            'user_reservations': lambda: guest_client.get(reverse('user_reservations')),
+            'room_search': lambda: guest_client.get(reverse('room_search'), search),
+            'create_reservation_get': lambda: guest_client.get(reverse('create_reservation')),
+            'reservation_list': lambda: staff_client.get(reverse('reservation_list')),
+            'guest_list': lambda: staff_client.get(reverse('guest_list')),
+            'room_list': lambda: staff_client.get(reverse('room_list')),
+            'promotion_list': lambda: staff_client.get(reverse('promotion_list')),
+            'occupancy_report': lambda: staff_client.get(reverse('occupancy_report')),
+        }
+        if writes:
+            room_ids = list(Room.objects.values_list('pk', flat=True))
+
+            def book():
+                # Fechas lejanas y al azar para que la mayoría de las reservas se acepten.
+                check_in = today + timedelta(days=self.random.randrange(3 * 365, 10 * 365))
+                return guest_client.post(reverse('create_reservation'), {
+                    'room': self.random.choice(room_ids),
+                    'check_in_date': check_in,
+                    'check_out_date': check_in + timedelta(days=self.random.randint(1, 5)),
+                })
+            endpoints['create_reservation_post'] = book
+        return endpoints
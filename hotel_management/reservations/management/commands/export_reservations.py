@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from reservations import exports
+from reservations.properties import PropertyCommandMixin
+
+
+class Command(PropertyCommandMixin, BaseCommand):
+    help = 'Exporta el historial de reservas en CSV o NDJSON sin cargarlo completo en memoria.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--from', dest='check_in_from', help='Fecha de entrada mínima (AAAA-MM-DD).')
+        parser.add_argument('--to', dest='check_in_to', help='Fecha de entrada máxima (AAAA-MM-DD).')
+        parser.add_argument('--history', action='store_true', help='Incluye las reservas archivadas.')
+        parser.add_argument('--output', help='Archivo de salida. Por defecto, la salida estándar.')
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        filters = {}
+        for name in ('check_in_from', 'check_in_to'):
+            if options[name]:
+                value = parse_date(options[name])
+                if value is None:
+                    raise CommandError(f'Fecha inválida: {options[name]}')
+                filters[name] = value
+
+        rows = exports.export_rows(history=options['history'], chunk_size=options['chunk_size'], **filters)
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                for chunk in exports.render(rows, options['format']):
+                    output.write(chunk)
+        else:
+            for chunk in exports.render(rows, options['format']):
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,24 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from reservations import properties
+
+
+class Command(BaseCommand):
+    help = (
+        'Aplica las migraciones a la base compartida (default) y a la base de cada propiedad. '
+        'PropertyRouter decide qué tablas van en cada una.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('app_label', nargs='?', help='Solo las migraciones de esta app.')
+        parser.add_argument('migration_name', nargs='?', help='Migra (o revierte) hasta esta migración.')
+
+    def handle(self, *args, **options):
+        labels = [label for label in (options['app_label'], options['migration_name']) if label]
+        for alias in dict.fromkeys([DEFAULT_DB_ALIAS, *properties.databases()]):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Base {alias}:'))
+            call_command(
+                'migrate', *labels, database=alias, interactive=False,
+                verbosity=options['verbosity'], stdout=self.stdout, stderr=self.stderr,
+            )
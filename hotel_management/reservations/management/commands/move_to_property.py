@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from reservations import catalog, directory, properties, versions
+from reservations.importing import batched
+from reservations.models import DailyRoomTypeStats, Guest, Job, ModelVersion, Promotion, PromotionRedemption, Reservation, ReservationArchive, Room, RoomCalendar, RoomTypeInventory
+from reservations.properties import PropertyCommandMixin
+
+# En orden de dependencias: cada tabla después de las que referencia.
+MODELS = (
+    Promotion, Room, Guest, Reservation, ReservationArchive, PromotionRedemption,
+    DailyRoomTypeStats, RoomTypeInventory, RoomCalendar, ModelVersion, Job,
+)
+
+
+class Command(PropertyCommandMixin, BaseCommand):
+    help = (
+        'Copia a la base de una propiedad (--property) los datos de hotel que quedaron en una sola base '
+        '(--source, por defecto default) de antes de HOTEL_PROPERTIES: promociones, habitaciones, huéspedes, '
+        'reservas, archivo, canjes, rollups, inventario, calendarios, sellos y trabajos, con sus ids. '
+        'Antes hay que correr migrate_properties. La base destino debe estar vacía; la de origen no se toca.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=DEFAULT_DB_ALIAS, help='Alias de la base con los datos actuales.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        name = properties.current()
+        source, target = options['source'], properties.database(name)
+        if source not in connections:
+            raise CommandError(f'Base desconocida: {source}')
+        if source == target:
+            raise CommandError(f'La propiedad {name} ya usa la base {source}: no hay nada que mover.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size debe ser mayor que cero.')
+        if any(model._base_manager.using(target).exists() for model in MODELS):
+            raise CommandError(f'La base {target} ya tiene datos; se esperaba recién migrada.')
+
+        with transaction.atomic(using=target):
+            for model in MODELS:
+                # Los modelos con `property` quedan en la propiedad destino.
+                has_property = any(field.name == 'property' for field in model._meta.fields)
+                rows = model._base_manager.using(source).order_by('pk').iterator(chunk_size=options['batch_size'])
+                copied = 0
+                for batch in batched(rows, options['batch_size']):
+                    if has_property:
+                        for obj in batch:
+                            obj.property = name
+                    # bulk_create no dispara señales: las tablas derivadas se
+                    # copian tal cual en vez de recalcularse.
+                    model._base_manager.using(target).bulk_create(batch)
+                    copied += len(batch)
+                self.stdout.write(f'{model._meta.verbose_name_plural}: {copied}')
+
+        entries = directory.rebuild(name)
+        versions.bump(Promotion, Room, Guest, Reservation)
+        catalog.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Datos de {source} copiados a {target} (propiedad {name}); {entries} huéspedes en el directorio. '
+            f'Las tablas de hotel de {source} ya no se leen y se pueden borrar tras revisar.'
+        ))
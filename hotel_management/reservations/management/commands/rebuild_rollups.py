@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from reservations import inventory, rollups
+from reservations.properties import PropertyCommandMixin
+
+
+class Command(PropertyCommandMixin, BaseCommand):
+    help = (
+        'Recalcula a partir de las reservas las tablas derivadas: el rollup diario de ocupación '
+        'e ingresos y los contadores de inventario por tipo de habitación.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='Primera noche a recalcular (AAAA-MM-DD). Por defecto, todo el historial.')
+        parser.add_argument('--to', dest='end', help='Última noche a recalcular (AAAA-MM-DD).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ('start', 'end'):
+            if options[name]:
+                value = parse_date(options[name])
+                if value is None:
+                    raise CommandError(f'Fecha inválida: {options[name]}')
+                bounds[name] = value
+        if 'start' in bounds and 'end' in bounds and bounds['end'] < bounds['start']:
+            raise CommandError('La fecha final es anterior a la inicial.')
+        written = rollups.rebuild(batch_size=options['batch_size'], **bounds)
+        self.stdout.write(self.style.SUCCESS(f'{written} filas del rollup recalculadas.'))
+        written = inventory.rebuild(batch_size=options['batch_size'], **bounds)
+        self.stdout.write(self.style.SUCCESS(f'{written} filas del inventario recalculadas.'))
@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from reservations import jobs, properties
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta los trabajos en cola (correos de confirmación, etc.) en un pool de hilos o de '
+        'procesos. Sigue esperando trabajos nuevos hasta que se interrumpe, salvo con --once. '
+        'Atiende la cola de cada propiedad, o solo la de --property.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Tamaño del pool.')
+        parser.add_argument('--processes', action='store_true', help='Usa procesos en vez de hilos.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Trabajos que se toman por vuelta.')
+        parser.add_argument('--poll', type=float, default=1.0, help='Segundos de espera cuando no hay trabajos.')
+        parser.add_argument('--once', action='store_true', help='Vacía la cola y termina.')
+        parser.add_argument('--property', choices=properties.names(), help='Solo la cola de esta propiedad.')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers debe ser mayor que cero.')
+        names = [options['property']] if options['property'] else properties.names()
+        totals = {}
+        with jobs.make_executor(options['workers'], processes=options['processes']) as executor:
+            try:
+                while True:
+                    counts = {}
+                    for name in names:
+                        with properties.using(name):
+                            for status, count in jobs.run_pending(options['batch_size'], executor=executor).items():
+                                counts[status] = counts.get(status, 0) + count
+                    for status, count in counts.items():
+                        totals[status] = totals.get(status, 0) + count
+                    if counts:
+                        self.stdout.write(', '.join(f'{status}: {count}' for status, count in sorted(counts.items())))
+                    elif options['once']:
+                        break
+                    else:
+                        time.sleep(options['poll'])
+            except KeyboardInterrupt:
+                pass
+        summary = ', '.join(f'{status}: {count}' for status, count in sorted(totals.items())) or 'ninguno'
+        self.stdout.write(self.style.SUCCESS(f'Trabajos ejecutados: {summary}.'))
@@ -0,0 +1,50 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from reservations import properties, worker
+from reservations.properties import PropertyCommandMixin
+from reservations.seeding import DataSeeder
+
+
+class Command(PropertyCommandMixin, BaseCommand):
+    help = 'Genera habitaciones, huéspedes, promociones y reservas sintéticas para pruebas de carga.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rooms', type=int, default=100)
+        parser.add_argument('--guests', type=int, default=1000)
+        parser.add_argument('--promotions', type=int, default=10)
+        parser.add_argument('--reservations', type=int, default=10000)
+        parser.add_argument('--start', type=parse_date, help='Primera fecha del calendario (AAAA-MM-DD). Por defecto, hace un año.')
+        parser.add_argument('--seed', type=int, help='Semilla para obtener siempre los mismos datos.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--all-properties', action='store_true',
+            help='Siembra todas las propiedades a la vez, cada una en su proceso y su base.',
+        )
+
+    def handle(self, *args, **options):
+        if options['all_properties']:
+            return self.seed_all(options)
+        seeder = DataSeeder(seed=options['seed'], start=options['start'], batch_size=options['batch_size'])
+        promotions = seeder.promotions(options['promotions'])
+        self.stdout.write(f'{len(promotions)} promociones creadas.')
+        rooms = seeder.rooms(options['rooms'], promotions)
+        self.stdout.write(f'{len(rooms)} habitaciones creadas.')
+        guests = seeder.guests(options['guests'])
+        self.stdout.write(f'{len(guests)} huéspedes creados.')
+        created = seeder.reservations(options['reservations'], rooms, guests, promotions)
+        self.stdout.write(self.style.SUCCESS(f'{created} reservas creadas.'))
+
+    def seed_all(self, options):
+        # Cada base tiene su propio candado de escritura: un proceso por
+        # propiedad escribe en paralelo con los demás.
+        if options['property']:
+            raise CommandError('--all-properties no se combina con --property.')
+        names = properties.names()
+        shared = {key: options[key] for key in ('rooms', 'guests', 'promotions', 'reservations', 'start', 'seed', 'batch_size')}
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=len(names), mp_context=context, initializer=worker.setup) as executor:
+            for name, output in zip(names, executor.map(worker.seed, names, [shared] * len(names))):
+                self.stdout.write(f'[{name}]')
+                self.stdout.write(output, ending='')
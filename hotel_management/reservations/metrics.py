@@ -0,0 +1,113 @@
+import threading
+from bisect import bisect_left
+from . import catalog
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """
+    Histograma acumulativo al estilo Prometheus (buckets `le`).
+    """
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class ViewMetrics:
+    __slots__ = ('latency', 'queries', 'db_seconds', 'statuses')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = 0.0
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    """
+    Métricas por nombre de vista en memoria del proceso. Cada observación
+    toma un candado una sola vez; el formato de texto se arma solo al leer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, status, seconds, queries, db_seconds):
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.latency.observe(seconds)
+            metrics.queries.observe(queries)
+            metrics.db_seconds += db_seconds
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """
+        Exporta todo en el formato de texto de Prometheus (versión 0.0.4).
+        """
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = []
+            self._histogram(lines, 'veranum_request_duration_seconds', 'Latencia de las peticiones por vista.', views, 'latency')
+            self._histogram(lines, 'veranum_request_queries', 'Consultas SQL por petición y vista.', views, 'queries')
+
+            lines.append('# HELP veranum_request_db_seconds_total Tiempo total en la base de datos por vista.')
+            lines.append('# TYPE veranum_request_db_seconds_total counter')
+            for view, metrics in views:
+                lines.append(f'veranum_request_db_seconds_total{{view="{_escape(view)}"}} {metrics.db_seconds:.6f}')
+
+            lines.append('# HELP veranum_requests_total Peticiones por vista y código de estado.')
+            lines.append('# TYPE veranum_requests_total counter')
+            for view, metrics in views:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(f'veranum_requests_total{{view="{_escape(view)}",status="{status}"}} {count}')
+
+        cache_stats = catalog.stats()
+        lines.append('# HELP veranum_catalog_cache_requests_total Lecturas del caché del catálogo.')
+        lines.append('# TYPE veranum_catalog_cache_requests_total counter')
+        lines.append(f'veranum_catalog_cache_requests_total{{result="hit"}} {cache_stats["hits"]}')
+        lines.append(f'veranum_catalog_cache_requests_total{{result="miss"}} {cache_stats["misses"]}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram(lines, name, help_text, views, attribute):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for view, metrics in views:
+            histogram = getattr(metrics, attribute)
+            label = f'view="{_escape(view)}"'
+            for bound, total in histogram.cumulative():
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{name}_bucket{{{label},le="{le}"}} {total}')
+            lines.append(f'{name}_sum{{{label}}} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{{{label}}} {histogram.count}')
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,130 @@
+import logging
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from . import properties
+from .metrics import registry
+
+logger = logging.getLogger('reservations.slow_requests')
+
+
+class QueryTracker:
+    """
+    Envoltorio de ejecución (connection.execute_wrapper) que cuenta las
+    consultas y su tiempo. El SQL se guarda solo desde que la petición pasa
+    el instante `capture_after` (de perf_counter): una petición rápida no
+    guarda más que los contadores.
+    """
+
+    def __init__(self, capture_after=None):
+        self.capture_after = capture_after
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            finished = time.perf_counter()
+            self.count += 1
+            self.seconds += finished - started
+            if self.capture_after is not None and finished >= self.capture_after:
+                self.statements.append((finished - started, sql))
+
+
+class RequestMetricsMiddleware:
+    """
+    Registra latencia, número de consultas y tiempo en base de datos de
+    cada petición, agrupados por el nombre de la URL resuelta. Con
+    SLOW_REQUEST_THRESHOLD_MS definido, las peticiones más lentas que ese
+    umbral se registran en el logger reservations.slow_requests con las
+    consultas que terminaron después de pasarlo (la que lo cruzó incluida).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', None)
+        self.slow_threshold = threshold / 1000 if threshold is not None else None
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        tracker = self.tracker(started)
+        with self.tracking(tracker):
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, tracker)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        tracker = self.tracker(started)
+        # Las conexiones son propias de cada hilo y el ORM async consulta
+        # desde el hilo de la petición (thread_sensitive), así que el
+        # envoltorio se instala y se retira desde ese mismo hilo.
+        stack = await sync_to_async(self.tracking)(tracker)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.record(request, response, time.perf_counter() - started, tracker)
+        return response
+
+    def tracker(self, started):
+        return QueryTracker(capture_after=started + self.slow_threshold if self.slow_threshold is not None else None)
+
+    @staticmethod
+    def tracking(tracker):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(tracker))
+        return stack
+
+    def record(self, request, response, elapsed, tracker):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else '<unresolved>'
+        registry.observe(view, response.status_code, elapsed, tracker.count, tracker.seconds)
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            self.log_slow_request(request, view, elapsed, tracker)
+
+    def log_slow_request(self, request, view, elapsed, tracker):
+        statements = '\n'.join(
+            f'  [{seconds * 1000:.1f} ms] {sql}'
+            for seconds, sql in sorted(tracker.statements, key=lambda item: item[0], reverse=True)
+        )
+        logger.warning(
+            'Petición lenta %s %s (%s): %.1f ms, %d consultas, %.1f ms en base de datos; consultas desde el umbral:\n%s',
+            request.method, request.path, view, elapsed * 1000, tracker.count, tracker.seconds * 1000, statements,
+        )
+
+
+class PropertyMiddleware:
+    """
+    Activa la propiedad (hotel) de la petición según su host y la deja en
+    request.property; desde ahí PropertyRouter manda las consultas a su
+    base. No se restablece al terminar: cada petición fija la suya al
+    empezar, y así una respuesta en streaming que se genera después sigue
+    viendo la propiedad de su petición.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.property = properties.from_host(request.get_host())
+        properties.activate(request.property)
+        return self.get_response(request)
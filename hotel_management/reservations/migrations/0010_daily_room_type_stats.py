@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0009_reservation_total_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRoomTypeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('room_type', models.CharField(max_length=50)),
+                ('rooms_sold', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name_plural': 'daily room type stats',
+                'constraints': [models.UniqueConstraint(fields=('date', 'room_type'), name='daily_stats_date_room_type_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0010_daily_room_type_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomTypeInventory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_type', models.CharField(max_length=50)),
+                ('date', models.DateField()),
+                ('booked', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'room type inventory',
+                'constraints': [models.UniqueConstraint(fields=('room_type', 'date'), name='inventory_room_type_date_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0011_room_type_inventory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='room_locked',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0013_model_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promotion',
+            name='max_uses',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='promotion',
+            name='max_uses_per_guest',
+            field=models.PositiveIntegerField(blank=True, default=1, null=True),
+        ),
+        migrations.AddField(
+            model_name='promotion',
+            name='uses_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PromotionRedemption',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('redeemed_at', models.DateTimeField(auto_now_add=True)),
+                ('guest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='reservations.guest')),
+                ('promotion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='redemptions', to='reservations.promotion')),
+                ('reservation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='redemption', to='reservations.reservation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['promotion', 'guest'], name='redemption_promotion_guest_idx')],
+            },
+        ),
+    ]
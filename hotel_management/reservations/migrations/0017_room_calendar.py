@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0016_reservation_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomCalendar',
+            fields=[
+                ('room', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='calendar', serialize=False, to='reservations.room')),
+                ('version', models.PositiveBigIntegerField(default=1)),
+                ('built_version', models.PositiveBigIntegerField(default=0)),
+                ('built_on', models.DateField(blank=True, null=True)),
+                ('events', models.TextField(blank=True)),
+                ('etag', models.CharField(blank=True, max_length=32)),
+            ],
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:06
+
+import django.db.models.deletion
+import reservations.properties
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0018_live_event'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guest',
+            name='property',
+            field=models.CharField(default=reservations.properties.current, editable=False, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='promotion',
+            name='property',
+            field=models.CharField(default=reservations.properties.current, editable=False, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='property',
+            field=models.CharField(default=reservations.properties.current, editable=False, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='property',
+            field=models.CharField(default=reservations.properties.current, editable=False, max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='guest',
+            name='user',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='guest', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='GuestDirectory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('property', models.CharField(max_length=30)),
+                ('guest_id', models.BigIntegerField()),
+                ('user_id', models.IntegerField(blank=True, db_index=True, null=True)),
+                ('first_name', models.CharField(max_length=50)),
+                ('last_name', models.CharField(max_length=50)),
+                ('email', models.EmailField(db_index=True, max_length=254)),
+                ('phone_number', models.CharField(db_index=True, max_length=15)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('property', 'guest_id'), name='guest_directory_entry_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:32
+
+import django.db.models.deletion
+import reservations.properties
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0019_properties'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promotionredemption',
+            name='archived_reservation',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='redemption', to='reservations.reservationarchive'),
+        ),
+        migrations.AddField(
+            model_name='reservationarchive',
+            name='property',
+            field=models.CharField(default=reservations.properties.current, editable=False, max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='promotionredemption',
+            name='reservation',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='redemption', to='reservations.reservation'),
+        ),
+    ]
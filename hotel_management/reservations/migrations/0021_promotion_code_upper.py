@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:39
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservations', '0020_archive_property_redemptions'),
+    ]
+
+    operations = [
+        # Promotion.save() guarda los códigos en mayúsculas; los que ya
+        # existen se pasan antes de crear la restricción. Si quedan dos con
+        # el mismo código, la migración falla y hay que renombrar uno.
+        migrations.RunSQL(
+            "UPDATE reservations_promotion SET code = UPPER(TRIM(code))",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='promotion',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Upper('code'), name='promotion_code_upper_uniq'),
+        ),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+import datetime
+from django.db import models, router, transaction
+from django.db.models.functions import Upper
 from django.contrib.auth.models import User
+from . import properties
+from .pricing import nightly_discounts, nightly_price
 
 class Promotion(models.Model):
     code = models.CharField(max_length=50, unique=True)
@@ -7,6 +11,26 @@ class Promotion(models.Model):
     discount_percentage = models.DecimalField(max_digits=5, decimal_places=2)
     start_date = models.DateField()
     end_date = models.DateField()
+    # Límites de canje (vacío = sin límite). uses_count lo mantiene
+    # promotions.redeem() con F(), nunca se edita a mano.
+    max_uses = models.PositiveIntegerField(null=True, blank=True)
+    max_uses_per_guest = models.PositiveIntegerField(null=True, blank=True, default=1)
+    uses_count = models.PositiveIntegerField(default=0)
+    # Hotel dueño de la fila: define en qué base vive (ver properties.py).
+    property = models.CharField(max_length=30, default=properties.current, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start_date', 'id'], name='promotion_start_idx'),
+        ]
+        constraints = [
+            # Los códigos se canjean sin distinguir mayúsculas (promotions.lookup).
+            models.UniqueConstraint(Upper('code'), name='promotion_code_upper_uniq'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.code = self.code.strip().upper()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f'{self.code} - {self.discount_percentage}%'
@@ -18,24 +42,47 @@ class Room(models.Model):
     price_per_night = models.DecimalField(max_digits=6, decimal_places=2)
     available = models.BooleanField(default=True)
     promotion = models.ForeignKey(Promotion, on_delete=models.SET_NULL, null=True, blank=True)
+    # Hotel dueño de la fila: define en qué base vive (ver properties.py).
+    property = models.CharField(max_length=30, default=properties.current, editable=False)
 
-    def get_discounted_price(self):
-        if self.promotion and self.promotion.start_date <= datetime.date.today() <= self.promotion.end_date:
-            discount = self.price_per_night * (self.promotion.discount_percentage / 100)
-            return self.price_per_night - discount
-        return self.price_per_night
+    class Meta:
+        indexes = [
+            # Filtro por tipo del admin y de assignment.plan; en el listado de
+            # reservas, room__room_type entra por aquí y sigue por el índice
+            # de room_id de Reservation.
+            models.Index(fields=['room_type', 'room_number'], name='room_type_idx'),
+        ]
+
+    def get_discounted_price(self, night=None):
+        """
+        Precio de una noche (hoy por defecto) con la promoción de la habitación.
+        Para cotizar estadías completas o muchas habitaciones usar pricing.quote_rooms.
+        """
+        night = night or datetime.date.today()
+        return nightly_price(self.price_per_night, nightly_discounts([self.promotion], [night])[0])
 
     def __str__(self):
         return f'Room {self.room_number} ({self.room_type})'
 
 class Guest(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='guest')
+    # Sin restricción en la base: con varias propiedades el usuario está en
+    # 'default' y el huésped en la base de su hotel. Por lo mismo no hay
+    # CASCADE (el colector buscaría el huésped en 'default'): al borrar el
+    # usuario, signals.delete_guest_profiles borra su huésped en cada base.
+    user = models.OneToOneField(User, on_delete=models.DO_NOTHING, related_name='guest', db_constraint=False)
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
     email = models.EmailField(unique=True)
     phone_number = models.CharField(max_length=15, unique=True)
     address = models.TextField(blank=True)
     has_used_promotion = models.BooleanField(default=False)  # Nuevo campo
+    # Hotel dueño de la fila: define en qué base vive (ver properties.py).
+    property = models.CharField(max_length=30, default=properties.current, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'], name='guest_name_idx'),
+        ]
 
     def __str__(self):
         return f'{self.first_name} {self.last_name}'
@@ -47,6 +94,208 @@ class Reservation(models.Model):
     check_in_date = models.DateField()
     check_out_date = models.DateField()
     promotion = models.ForeignKey(Promotion, on_delete=models.SET_NULL, null=True, blank=True)
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # Si el huésped eligió la habitación, el reasignador (assignment.py) no la mueve.
+    room_locked = models.BooleanField(default=False)
+    # Hotel dueño de la fila: define en qué base vive (ver properties.py).
+    property = models.CharField(max_length=30, default=properties.current, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'check_out_date', 'check_in_date'], name='reservation_room_dates_idx'),
+            models.Index(fields=['check_in_date', 'id'], name='reservation_check_in_idx'),
+            models.Index(fields=['check_out_date', 'id'], name='reservation_check_out_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(check_out_date__gt=models.F('check_in_date')), name='reservation_check_out_after_check_in'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Las señales de signals.py mantienen tablas derivadas de las reservas;
+        # así quedan en la misma transacción que la fila.
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Reservation, instance=self)):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(Reservation, instance=self)):
+            return super().delete(*args, **kwargs)
+
+    def __str__(self):
+        return f'Reservation for {self.guest} in room {self.room.room_number}'
+
+
+
+class ReservationArchive(models.Model):
+    # Estadías terminadas hace tiempo, sacadas de Reservation por el comando
+    # archive_reservations (ver archive.py). Conserva el id original y los
+    # mismos nombres de campo, así las plantillas y los listados con
+    # historial tratan igual ambas tablas.
+    id = models.BigIntegerField(primary_key=True)
+    guest = models.ForeignKey(Guest, on_delete=models.CASCADE, related_name='archived_reservations')
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='archived_reservations')
+    check_in_date = models.DateField()
+    check_out_date = models.DateField()
+    promotion = models.ForeignKey(Promotion, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_reservations')
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # Hotel dueño de la fila: define en qué base vive (ver properties.py).
+    property = models.CharField(max_length=30, default=properties.current, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['check_in_date', 'id'], name='archive_check_in_idx'),
+            models.Index(fields=['check_out_date', 'id'], name='archive_check_out_idx'),
+            models.Index(fields=['guest', 'check_in_date'], name='archive_guest_idx'),
+        ]
+
+    def __str__(self):
+        return f'Archived reservation for {self.guest} in room {self.room.room_number}'
+
+
+class DailyRoomTypeStats(models.Model):
+    # Rollup diario por tipo de habitación, mantenido de forma incremental
+    # por las señales de Reservation (ver rollups.py).
+    date = models.DateField()
+    room_type = models.CharField(max_length=50)
+    rooms_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = 'daily room type stats'
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'room_type'], name='daily_stats_date_room_type_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.date} {self.room_type}: {self.rooms_sold}'
+
+
+class RoomTypeInventory(models.Model):
+    # Habitaciones ocupadas por tipo y noche, mantenido en la misma
+    # transacción que cada reserva (ver inventory.py).
+    room_type = models.CharField(max_length=50)
+    date = models.DateField()
+    booked = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'room type inventory'
+        constraints = [
+            models.UniqueConstraint(fields=['room_type', 'date'], name='inventory_room_type_date_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.room_type} {self.date}: {self.booked}'
+
+
+class ModelVersion(models.Model):
+    # Sello de cambios por modelo: version sube en cada alta, cambio o baja
+    # (ver versions.py). Alimenta los ETag/Last-Modified de conditional.py.
+    model = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.model} v{self.version}'
+
+
+
+class RoomCalendar(models.Model):
+    # Feed .ics de una habitación ya generado (ver calendars.py). version
+    # sube con cada cambio de sus reservas; si no coincide con
+    # built_version, o el feed es de otro día, se vuelve a generar.
+    room = models.OneToOneField(Room, on_delete=models.CASCADE, primary_key=True, related_name='calendar')
+    version = models.PositiveBigIntegerField(default=1)
+    built_version = models.PositiveBigIntegerField(default=0)
+    built_on = models.DateField(null=True, blank=True)
+    events = models.TextField(blank=True)
+    etag = models.CharField(max_length=32, blank=True)
+
+    def __str__(self):
+        return f'Calendar for room {self.room_id} v{self.version}'
+
+
+class PromotionRedemption(models.Model):
+    # Un canje por reserva. Si la reserva se borra, el canje se va con ella
+    # y la promoción recupera el cupo (ver signals.py). Al archivarla, el
+    # canje pasa a la archivada y sigue contando para el límite por huésped.
+    promotion = models.ForeignKey(Promotion, on_delete=models.CASCADE, related_name='redemptions')
+    guest = models.ForeignKey(Guest, on_delete=models.CASCADE, related_name='redemptions')
+    reservation = models.OneToOneField(Reservation, on_delete=models.CASCADE, null=True, blank=True, related_name='redemption')
+    archived_reservation = models.OneToOneField(ReservationArchive, on_delete=models.SET_NULL, null=True, blank=True, related_name='redemption')
+    redeemed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['promotion', 'guest'], name='redemption_promotion_guest_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.promotion.code} - {self.guest}'
+
+
+class Job(models.Model):
+    # Trabajo diferido (correo de confirmación, etc.) que ejecuta el
+    # comando run_jobs fuera de la petición (ver jobs.py).
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pendiente'),
+        (RUNNING, 'En ejecución'),
+        (DONE, 'Terminado'),
+        (FAILED, 'Fallido'),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # Mayor prioridad se ejecuta antes.
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    # Evita encolar dos veces el mismo trabajo (p. ej. confirmation:<reserva>).
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()
+    # Un trabajo en ejecución cuyo plazo venció (el worker murió) se retoma.
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'], name='job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task} #{self.pk} ({self.status})'
+
+
+class LiveEvent(models.Model):
+    # Cambio de disponibilidad en vivo para live.DatabaseBackend: cada
+    # proceso ASGI lee los nuevos por id. Se borran a los
+    # LIVE_EVENT_RETENTION_SECONDS.
+    data = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class GuestDirectory(models.Model):
+    # Directorio compartido, en 'default', de los huéspedes de todas las
+    # propiedades: buscar a alguien por correo, teléfono o usuario es una
+    # consulta aquí y no una por cada base (ver directory.py).
+    property = models.CharField(max_length=30)
+    guest_id = models.BigIntegerField()
+    user_id = models.IntegerField(null=True, blank=True, db_index=True)
+    first_name = models.CharField(max_length=50)
+    last_name = models.CharField(max_length=50)
+    email = models.EmailField(db_index=True)
+    phone_number = models.CharField(max_length=15, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['property', 'guest_id'], name='guest_directory_entry_unique'),
+        ]
 
     def __str__(self):
-        return f'Reservation for {self.guest} in room {self.room.room_number}'
\ No newline at end of file
+        return f'{self.first_name} {self.last_name} ({self.property})'
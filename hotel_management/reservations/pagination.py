@@ -0,0 +1,166 @@
+import hashlib
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from . import properties, versions
+from .models import Guest, Promotion, Reservation, Room
+
+
+class KeysetPage:
+    """
+    Una página de resultados junto con los cursores para moverse a la
+    página siguiente y a la anterior.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginación por búsqueda (keyset): en vez de OFFSET, cada página filtra
+    a partir de los valores de orden de la última fila vista, de modo que
+    la base solo recorre per_page + 1 entradas del índice sin importar en
+    qué página se esté. No se calcula el total de filas.
+
+    `ordering` usa la sintaxis de order_by() y su último campo debe ser
+    único (normalmente 'id' o '-id'). Los campos no pueden ser nulos.
+
+    `others` son querysets de otras tablas con los mismos campos (las
+    reservas archivadas): cada página toma per_page + 1 filas de cada uno y
+    las mezcla en memoria. El último campo debe ser único entre todos.
+    """
+    salt = 'reservations.pagination'
+
+    def __init__(self, queryset, ordering, per_page=50, others=()):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.others = tuple(others)
+
+    def page(self, cursor=None):
+        direction, values = self._decode(cursor)
+        ordering = self.ordering if direction == 'next' else tuple(self._flip(field) for field in self.ordering)
+        rows = []
+        for queryset in (self.queryset, *self.others):
+            queryset = queryset.order_by(*ordering)
+            if values is not None:
+                queryset = queryset.filter(self._seek(ordering, values))
+            rows.extend(queryset[:self.per_page + 1])
+        if self.others:
+            # Orden estable: del último campo al primero.
+            for field in reversed(ordering):
+                rows.sort(key=lambda obj: self._value(obj, field), reverse=field.startswith('-'))
+            rows = rows[:self.per_page + 1]
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'previous':
+            rows.reverse()
+
+        if direction == 'next':
+            has_next, has_previous = has_more, values is not None
+        else:
+            has_next, has_previous = values is not None, has_more
+        return KeysetPage(
+            rows,
+            next_cursor=self._encode('next', rows[-1]) if rows and has_next else None,
+            previous_cursor=self._encode('previous', rows[0]) if rows and has_previous else None,
+        )
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _seek(ordering, values):
+        # (a, b, c) > (x, y, z)  <=>  a >= x AND (a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z))
+        # El a >= x de adelante es redundante para el resultado, pero sin él
+        # SQLite no acota el índice con el OR y recorre desde el comienzo:
+        # cada página costaría más que la anterior.
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first = ordering[0]
+        bound = Q(**{f'{first.lstrip("-")}__{"lte" if first.startswith("-") else "gte"}': values[0]})
+        return bound & condition
+
+    @staticmethod
+    def _value(obj, field):
+        value = obj
+        for attribute in field.lstrip('-').split('__'):
+            value = getattr(value, attribute)
+        return value
+
+    def _encode(self, direction, obj):
+        values = []
+        for field in self.ordering:
+            value = self._value(obj, field)
+            values.append(value if isinstance(value, (int, str)) else str(value))
+        return signing.dumps({'d': direction, 'o': self.ordering, 'v': values}, salt=self.salt, compress=True)
+
+    def _decode(self, cursor):
+        if not cursor:
+            return 'next', None
+        try:
+            data = signing.loads(cursor, salt=self.salt)
+        except signing.BadSignature:
+            return 'next', None
+        if data.get('d') not in ('next', 'previous') or tuple(data.get('o', ())) != self.ordering:
+            return 'next', None
+        return data['d'], data['v']
+
+
+class CappedCountPaginator(Paginator):
+    """
+    Paginator por OFFSET (el que espera el admin) que cuenta a lo más
+    max_count filas: COUNT(*) sobre un LIMIT, en vez de recorrer toda la
+    tabla. Más allá de ese número las páginas no se enlazan; se llega
+    filtrando.
+
+    El conteo queda en caché con el SQL del listado (filtros y búsqueda) y
+    los sellos de versión en la clave. Mientras nada cambie, cada página
+    cuesta una consulta a la tabla de sellos en vez del COUNT, que lee
+    hasta max_count filas.
+    """
+    max_count = 10000
+    cache_timeout = 60 * 60
+    # Los sellos de todos los modelos con sello: un filtro puede pasar por
+    # otra tabla (las reservas por tipo de habitación).
+    versioned_models = (Guest, Promotion, Reservation, Room)
+
+    @cached_property
+    def count(self):
+        capped = self.object_list[:self.max_count]
+        sql, params = capped.query.sql_with_params()
+        model_versions, last_modified = versions.stamps(*self.versioned_models)
+        digest = hashlib.md5(f'{model_versions}|{last_modified}|{sql}|{params}'.encode(), usedforsecurity=False).hexdigest()
+        key = f'reservations:admin-count:{properties.current()}:{digest}'
+        cache = caches[settings.CATALOG_CACHE_ALIAS]
+        count = cache.get(key)
+        if count is None:
+            count = capped.count()
+            cache.set(key, count, self.cache_timeout)
+        return count
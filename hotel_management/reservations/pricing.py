@@ -0,0 +1,84 @@
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+CENT = Decimal('0.01')
+HUNDRED = Decimal('100')
+NO_DISCOUNT = Decimal('0')
+
+
+def stay_nights(check_in_date, check_out_date):
+    """
+    Noches de una estadía: desde la entrada hasta el día anterior a la salida.
+    """
+    return [check_in_date + timedelta(days=offset) for offset in range((check_out_date - check_in_date).days)]
+
+
+def nightly_discounts(promotions, nights):
+    """
+    Arreglo alineado con `nights` con el porcentaje de descuento de cada
+    noche. Si varias promociones cubren la misma noche gana la mayor; los
+    descuentos no se acumulan.
+    """
+    discounts = [NO_DISCOUNT] * len(nights)
+    if not nights:
+        return discounts
+    first_night = nights[0]
+    for promotion in promotions:
+        if promotion is None:
+            continue
+        start = max((promotion.start_date - first_night).days, 0)
+        end = min((promotion.end_date - first_night).days + 1, len(nights))
+        for index in range(start, end):
+            if promotion.discount_percentage > discounts[index]:
+                discounts[index] = promotion.discount_percentage
+    return discounts
+
+
+def nightly_price(price_per_night, discount_percentage):
+    """
+    Precio de una noche con descuento, redondeado al centavo.
+    """
+    if not discount_percentage:
+        return price_per_night
+    return (price_per_night * (HUNDRED - discount_percentage) / HUNDRED).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def quote_rooms(rooms, check_in_date, check_out_date, promotion=None):
+    """
+    Calcula el total de la estadía para muchas habitaciones en una pasada.
+    Devuelve un diccionario {room.pk: total}.
+
+    El arreglo de descuentos por noche solo depende de la promoción, no de
+    la habitación, así que se calcula una vez por promoción distinta y se
+    resume en {descuento: noches}. El total de cada habitación queda en
+    unas pocas multiplicaciones Decimal, con el mismo redondeo por noche
+    que tendría sumar noche a noche. `promotion` es una promoción adicional
+    (la elegida al reservar) que compite con la de cada habitación.
+
+    Las habitaciones deberían venir con select_related('promotion').
+    """
+    nights = stay_nights(check_in_date, check_out_date)
+    profiles = {}
+    prices = {}
+    totals = {}
+    for room in rooms:
+        profile = profiles.get(room.promotion_id)
+        if profile is None:
+            profile = profiles[room.promotion_id] = Counter(nightly_discounts([room.promotion, promotion], nights))
+        total = Decimal('0.00')
+        for discount, count in profile.items():
+            key = (room.price_per_night, discount)
+            price = prices.get(key)
+            if price is None:
+                price = prices[key] = nightly_price(*key)
+            total += price * count
+        totals[room.pk] = total
+    return totals
+
+
+def quote_room(room, check_in_date, check_out_date, promotion=None):
+    """
+    Total de la estadía para una sola habitación.
+    """
+    return quote_rooms([room], check_in_date, check_out_date, promotion=promotion)[room.pk]
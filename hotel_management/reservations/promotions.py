@@ -0,0 +1,88 @@
+from django.db.models import F, Q
+from . import catalog
+from .models import Promotion, PromotionRedemption
+
+
+class PromotionError(Exception):
+    """
+    Error base al canjear una promoción.
+    """
+
+
+class PromotionNotValid(PromotionError):
+    """
+    La promoción no rige en ninguna noche de la estadía.
+    """
+
+
+class PromotionExhausted(PromotionError):
+    """
+    La promoción ya alcanzó su máximo de canjes.
+    """
+
+
+class PromotionLimitReached(PromotionError):
+    """
+    El huésped ya canjeó esta promoción las veces permitidas.
+    """
+
+
+def normalize(code):
+    return (code or '').strip().upper()
+
+
+def lookup(code, on=None):
+    """
+    Promoción vigente con ese código (sin distinguir mayúsculas), o None.
+    Sale de un índice en caché {código: promoción} de las promociones
+    vigentes y con cupo (catalog.get_promotion_index), así que no consulta
+    la base. El cupo se vuelve a verificar al canjear.
+    """
+    return catalog.get_promotion_index(on).get(normalize(code))
+
+
+def covers(promotion, check_in_date, check_out_date):
+    """
+    True si la promoción rige en alguna noche de la estadía (pricing.py
+    solo descuenta esas noches).
+    """
+    return promotion.start_date < check_out_date and promotion.end_date >= check_in_date
+
+
+def redeem(promotion, guest, reservation):
+    """
+    Canjea la promoción para la reserva. Debe llamarse dentro de la
+    transacción que crea la reserva: si algo falla, se deshace todo.
+
+    El cupo total se descuenta con un único UPDATE condicional
+    (uses_count = uses_count + 1 solo si queda cupo y la promoción rige en
+    la estadía), que la base ejecuta de forma atómica: con miles de canjes
+    simultáneos del mismo código nunca se pasa de max_uses. El límite por
+    huésped se mira después de ese UPDATE, que ya tomó el candado de
+    escritura (la fila de la promoción en otros motores), así que dos
+    canjes del mismo huésped no pueden contarse a la vez.
+    """
+    check_in_date, check_out_date = reservation.check_in_date, reservation.check_out_date
+    has_room = Q(max_uses__isnull=True) | Q(uses_count__lt=F('max_uses'))
+    claimed = Promotion.objects.filter(
+        has_room, pk=promotion.pk, start_date__lt=check_out_date, end_date__gte=check_in_date,
+    ).update(uses_count=F('uses_count') + 1)
+    if not claimed:
+        if not covers(promotion, check_in_date, check_out_date):
+            raise PromotionNotValid(promotion)
+        # Que el índice en caché deje de ofrecerla.
+        catalog.invalidate()
+        raise PromotionExhausted(promotion)
+    if promotion.max_uses_per_guest is not None:
+        used = PromotionRedemption.objects.filter(promotion=promotion, guest=guest).count()
+        if used >= promotion.max_uses_per_guest:
+            raise PromotionLimitReached(promotion)
+    return PromotionRedemption.objects.create(promotion=promotion, guest=guest, reservation=reservation)
+
+
+def release(redemption):
+    """
+    Devuelve el cupo de un canje borrado (la reserva se canceló).
+    """
+    Promotion.objects.filter(pk=redemption.promotion_id, uses_count__gt=0).update(uses_count=F('uses_count') - 1)
+    catalog.invalidate()
@@ -0,0 +1,98 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Cada propiedad (hotel) guarda sus habitaciones, huéspedes, reservas y
+# promociones en su propia base (settings.PROPERTY_DATABASES), así que las
+# escrituras de un hotel no esperan el candado de SQLite de los demás. La
+# base 'default' queda para lo compartido: usuarios, sesiones y el
+# directorio de huéspedes (directory.py).
+#
+# La propiedad activa vive en una variable de contexto: la fija
+# PropertyMiddleware en cada petición y `using()` en los comandos, y
+# routers.PropertyRouter manda a su base las consultas de los modelos de
+# cada hotel. Vale igual en hilos y en el bucle async (sync_to_async copia
+# el contexto); un ThreadPoolExecutor no lo copia y hay que pasarla.
+_current = ContextVar('reservations_property', default=None)
+
+
+def names():
+    return list(settings.PROPERTY_DATABASES)
+
+
+def current():
+    """
+    La propiedad activa, o DEFAULT_PROPERTY si no se activó ninguna. Es
+    también el valor por defecto del campo `property` de los modelos.
+    """
+    return _current.get() or settings.DEFAULT_PROPERTY
+
+
+def database(name=None):
+    """
+    Alias de la base de la propiedad (la activa si no se indica).
+    """
+    name = name or current()
+    try:
+        return settings.PROPERTY_DATABASES[name]
+    except KeyError:
+        raise LookupError(f'Propiedad desconocida: {name}') from None
+
+
+def databases():
+    """
+    Alias de todas las bases de propiedades, sin repetir (con una sola
+    propiedad es solo 'default').
+    """
+    return list(dict.fromkeys(settings.PROPERTY_DATABASES.values()))
+
+
+def is_sharded():
+    return databases() != [DEFAULT_DB_ALIAS]
+
+
+def activate(name):
+    database(name)
+    _current.set(name)
+
+
+@contextmanager
+def using(name):
+    """
+    Activa la propiedad dentro del bloque, para comandos y trabajos.
+    """
+    database(name)
+    token = _current.set(name)
+    try:
+        yield name
+    finally:
+        _current.reset(token)
+
+
+def from_host(host):
+    """
+    Propiedad de una petición según su host: costa.veranum.cl atiende la
+    propiedad `costa`. Los demás hosts, DEFAULT_PROPERTY.
+    """
+    label = host.split(':', 1)[0].split('.', 1)[0].lower()
+    return label if label in settings.PROPERTY_DATABASES else settings.DEFAULT_PROPERTY
+
+
+class PropertyCommandMixin:
+    """
+    Para los comandos que trabajan sobre los datos de un hotel: agrega
+    --property y ejecuta el comando con esa propiedad activa.
+    """
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument(
+            '--property', choices=names(),
+            help='Propiedad sobre la que se trabaja. Por defecto, DEFAULT_PROPERTY.',
+        )
+        return parser
+
+    def execute(self, *args, **options):
+        with using(options.get('property') or current()):
+            return super().execute(*args, **options)
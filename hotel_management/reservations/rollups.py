@@ -0,0 +1,85 @@
+from collections import defaultdict
+from decimal import Decimal, ROUND_DOWN
+from django.db import router, transaction
+from django.db.models import F
+from . import archive
+from .models import DailyRoomTypeStats
+from .pricing import CENT, stay_nights
+
+ZERO = Decimal('0.00')
+
+
+def spread_revenue(total_price, nights):
+    """
+    Reparte el total de una estadía entre sus noches, al centavo. Los
+    centavos que sobran van a las primeras noches, así la suma es exacta.
+    """
+    if not nights:
+        return []
+    total_price = total_price or ZERO
+    share = (total_price / nights).quantize(CENT, rounding=ROUND_DOWN)
+    remainder = int((total_price - share * nights) / CENT)
+    return [share + CENT if index < remainder else share for index in range(nights)]
+
+
+def apply_stay(room_type, check_in_date, check_out_date, total_price, sign=1):
+    """
+    Suma (sign=1) o resta (sign=-1) una estadía al rollup diario de su tipo
+    de habitación. Son a lo más tres consultas sin importar el historial:
+    asegurar las filas de las noches y un UPDATE con F() por cada monto
+    por noche distinto (el reparto deja como mucho dos).
+    """
+    nights = stay_nights(check_in_date, check_out_date)
+    if not nights:
+        return
+    DailyRoomTypeStats.objects.bulk_create(
+        [DailyRoomTypeStats(date=night, room_type=room_type) for night in nights],
+        ignore_conflicts=True,
+    )
+    by_amount = defaultdict(list)
+    for night, amount in zip(nights, spread_revenue(total_price, len(nights))):
+        by_amount[amount].append(night)
+    for amount, dates in by_amount.items():
+        DailyRoomTypeStats.objects.filter(room_type=room_type, date__in=dates).update(
+            rooms_sold=F('rooms_sold') + sign,
+            revenue=F('revenue') + sign * amount,
+        )
+
+
+def rebuild(start=None, end=None, batch_size=1000):
+    """
+    Recalcula el rollup desde las reservas, activas y archivadas, para las
+    noches en [start, end] (todo el historial si no se indican). Sirve para cargas masivas, que
+    no disparan señales, y para corregir cualquier desvío.
+    Devuelve la cantidad de filas escritas.
+    """
+    with transaction.atomic(using=router.db_for_write(DailyRoomTypeStats)):
+        filters = {}
+        stale = DailyRoomTypeStats.objects.all()
+        if start is not None:
+            filters['check_out_date__gt'] = start
+            stale = stale.filter(date__gte=start)
+        if end is not None:
+            filters['check_in_date__lte'] = end
+            stale = stale.filter(date__lte=end)
+
+        totals = defaultdict(lambda: [0, ZERO])
+        stays = archive.stays(('room__room_type', 'check_in_date', 'check_out_date', 'total_price'), **filters)
+        for room_type, check_in_date, check_out_date, total_price in stays.iterator(chunk_size=batch_size):
+            nights = stay_nights(check_in_date, check_out_date)
+            for night, amount in zip(nights, spread_revenue(total_price, len(nights))):
+                if (start is None or night >= start) and (end is None or night <= end):
+                    row = totals[night, room_type]
+                    row[0] += 1
+                    row[1] += amount
+
+        stale.delete()
+        DailyRoomTypeStats.objects.bulk_create(
+            [
+                DailyRoomTypeStats(date=night, room_type=room_type, rooms_sold=rooms_sold, revenue=revenue)
+                for (night, room_type), (rooms_sold, revenue) in totals.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(totals)
+
@@ -0,0 +1,81 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from . import properties
+
+
+class ReadWriteRouter:
+    """
+    Manda las lecturas a la conexión de solo lectura (READ_DATABASE_ALIAS)
+    y todas las escrituras a la principal. Con WAL ambas ven el mismo
+    archivo y la lectura nunca espera al escritor.
+
+    Mientras la conexión principal está dentro de una transacción las
+    lecturas se quedan en ella: así book_room y las demás operaciones
+    atómicas leen lo que ya escribieron y sus chequeos no ven datos viejos.
+    """
+
+    def db_for_read(self, model, **hints):
+        read_alias = getattr(settings, 'READ_DATABASE_ALIAS', None)
+        if read_alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return read_alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las dos conexiones son la misma base.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PropertyRouter:
+    """
+    Manda los modelos de la app reservations a la base de su propiedad
+    (ver properties.py): la del objeto si ya viene de una base o trae su
+    campo `property`, y si no la propiedad activa. Lo compartido (usuarios,
+    sesiones, permisos, el directorio de huéspedes y los eventos en vivo)
+    queda en 'default'; para esos modelos no opina y decide el router
+    siguiente, si lo hay.
+    """
+
+    SHARED_MODELS = {'guestdirectory', 'liveevent'}
+
+    def is_sharded(self, model):
+        return model._meta.app_label == 'reservations' and model._meta.model_name not in self.SHARED_MODELS
+
+    def _database(self, model, instance=None):
+        if not self.is_sharded(model):
+            return None
+        if instance is not None and self.is_sharded(type(instance)):
+            if instance._state.db:
+                return instance._state.db
+            name = getattr(instance, 'property', None)
+            if name:
+                return properties.database(name)
+        return properties.database()
+
+    def db_for_read(self, model, **hints):
+        return self._database(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._database(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Un Guest apunta a su User de 'default'; entre modelos de hotel,
+        # solo dentro de la misma base.
+        if self.is_sharded(type(obj1)) and self.is_sharded(type(obj2)):
+            return obj1._state.db == obj2._state.db
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        shard = db in properties.databases()
+        if db != DEFAULT_DB_ALIAS and not shard:
+            return False
+        if app_label != 'reservations':
+            return db == DEFAULT_DB_ALIAS
+        if model_name in self.SHARED_MODELS:
+            return db == DEFAULT_DB_ALIAS
+        return shard
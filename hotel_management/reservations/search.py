@@ -0,0 +1,77 @@
+import re
+from functools import reduce
+from operator import and_, or_
+from django.db import connections, router
+from django.db.models import Q
+from .db import GUEST_FTS_FIELDS, GUEST_FTS_TABLE
+from .models import Guest
+
+MAX_TERMS = 6
+# bm25 tiene que puntuar cada fila que calza, y con un término frecuente
+# (un nombre común, dos letras) eso son decenas de miles de filas. Si calzan
+# a lo más CANDIDATES huéspedes se ordenan en Python; si calzan más, SQLite
+# rankea todo el conjunto (unos 20 ms con 200.000 huéspedes y un apellido
+# común), para no perder a un huésped antiguo que calza mejor.
+CANDIDATES = 1000
+# Peso de cada columna en bm25, en el orden de GUEST_FTS_FIELDS: un acierto
+# en el nombre pesa más que uno en la dirección.
+GUEST_FTS_WEIGHTS = (10.0, 10.0, 5.0, 5.0, 1.0)
+
+
+def search_terms(text):
+    """
+    Palabras de la búsqueda, tal como las separa el tokenizador (letras y
+    dígitos); lo demás (@, puntos, +) separa palabras.
+    """
+    return re.findall(r'\w+', text or '')[:MAX_TERMS]
+
+
+def match_expression(terms):
+    # Cada palabra entre comillas (así no se interpretan operadores de FTS5)
+    # y con * para buscar por prefijo; todas deben aparecer.
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_guests(text, limit=50):
+    """
+    Huéspedes que calzan con todas las palabras de `text`, por prefijo, en
+    nombre, apellido, correo, teléfono o dirección, del más al menos
+    relevante. En SQLite usa el índice FTS5 (ver db.py); en otros motores
+    cae a icontains, ordenado por apellido.
+
+    Un correo o teléfono completo se busca primero tal cual con su índice
+    único: por FTS5 costaría leer las listas enormes de "gmail" o "com".
+    """
+    terms = search_terms(text)
+    if not terms:
+        return []
+    text = text.strip()
+    if '@' in text or text.lstrip('+').isdigit():
+        exact = list(Guest.objects.filter(Q(email__in={text, text.lower()}) | Q(phone_number=text))[:limit])
+        if exact:
+            return exact
+
+    connection = connections[router.db_for_read(Guest)]
+    if connection.vendor != 'sqlite':
+        matches = [reduce(or_, (Q(**{f'{field}__icontains': term}) for field in GUEST_FTS_FIELDS)) for term in terms]
+        return list(Guest.objects.filter(reduce(and_, matches)).order_by('last_name', 'first_name', 'id')[:limit])
+
+    weights = ', '.join(str(weight) for weight in GUEST_FTS_WEIGHTS)
+    score = f'bm25({GUEST_FTS_TABLE}, {weights})'
+    expression = match_expression(terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid, {score} FROM {GUEST_FTS_TABLE} WHERE {GUEST_FTS_TABLE} MATCH %s LIMIT %s',
+            [expression, CANDIDATES + 1],
+        )
+        rows = cursor.fetchall()
+        if len(rows) <= CANDIDATES:
+            ids = [pk for pk, _ in sorted(rows, key=lambda row: (row[1], -row[0]))[:limit]]
+        else:
+            cursor.execute(
+                f'SELECT rowid FROM {GUEST_FTS_TABLE} WHERE {GUEST_FTS_TABLE} MATCH %s ORDER BY {score}, rowid DESC LIMIT %s',
+                [expression, limit],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+    guests = Guest.objects.using(connection.alias).in_bulk(ids)
+    return [guests[pk] for pk in ids if pk in guests]
@@ -0,0 +1,158 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from . import calendars, catalog, directory, inventory, live, properties, rollups, versions
+from .importing import batched
+from .models import Guest, Promotion, Reservation, Room
+from .pricing import quote_room
+
+# (tipo, peso, rango de precio por noche)
+ROOM_TYPES = (
+    ('Estándar', 55, (40, 70)),
+    ('Doble', 25, (60, 110)),
+    ('Deluxe', 15, (100, 180)),
+    ('Suite', 5, (200, 400)),
+)
+FIRST_NAMES = ('Ana', 'Benjamín', 'Camila', 'Diego', 'Elena', 'Felipe', 'Gabriela', 'Héctor', 'Isidora', 'Joaquín', 'Valentina', 'Tomás', 'Sofía', 'Matías', 'Javiera', 'Martín')
+LAST_NAMES = ('González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda', 'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández', 'Torres')
+
+
+class DataSeeder:
+    """
+    Genera datos sintéticos con distribuciones parecidas a las reales:
+    la mayoría de las habitaciones son estándar, las estadías cortas son
+    las más frecuentes y la ocupación ronda el 70 %. Las reservas de cada
+    habitación se generan recorriendo su calendario, así que nunca se cruzan.
+    """
+
+    def __init__(self, seed=None, start=None, batch_size=5000):
+        self.random = random.Random(seed)
+        self.start = start or date.today() - timedelta(days=365)
+        self.batch_size = batch_size
+
+    def stay_length(self):
+        # Geométrica: ~40 % de una noche, rara vez más de dos semanas.
+        nights = 1
+        while nights < 21 and self.random.random() < 0.6:
+            nights += 1
+        return nights
+
+    def gap_length(self):
+        return 0 if self.random.random() < 0.55 else self.stay_length()
+
+    def promotions(self, count):
+        offset = Promotion.objects.filter(code__startswith='SEED').count()
+        promotions = []
+        for number in range(offset, offset + count):
+            start_date = self.start + timedelta(days=self.random.randrange(0, 540))
+            promotions.append(Promotion(
+                code=f'SEED{number:05d}',
+                description=f'Promoción {number}',
+                discount_percentage=Decimal(self.random.choice((5, 10, 15, 20, 25, 30))),
+                start_date=start_date,
+                end_date=start_date + timedelta(days=self.random.randint(7, 60)),
+            ))
+        Promotion.objects.bulk_create(promotions, batch_size=self.batch_size)
+        catalog.invalidate()
+        versions.bump(Promotion)
+        return promotions
+
+    def rooms(self, count, promotions=()):
+        offset = Room.objects.filter(room_number__startswith='S').count()
+        weights = [weight for _, weight, _ in ROOM_TYPES]
+        rooms = []
+        for number in range(offset, offset + count):
+            room_type, _, (low, high) = self.random.choices(ROOM_TYPES, weights=weights)[0]
+            rooms.append(Room(
+                room_number=f'S{number:04d}',
+                room_type=room_type,
+                description=f'Habitación {room_type.lower()}',
+                price_per_night=Decimal(self.random.randrange(low * 100, high * 100, 50)) / 100,
+                available=self.random.random() > 0.02,
+                promotion=self.random.choice(promotions) if promotions and self.random.random() < 0.3 else None,
+            ))
+        Room.objects.bulk_create(rooms, batch_size=self.batch_size)
+        catalog.invalidate()
+        versions.bump(Room)
+        return rooms
+
+    def guests(self, count):
+        # Los usuarios son compartidos: los de otras propiedades llevan su
+        # nombre delante, así dos seed_data en paralelo no chocan.
+        name = properties.current()
+        prefix = 'seed' if name == settings.DEFAULT_PROPERTY else f'{name}.seed'
+        offset = User.objects.filter(username__startswith=prefix).count()
+        password = make_password(None)
+        created = []
+        for numbers in batched(range(offset, offset + count), self.batch_size):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'{prefix}{number}', email=f'{prefix}{number}@veranum.cl', password=password)
+                    for number in numbers
+                ])
+                guests = []
+                for number, user in zip(numbers, users):
+                    user.first_name = self.random.choice(FIRST_NAMES)
+                    user.last_name = self.random.choice(LAST_NAMES)
+                    guests.append(Guest(
+                        user=user,
+                        first_name=user.first_name,
+                        last_name=user.last_name,
+                        email=user.email,
+                        phone_number=f'+569{number:08d}',
+                        address=f'Calle {self.random.randint(1, 999)} #{self.random.randint(1, 9999)}, Santiago',
+                        has_used_promotion=True,
+                    ))
+                created.extend(Guest.objects.bulk_create(guests))
+        versions.bump(Guest)
+        directory.rebuild()
+        return created
+
+    def reservations(self, count, rooms, guests, promotions=()):
+        """
+        Reparte `count` reservas entre las habitaciones y las escribe por lotes.
+        """
+        if not rooms or not guests:
+            return 0
+        per_room, extra = divmod(count, len(rooms))
+        created = 0
+        pending = []
+        last_night = self.start
+        for index, room in enumerate(rooms):
+            day = self.start + timedelta(days=self.random.randrange(0, 7))
+            for _ in range(per_room + (1 if index < extra else 0)):
+                day += timedelta(days=self.gap_length())
+                check_out_date = day + timedelta(days=self.stay_length())
+                promotion = self.random.choice(promotions) if promotions and self.random.random() < 0.15 else None
+                pending.append(Reservation(
+                    guest=self.random.choice(guests),
+                    room=room,
+                    check_in_date=day,
+                    check_out_date=check_out_date,
+                    promotion=promotion,
+                    total_price=quote_room(room, day, check_out_date, promotion=promotion),
+                ))
+                day = check_out_date
+                last_night = max(last_night, check_out_date - timedelta(days=1))
+                if len(pending) >= self.batch_size:
+                    created += self._write_reservations(pending)
+                    pending = []
+        created += self._write_reservations(pending)
+        # bulk_create no dispara las señales que mantienen el rollup, el
+        # inventario, los sellos de versión, los feeds .ics y la disponibilidad
+        # en vivo.
+        rollups.rebuild(self.start, last_night)
+        inventory.rebuild(self.start, last_night)
+        versions.bump(Reservation)
+        calendars.touch_all()
+        live.publish_reset()
+        return created
+
+    def _write_reservations(self, reservations):
+        with transaction.atomic(using=router.db_for_write(Reservation)):
+            Reservation.objects.bulk_create(reservations)
+        return len(reservations)
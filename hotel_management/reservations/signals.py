@@ -0,0 +1,187 @@
+from django.contrib.auth.models import Group, User
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from . import backends, calendars, catalog, directory, inventory, live, promotions, properties, rollups, versions
+from .models import Guest, Promotion, PromotionRedemption, Reservation, Room
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+def invalidate_catalog(sender, **kwargs):
+    # Se invalida ahora y otra vez al confirmar la transacción: así ninguna
+    # petición concurrente deja en caché datos leídos antes del commit.
+    catalog.invalidate()
+    transaction.on_commit(catalog.invalidate, using=router.db_for_write(sender))
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=Promotion)
+@receiver(post_delete, sender=Promotion)
+@receiver(post_save, sender=Guest)
+@receiver(post_delete, sender=Guest)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def bump_version(sender, **kwargs):
+    versions.bump(sender)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Guest)
+@receiver(post_delete, sender=Guest)
+def forget_cached_user(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.user_id
+    backends.forget_user(user_id)
+    transaction.on_commit(lambda: backends.forget_user(user_id), using=router.db_for_write(sender))
+
+
+@receiver(post_save, sender=Guest)
+def record_in_directory(sender, instance, raw=False, **kwargs):
+    # El directorio está en 'default': se escribe después del commit del
+    # hotel, así nunca lista un huésped que no llegó a guardarse.
+    if not raw:
+        transaction.on_commit(lambda: directory.record(instance), using=router.db_for_write(sender, instance=instance))
+
+
+@receiver(post_delete, sender=Guest)
+def remove_from_directory(sender, instance, **kwargs):
+    # Al confirmarse, delete() ya dejó el pk del objeto en None.
+    name, guest_id = instance.property, instance.pk
+    transaction.on_commit(lambda: directory.forget(name, guest_id), using=router.db_for_write(sender, instance=instance))
+
+
+@receiver(pre_delete, sender=User)
+def delete_guest_profiles(sender, instance, **kwargs):
+    # Guest.user es DO_NOTHING: el huésped se borra aquí, con sus reservas,
+    # en la base de cada propiedad donde el directorio lo tiene (con una
+    # sola propiedad, en la única base). Son transacciones de otras bases:
+    # si luego falla el borrado del usuario, el huésped ya no está.
+    entries = directory.lookup(user=instance)
+    names = {entry.property for entry in entries}
+    if not properties.is_sharded():
+        names.add(properties.current())
+    for name in names:
+        with properties.using(name):
+            Guest.objects.filter(user_id=instance.pk).delete()
+    for entry in entries:
+        directory.forget(entry.property, entry.guest_id)
+
+
+@receiver(post_delete, sender=PromotionRedemption)
+def release_promotion(sender, instance, **kwargs):
+    # Al borrar la reserva (en cascada, su canje) se devuelve el cupo.
+    promotions.release(instance)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def forget_cached_permissions(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        backends.forget_all()
+        transaction.on_commit(backends.forget_all)
+
+
+def stay_of(reservation):
+    return (reservation.room.room_type, reservation.check_in_date, reservation.check_out_date, reservation.total_price)
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_previous_stay(sender, instance, raw=False, **kwargs):
+    # Al modificar una reserva hay que restar lo que aportaba antes.
+    instance._previous_stay = None
+    instance._previous_room_id = None
+    if not raw and instance.pk is not None:
+        previous = Reservation.objects.filter(pk=instance.pk).values_list(
+            'room__room_type', 'check_in_date', 'check_out_date', 'total_price', 'room_id',
+        ).first()
+        if previous:
+            instance._previous_stay, instance._previous_room_id = previous[:4], previous[4]
+
+
+@receiver(post_save, sender=Reservation)
+def update_derived_tables(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_stay', None)
+    current = stay_of(instance)
+    if previous == current:
+        return
+    if previous:
+        rollups.apply_stay(*previous, sign=-1)
+    rollups.apply_stay(*current)
+    # El inventario no depende del precio.
+    if previous is None or previous[:3] != current[:3]:
+        if previous:
+            inventory.apply_stay(*previous[:3], sign=-1)
+        inventory.apply_stay(*current[:3])
+
+
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def touch_room_calendars(sender, instance, raw=False, **kwargs):
+    # Al cambiar de habitación se desactualizan los feeds de ambas.
+    if not raw:
+        calendars.touch({instance.room_id, getattr(instance, '_previous_room_id', None)})
+
+
+@receiver(post_save, sender=Reservation)
+def publish_stay_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_stay', None)
+    previous_room_id = getattr(instance, '_previous_room_id', None)
+    current = (instance.room_id, instance.check_in_date, instance.check_out_date)
+    if previous and (previous_room_id, *previous[1:3]) == current:
+        return
+    if previous:
+        live.publish_stay(previous_room_id, *previous[1:3], booked=False)
+    live.publish_stay(*current, booked=True)
+
+
+@receiver(post_delete, sender=Reservation)
+def publish_stay_release(sender, instance, **kwargs):
+    live.publish_stay(instance.room_id, instance.check_in_date, instance.check_out_date, booked=False)
+
+
+@receiver(post_save, sender=Room)
+def publish_room_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        live.publish_room(instance)
+
+
+@receiver(post_delete, sender=Room)
+def publish_room_removal(sender, instance, **kwargs):
+    live.publish_room(instance, deleted=True)
+
+
+@receiver(post_delete, sender=Reservation)
+def remove_from_derived_tables(sender, instance, **kwargs):
+    stay = stay_of(instance)
+    rollups.apply_stay(*stay, sign=-1)
+    inventory.apply_stay(*stay[:3], sign=-1)
+
+
+@receiver(pre_save, sender=Room)
+def remember_previous_room_type(sender, instance, raw=False, **kwargs):
+    instance._previous_room_type = None
+    if not raw and instance.pk is not None:
+        instance._previous_room_type = Room.objects.filter(pk=instance.pk).values_list('room_type', flat=True).first()
+
+
+@receiver(post_save, sender=Room)
+def move_stays_to_new_room_type(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_room_type', None)
+    if raw or previous is None or previous == instance.room_type:
+        return
+    stays = Reservation.objects.filter(room=instance).values_list('check_in_date', 'check_out_date', 'total_price')
+    with transaction.atomic(using=router.db_for_write(Reservation)):
+        for check_in_date, check_out_date, total_price in stays:
+            rollups.apply_stay(previous, check_in_date, check_out_date, total_price, sign=-1)
+            rollups.apply_stay(instance.room_type, check_in_date, check_out_date, total_price)
+            inventory.apply_stay(previous, check_in_date, check_out_date, sign=-1)
+            inventory.apply_stay(instance.room_type, check_in_date, check_out_date)
@@ -0,0 +1,49 @@
+from django.core.mail import send_mail
+from django.template.loader import render_to_string
+from . import jobs
+from .models import Reservation
+
+SEND_CONFIRMATION = 'reservations.send_confirmation'
+SEND_ROOM_CHANGE = 'reservations.send_room_change'
+
+
+def confirmation_key(reservation_id):
+    return f'confirmation:{reservation_id}'
+
+
+def room_change_key(reservation_id, room_id):
+    return f'room-change:{reservation_id}:{room_id}'
+
+
+@jobs.task(SEND_CONFIRMATION, priority=10)
+def send_confirmation(reservation_id):
+    """
+    Envía al huésped el correo de confirmación de su reserva.
+    """
+    reservation = Reservation.objects.select_related('guest', 'room', 'promotion').filter(pk=reservation_id).first()
+    if reservation is None:
+        # Se canceló antes de que el worker llegara a ella.
+        return
+    body = render_to_string('reservations/emails/reservation_confirmation.txt', {
+        'reservation': reservation,
+        'guest': reservation.guest,
+        'room': reservation.room,
+    })
+    send_mail(f'Reserva confirmada: habitación {reservation.room.room_number}', body, None, [reservation.guest.email])
+
+
+@jobs.task(SEND_ROOM_CHANGE)
+def send_room_change(reservation_id):
+    """
+    Avisa al huésped que su reserva pasó a otra habitación del mismo tipo
+    (ver assignment.apply_plan). Informa la habitación que tiene al enviarse.
+    """
+    reservation = Reservation.objects.select_related('guest', 'room').filter(pk=reservation_id).first()
+    if reservation is None:
+        return
+    body = render_to_string('reservations/emails/room_change.txt', {
+        'reservation': reservation,
+        'guest': reservation.guest,
+        'room': reservation.room,
+    })
+    send_mail(f'Cambio de habitación: ahora la {reservation.room.room_number}', body, None, [reservation.guest.email])
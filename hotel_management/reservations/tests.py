@@ -1,3 +1,1584 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+import random
+import tempfile
+import time
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .booking import BookingError, PromotionAlreadyUsed, RoomUnavailable, book_room, book_room_type
+from .forms import PromotionForm
+from .importing import HotelDataImporter
+from .metrics import registry
+from .middleware import QueryTracker
+from . import archive, assignment, backends, benchmarking, directory, exports, inventory, jobs, live, promotions, properties, rollups, search, tasks
+from .models import DailyRoomTypeStats, Guest, GuestDirectory, Job, Promotion, PromotionRedemption, Reservation, ReservationArchive, Room, RoomCalendar, RoomTypeInventory
+from .pagination import CappedCountPaginator, KeysetPaginator
+from .pricing import quote_rooms
+from .routers import PropertyRouter, ReadWriteRouter
+from .search import search_guests
+from .seeding import DataSeeder
+
+
+def create_guest(username):
+    user = User.objects.create(username=username)
+    return Guest.objects.create(
+        user=user,
+        first_name=username,
+        last_name='Prueba',
+        email=f'{username}@veranum.cl',
+        phone_number=username[-15:],
+    )
+
+
+def create_promotion(code='BIENVENIDA'):
+    return Promotion.objects.create(
+        code=code,
+        discount_percentage=Decimal('10.00'),
+        start_date=date(2000, 1, 1),
+        end_date=date(2100, 1, 1),
+    )
+
+
+def assert_no_overlaps(testcase, room):
+    stays = list(Reservation.objects.filter(room=room).order_by('check_in_date').values_list('check_in_date', 'check_out_date'))
+    for (_, previous_out), (next_in, _) in zip(stays, stays[1:]):
+        testcase.assertLessEqual(previous_out, next_in)
+
+
+class BookingIntegrityTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('huesped')
+        self.room = Room.objects.create(room_number='101', room_type='Doble', price_per_night=Decimal('50.00'))
+        self.check_in = date(2030, 1, 10)
+
+    def test_overlapping_insert_is_rejected_by_database(self):
+        Reservation.objects.create(guest=self.guest, room=self.room, check_in_date=self.check_in, check_out_date=self.check_in + timedelta(days=3))
+        with self.assertRaises(IntegrityError):
+            Reservation.objects.create(guest=self.guest, room=self.room, check_in_date=self.check_in + timedelta(days=2), check_out_date=self.check_in + timedelta(days=5))
+
+    def test_overlapping_update_is_rejected_by_database(self):
+        Reservation.objects.create(guest=self.guest, room=self.room, check_in_date=self.check_in, check_out_date=self.check_in + timedelta(days=3))
+        later = Reservation.objects.create(guest=self.guest, room=self.room, check_in_date=self.check_in + timedelta(days=5), check_out_date=self.check_in + timedelta(days=7))
+        later.check_in_date = self.check_in + timedelta(days=1)
+        with self.assertRaises(IntegrityError):
+            later.save()
+
+    def test_check_out_must_follow_check_in(self):
+        with self.assertRaises(IntegrityError):
+            Reservation.objects.create(guest=self.guest, room=self.room, check_in_date=self.check_in, check_out_date=self.check_in)
+
+    def test_back_to_back_stays_are_allowed(self):
+        book_room(self.guest, self.room, self.check_in, self.check_in + timedelta(days=3))
+        book_room(self.guest, self.room, self.check_in + timedelta(days=3), self.check_in + timedelta(days=4))
+        self.assertEqual(Reservation.objects.count(), 2)
+
+    def test_book_room_rejects_overlap_and_invalid_range(self):
+        book_room(self.guest, self.room, self.check_in, self.check_in + timedelta(days=3))
+        with self.assertRaises(RoomUnavailable):
+            book_room(self.guest, self.room, self.check_in + timedelta(days=1), self.check_in + timedelta(days=2))
+        with self.assertRaises(BookingError):
+            book_room(self.guest, self.room, self.check_in, self.check_in)
+
+    def test_promotion_is_redeemed_with_the_reservation(self):
+        promotion = create_promotion()
+        book_room(self.guest, self.room, self.check_in, self.check_in + timedelta(days=1), promotion=promotion)
+        self.guest.refresh_from_db()
+        self.assertTrue(self.guest.has_used_promotion)
+        with self.assertRaises(PromotionAlreadyUsed):
+            book_room(self.guest, self.room, self.check_in + timedelta(days=5), self.check_in + timedelta(days=6), promotion=promotion)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_failed_booking_does_not_redeem_promotion(self):
+        promotion = create_promotion()
+        other = create_guest('otro')
+        book_room(other, self.room, self.check_in, self.check_in + timedelta(days=3))
+        with self.assertRaises(RoomUnavailable):
+            book_room(self.guest, self.room, self.check_in, self.check_in + timedelta(days=1), promotion=promotion)
+        self.guest.refresh_from_db()
+        self.assertFalse(self.guest.has_used_promotion)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        # Cuatro huéspedes por apellido y dos por nombre: los cortes de página
+        # caen en medio de empates del primer campo.
+        for i in range(23):
+            guest = create_guest(f'pagina{i:02d}')
+            guest.last_name = f'Apellido{i // 4}'
+            guest.first_name = ('Berta', 'Ana')[i % 2]
+            guest.save()
+        self.ordering = ('last_name', 'first_name', 'id')
+        self.expected = list(Guest.objects.order_by(*self.ordering))
+        self.paginator = KeysetPaginator(Guest.objects.all(), self.ordering, per_page=5)
+
+    def walk_forward(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next:
+            pages.append(paginator.page(pages[-1].next_cursor))
+        return pages
+
+    def test_forward_pages_cover_every_row_once(self):
+        pages = self.walk_forward(self.paginator)
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+        self.assertEqual([guest for page in pages for guest in page], self.expected)
+        self.assertFalse(pages[0].has_previous)
+        self.assertTrue(pages[2].has_previous and pages[2].has_next)
+        self.assertFalse(pages[-1].has_next)
+
+    def test_backward_pages_match_forward_pages(self):
+        pages = self.walk_forward(self.paginator)
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.paginator.page(page.previous_cursor)
+            self.assertEqual(list(page), list(expected))
+            self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+
+    def test_descending_ordering_with_ties(self):
+        ordering = ('-last_name', '-first_name', '-id')
+        pages = self.walk_forward(KeysetPaginator(Guest.objects.all(), ordering, per_page=5))
+        self.assertEqual([guest for page in pages for guest in page], list(Guest.objects.order_by(*ordering)))
+
+    def test_seek_is_bounded_on_the_index(self):
+        # Sin la cota del primer campo SQLite recorre guest_name_idx desde el
+        # comienzo (SCAN) y las páginas profundas se vuelven lentas.
+        values = [self.expected[10].last_name, self.expected[10].first_name, self.expected[10].id]
+        queryset = Guest.objects.order_by(*self.ordering).filter(KeysetPaginator._seek(self.ordering, values))
+        self.assertIn('SEARCH', queryset.explain())
+        self.assertEqual(list(queryset), self.expected[11:])
+
+    def test_bad_or_foreign_cursors_fall_back_to_first_page(self):
+        foreign = KeysetPaginator(Guest.objects.all(), ('-id',), per_page=5).page().next_cursor
+        for cursor in ('basura', foreign):
+            self.assertEqual(list(self.paginator.page(cursor)), self.expected[:5])
+
+    def test_archived_rows_are_merged_in_order(self):
+        guest = self.expected[0]
+        rooms = [Room.objects.create(room_number=str(150 + i), room_type='Doble', price_per_night=Decimal('50.00')) for i in range(2)]
+        for day in range(8):
+            # Misma entrada en las dos habitaciones; una de ellas ya archivada.
+            check_in = date(2030, 1, 1) + timedelta(days=day * 2)
+            book_room(guest, rooms[0], check_in, check_in + timedelta(days=1))
+            ReservationArchive.objects.create(
+                id=1000 + day, guest=guest, room=rooms[1], check_in_date=check_in, check_out_date=check_in + timedelta(days=1),
+            )
+        ordering = ('-check_in_date', '-id')
+        paginator = KeysetPaginator(Reservation.objects.all(), ordering, per_page=3, others=[ReservationArchive.objects.all()])
+        pages = self.walk_forward(paginator)
+        merged = [(stay.check_in_date, stay.id) for page in pages for stay in page]
+        self.assertEqual(len(merged), 16)
+        self.assertEqual(merged, sorted(merged, reverse=True))
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = paginator.page(page.previous_cursor)
+            self.assertEqual([stay.id for stay in page], [stay.id for stay in expected])
+
+
+class PricingTests(TestCase):
+
+    def setUp(self):
+        self.promotion = Promotion.objects.create(code='VERANO', discount_percentage=Decimal('10.00'), start_date=date(2030, 1, 3), end_date=date(2030, 1, 4))
+        self.room = Room.objects.create(room_number='201', room_type='Suite', price_per_night=Decimal('99.99'), promotion=self.promotion)
+        self.plain_room = Room.objects.create(room_number='202', room_type='Suite', price_per_night=Decimal('80.00'))
+
+    def test_promotion_applies_only_to_nights_inside_its_window(self):
+        totals = quote_rooms(Room.objects.select_related('promotion'), date(2030, 1, 1), date(2030, 1, 6))
+        # 3 noches a precio completo + 2 noches con 10% (89.991 -> 89.99)
+        self.assertEqual(totals[self.room.pk], Decimal('99.99') * 3 + Decimal('89.99') * 2)
+        self.assertEqual(totals[self.plain_room.pk], Decimal('400.00'))
+
+    def test_booking_stores_quoted_total(self):
+        guest = create_guest('cotizado')
+        first_booking = Promotion.objects.create(code='PRIMERA', discount_percentage=Decimal('50.00'), start_date=date(2030, 1, 1), end_date=date(2030, 1, 1))
+        reservation = book_room(guest, self.plain_room, date(2030, 1, 1), date(2030, 1, 3), promotion=first_booking)
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.total_price, Decimal('120.00'))
+
+
+class PromotionTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('promo')
+        self.room = Room.objects.create(room_number='301', room_type='Doble', price_per_night=Decimal('50.00'))
+        self.promotion = create_promotion('flash')
+
+    def book(self, guest, day, promotion=None):
+        check_in = date(2030, 4, 1) + timedelta(days=day)
+        return book_room(guest, self.room, check_in, check_in + timedelta(days=1), promotion=promotion or self.promotion)
+
+    def test_lookup_ignores_case_and_hides_exhausted_codes(self):
+        self.promotion.max_uses = 1
+        self.promotion.save()
+        self.assertEqual(promotions.lookup(' Flash '), self.promotion)
+        self.book(self.guest, 0)
+        with self.assertRaises(promotions.PromotionExhausted):
+            self.book(create_guest('tarde'), 1)
+        self.assertIsNone(promotions.lookup('FLASH'))
+        self.promotion.refresh_from_db()
+        self.assertEqual(self.promotion.uses_count, 1)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_codes_are_unique_regardless_of_case(self):
+        self.assertEqual(self.promotion.code, 'FLASH')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Promotion.objects.bulk_create([Promotion(code='Flash', discount_percentage=Decimal('5.00'), start_date=date(2030, 1, 1), end_date=date(2030, 12, 31))])
+        form = PromotionForm(data={'code': 'flash', 'discount_percentage': '5', 'start_date': '2030-01-01', 'end_date': '2030-12-31', 'max_uses_per_guest': '1'})
+        self.assertFalse(form.is_valid())
+
+    def test_per_guest_limit_and_release_on_cancel(self):
+        reservation = self.book(self.guest, 0)
+        # Sin la regla de primera reserva, el límite por huésped sigue mandando.
+        Guest.objects.filter(pk=self.guest.pk).update(has_used_promotion=False)
+        self.guest.refresh_from_db()
+        with self.assertRaises(promotions.PromotionLimitReached):
+            self.book(self.guest, 2)
+        self.promotion.refresh_from_db()
+        self.assertEqual(self.promotion.uses_count, 1)
+
+        reservation.delete()
+        self.promotion.refresh_from_db()
+        self.assertEqual(self.promotion.uses_count, 0)
+        self.assertFalse(PromotionRedemption.objects.exists())
+
+    def test_stay_outside_the_window_is_rejected(self):
+        summer = Promotion.objects.create(code='INVIERNO', discount_percentage=Decimal('5.00'), start_date=date(2030, 7, 1), end_date=date(2030, 7, 31))
+        with self.assertRaises(promotions.PromotionNotValid):
+            self.book(self.guest, 0, promotion=summer)
+        self.assertFalse(Reservation.objects.exists())
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('exporta')
+        self.guest.first_name = '=HYPERLINK("http://x","y")'
+        self.guest.last_name = '-Rojas'
+        self.guest.save()
+        self.rooms = [Room.objects.create(room_number=str(160 + i), room_type='Doble', price_per_night=Decimal('50.00')) for i in range(2)]
+        self.first = book_room(self.guest, self.rooms[0], date(2030, 4, 1), date(2030, 4, 3), promotion=create_promotion())
+        self.second = book_room(self.guest, self.rooms[1], date(2030, 4, 10), date(2030, 4, 12))
+        self.client.force_login(User.objects.create(username='exportador', is_staff=True, is_superuser=True))
+
+    def download(self, **params):
+        response = self.client.get('/reservations/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_header_and_neutralizes_formulas(self):
+        response = self.client.get('/reservations/export/')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('reservas.csv', response['Content-Disposition'])
+        lines = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(lines[0], exports.HEADERS)
+        self.assertEqual([line[0] for line in lines[1:]], [str(self.first.pk), str(self.second.pk)])
+        row = dict(zip(lines[0], lines[1]))
+        self.assertEqual(row['guest_first_name'], '\'=HYPERLINK("http://x","y")')
+        self.assertEqual(row['guest_last_name'], "'-Rojas")
+        self.assertEqual(row['total_price'], '90.00')
+        self.assertEqual(row['promotion_code'], 'BIENVENIDA')
+
+    def test_filters_and_ndjson(self):
+        body = self.download(format='ndjson', check_in_from='2030-04-05')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['reservation_id'] for row in rows], [self.second.pk])
+        # En NDJSON los textos van tal cual.
+        self.assertEqual(rows[0]['guest_last_name'], '-Rojas')
+        self.assertEqual(rows[0]['promotion_code'], None)
+        body = self.download(room=self.rooms[0].pk, check_in_to='2030-04-05')
+        self.assertEqual(len(body.splitlines()), 2)
+        self.assertEqual(self.download(check_in_from='2031-01-01').splitlines(), [','.join(exports.HEADERS)])
+
+    def test_export_requires_permission(self):
+        self.client.force_login(self.guest.user)
+        self.assertEqual(self.client.get('/reservations/export/').status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get('/reservations/export/').status_code, 302)
+
+    def test_command_writes_the_same_rows(self):
+        output = io.StringIO()
+        call_command('export_reservations', '--format', 'ndjson', '--from', '2030-04-05', stdout=output)
+        self.assertEqual([json.loads(line)['reservation_id'] for line in output.getvalue().splitlines()], [self.second.pk])
+        output = io.StringIO()
+        call_command('export_reservations', stdout=output)
+        self.assertEqual(output.getvalue(), self.download())
+        with self.assertRaises(CommandError):
+            call_command('export_reservations', '--from', 'ayer', stdout=io.StringIO())
+
+
+class ImportTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.existing = create_guest('existente')
+        self.room = Room.objects.create(room_number='170', room_type='Doble', price_per_night=Decimal('50.00'))
+        book_room(self.existing, self.room, date(2030, 6, 10), date(2030, 6, 12))
+
+    def write(self, name, content):
+        path = Path(self.directory.name) / name
+        path.write_text(content, encoding='utf-8')
+        return str(path)
+
+    def write_files(self):
+        return {
+            'promotions': self.write('promociones.csv', (
+                'code,description,discount_percentage,start_date,end_date\n'
+                'VERANO,,15,2030-01-01,2030-12-31\n'
+                'VERANO,,20,2030-01-01,2030-12-31\n'
+                'ROTA,,mucho,2030-01-01,2030-12-31\n'
+                'AL_REVES,,5,2030-12-31,2030-01-01\n'
+            )),
+            'rooms': self.write('habitaciones.jsonl', (
+                '{"room_number": "171", "room_type": "Suite", "price_per_night": "100.00", "promotion_code": "VERANO"}\n'
+                '{"room_number": "172", "room_type": "Suite", "price_per_night": "120.00", "available": "no"}\n'
+                '{"room_number": "170", "room_type": "Doble", "price_per_night": "50.00"}\n'
+                '{"room_number": "173", "room_type": "Suite", "price_per_night": "90.00", "promotion_code": "NO_EXISTE"}\n'
+                '{"room_number": \n'
+            )),
+            'guests': self.write('huespedes.csv', (
+                'username,password,first_name,last_name,email,phone_number,address\n'
+                'ana,secreto123,Ana,Rojas,ana@veranum.cl,900000001,\n'
+                ',,Luis,Soto,luis@veranum.cl,900000002,Calle 1\n'
+                'otra,,Ana,Otra,existente@veranum.cl,900000003,\n'
+                'mala,,Mala,Correo,no-es-correo,900000004,\n'
+            )),
+            'reservations': self.write('reservas.csv', (
+                'guest_email,room_number,check_in_date,check_out_date,promotion_code,total_price\n'
+                'ana@veranum.cl,171,2030-06-01,2030-06-04,VERANO,\n'
+                'luis@veranum.cl,171,2030-06-03,2030-06-05,,\n'
+                'luis@veranum.cl,170,2030-06-11,2030-06-13,,\n'
+                'luis@veranum.cl,170,2030-06-12,2030-06-14,,80.00\n'
+                'nadie@veranum.cl,171,2030-07-01,2030-07-02,,\n'
+                'luis@veranum.cl,999,2030-07-01,2030-07-02,,\n'
+                'luis@veranum.cl,172,2030-07-05,2030-07-05,,\n'
+            )),
+        }
+
+    def test_import_rejects_bad_rows_and_keeps_the_rest(self):
+        files = self.write_files()
+        importer = HotelDataImporter(batch_size=2)
+        importer.import_promotions(files['promotions'])
+        importer.import_rooms(files['rooms'])
+        importer.import_guests(files['guests'])
+        importer.import_reservations(files['reservations'])
+
+        rejected = {(Path(path).name, line) for path, line, _ in importer.rejected}
+        self.assertEqual(rejected, {
+            ('promociones.csv', 3), ('promociones.csv', 4), ('promociones.csv', 5),
+            ('habitaciones.jsonl', 3), ('habitaciones.jsonl', 4), ('habitaciones.jsonl', 5),
+            ('huespedes.csv', 4), ('huespedes.csv', 5),
+            ('reservas.csv', 3), ('reservas.csv', 4), ('reservas.csv', 6), ('reservas.csv', 7), ('reservas.csv', 8),
+        })
+        self.assertFalse(Room.objects.get(room_number='172').available)
+        self.assertEqual(Room.objects.get(room_number='171').promotion.code, 'VERANO')
+
+        ana = Guest.objects.select_related('user').get(email='ana@veranum.cl')
+        self.assertTrue(ana.user.check_password('secreto123'))
+        luis = Guest.objects.select_related('user').get(email='luis@veranum.cl')
+        self.assertEqual(luis.user.username, 'luis@veranum.cl')
+        self.assertFalse(luis.user.has_usable_password())
+        self.assertEqual(GuestDirectory.objects.filter(email='luis@veranum.cl').count(), 1)
+
+        # El precio que falta se cotiza; el que viene se respeta.
+        stays = {(stay.guest.email, stay.room.room_number): stay for stay in Reservation.objects.select_related('guest', 'room')}
+        self.assertEqual(stays['ana@veranum.cl', '171'].total_price, Decimal('255.00'))
+        self.assertEqual(stays['luis@veranum.cl', '170'].total_price, Decimal('80.00'))
+        for room in Room.objects.all():
+            assert_no_overlaps(self, room)
+
+        # bulk_create no dispara señales: el rollup y el inventario se rehacen.
+        self.assertEqual(DailyRoomTypeStats.objects.get(date=date(2030, 6, 2), room_type='Suite').rooms_sold, 1)
+        counters = sorted(RoomTypeInventory.objects.filter(booked__gt=0).values_list('room_type', 'date', 'booked'))
+        self.assertIn(('Doble', date(2030, 6, 12), 1), counters)
+        inventory.rebuild()
+        self.assertEqual(counters, sorted(RoomTypeInventory.objects.filter(booked__gt=0).values_list('room_type', 'date', 'booked')))
+
+    def test_batch_rejected_by_database_is_retried_row_by_row(self):
+        path = self.write('habitaciones.csv', (
+            'room_number,room_type,price_per_night\n'
+            '180,Doble,50\n'
+            '181,Doble,50\n'
+            '182,Doble,50\n'
+        ))
+        importer = HotelDataImporter(batch_size=10)
+        # Creada después de precargar los mapas: solo la base la rechaza.
+        Room.objects.create(room_number='181', room_type='Doble', price_per_night=Decimal('50.00'))
+        importer.import_rooms(path)
+        self.assertEqual([line for _, line, _ in importer.rejected], [3])
+        self.assertEqual(importer.created, {Room._meta.verbose_name_plural: 2})
+        self.assertEqual(Room.objects.filter(room_number__in=['180', '181', '182']).count(), 3)
+
+    def test_command_writes_rejects_csv(self):
+        files = self.write_files()
+        rejects = Path(self.directory.name) / 'rechazos.csv'
+        output = io.StringIO()
+        call_command(
+            'import_hotel_data', '--promotions', files['promotions'], '--rooms', files['rooms'],
+            '--rejects', str(rejects), stdout=output,
+        )
+        with rejects.open(newline='', encoding='utf-8') as source:
+            lines = list(csv.reader(source))
+        self.assertEqual(lines[0], ['file', 'line', 'error'])
+        self.assertEqual(len(lines), 7)
+        self.assertIn('6 filas rechazadas', output.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('import_hotel_data', stdout=io.StringIO())
+
+
+    def test_rows_rejected_by_the_database_do_not_block_the_room(self):
+        importer = HotelDataImporter(batch_size=1)
+        importer.import_guests(self.write_files()['guests'])
+        self.assertTrue(importer.stays.free(self.room.pk, date(2030, 6, 1), date(2030, 6, 3)))
+        # Una reserva que el importador no vio: el trigger rechaza la primera
+        # fila, y la segunda (libre en la base) tiene que entrar.
+        book_room(self.existing, self.room, date(2030, 6, 1), date(2030, 6, 3))
+        importer.import_reservations(self.write('reservas.csv', (
+            'guest_email,room_number,check_in_date,check_out_date,promotion_code,total_price\n'
+            'luis@veranum.cl,170,2030-06-02,2030-06-05,,\n'
+            'luis@veranum.cl,170,2030-06-04,2030-06-06,,\n'
+        )))
+        rejected = [line for path, line, _ in importer.rejected if Path(path).name == 'reservas.csv']
+        self.assertEqual(rejected, [2])
+        self.assertTrue(Reservation.objects.filter(room=self.room, check_in_date=date(2030, 6, 4)).exists())
+
+class SeedingTests(TestCase):
+
+    def test_seeded_data_is_consistent(self):
+        seeder = DataSeeder(seed=3, start=date(2030, 1, 1), batch_size=40)
+        promotions = seeder.promotions(3)
+        rooms = seeder.rooms(6, promotions)
+        guests = seeder.guests(10)
+        self.assertEqual(seeder.reservations(150, rooms, guests, promotions), 150)
+
+        self.assertEqual(Reservation.objects.count(), 150)
+        self.assertEqual(GuestDirectory.objects.count(), 10)
+        for room in rooms:
+            assert_no_overlaps(self, room)
+        for reservation in Reservation.objects.select_related('room__promotion', 'promotion'):
+            quote = quote_rooms([reservation.room], reservation.check_in_date, reservation.check_out_date, promotion=reservation.promotion)
+            self.assertEqual(reservation.total_price, quote[reservation.room_id])
+
+        stats = sorted(DailyRoomTypeStats.objects.filter(rooms_sold__gt=0).values_list('date', 'room_type', 'rooms_sold', 'revenue'))
+        counters = sorted(RoomTypeInventory.objects.filter(booked__gt=0).values_list('room_type', 'date', 'booked'))
+        self.assertEqual(sum(sold for _, _, sold, _ in stats), sum(booked for _, _, booked in counters))
+        rollups.rebuild()
+        inventory.rebuild()
+        self.assertEqual(stats, sorted(DailyRoomTypeStats.objects.filter(rooms_sold__gt=0).values_list('date', 'room_type', 'rooms_sold', 'revenue')))
+        self.assertEqual(counters, sorted(RoomTypeInventory.objects.filter(booked__gt=0).values_list('room_type', 'date', 'booked')))
+
+
+class BenchmarkTests(TestCase):
+
+    def setUp(self):
+        seeder = DataSeeder(seed=1)
+        seeder.reservations(20, seeder.rooms(4), seeder.guests(4))
+
+    def test_refuses_to_run_without_debug(self):
+        with self.assertRaises(CommandError):
+            call_command('bench_views', '--requests', '1', stdout=io.StringIO())
+        self.assertFalse(User.objects.filter(username=benchmarking.BENCH_STAFF).exists())
+
+    @override_settings(DEBUG=True)
+    def test_bench_staff_only_reads(self):
+        User.objects.create(username=benchmarking.BENCH_STAFF, is_staff=True, is_superuser=True)
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'bench.json'
+            call_command('bench_views', '--requests', '1', '--output', str(output), stdout=io.StringIO())
+            results = json.loads(output.read_text(encoding='utf-8'))
+        self.assertEqual({summary['status_codes']['200'] for summary in results['endpoints'].values()}, {1})
+        staff = User.objects.get(username=benchmarking.BENCH_STAFF)
+        self.assertFalse(staff.is_superuser)
+        self.assertFalse(staff.has_usable_password())
+        self.assertFalse(staff.has_perm('reservations.add_room'))
+        self.assertTrue(staff.has_perm('reservations.view_reservation'))
+
+
+class RollupTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('rollup')
+        self.room = Room.objects.create(room_number='401', room_type='Suite', price_per_night=Decimal('100.00'))
+        self.other = Room.objects.create(room_number='402', room_type='Doble', price_per_night=Decimal('50.00'))
+
+    def snapshot(self):
+        return sorted(DailyRoomTypeStats.objects.filter(rooms_sold__gt=0).values_list('date', 'room_type', 'rooms_sold', 'revenue'))
+
+    def assert_matches_rebuild(self):
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_revenue_is_spread_exactly(self):
+        self.assertEqual(rollups.spread_revenue(Decimal('100.00'), 3), [Decimal('33.34'), Decimal('33.33'), Decimal('33.33')])
+
+    def test_rollup_follows_create_change_and_delete(self):
+        reservation = book_room(self.guest, self.room, date(2030, 5, 1), date(2030, 5, 4))
+        book_room(self.guest, self.other, date(2030, 5, 2), date(2030, 5, 3))
+        self.assertEqual(DailyRoomTypeStats.objects.get(date=date(2030, 5, 2), room_type='Suite').revenue, Decimal('100.00'))
+        self.assert_matches_rebuild()
+
+        reservation.room = self.other
+        reservation.check_in_date = date(2030, 5, 3)
+        reservation.save()
+        self.assert_matches_rebuild()
+
+        self.other.room_type = 'Familiar'
+        self.other.save()
+        self.assert_matches_rebuild()
+
+        reservation.delete()
+        self.assert_matches_rebuild()
+        self.assertEqual(self.snapshot(), [(date(2030, 5, 2), 'Familiar', 1, Decimal('50.00'))])
+
+
+class InventoryTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('inventario')
+        self.rooms = [
+            Room.objects.create(room_number=str(500 + i), room_type='Deluxe', price_per_night=Decimal('120.00'))
+            for i in range(2)
+        ]
+
+    def counters(self):
+        return sorted(RoomTypeInventory.objects.filter(booked__gt=0).values_list('room_type', 'date', 'booked'))
+
+    def test_counters_follow_bookings_and_match_rebuild(self):
+        first = book_room_type(self.guest, 'Deluxe', date(2030, 7, 1), date(2030, 7, 3))
+        second = book_room_type(self.guest, 'Deluxe', date(2030, 7, 2), date(2030, 7, 4))
+        self.assertNotEqual(first.room, second.room)
+        self.assertEqual(inventory.vacancies(date(2030, 7, 1), date(2030, 7, 4)), {'Deluxe': 0})
+        with self.assertRaises(RoomUnavailable):
+            book_room_type(self.guest, 'Deluxe', date(2030, 7, 2), date(2030, 7, 3))
+
+        first.delete()
+        self.assertEqual(inventory.vacancies(date(2030, 7, 1), date(2030, 7, 3), room_type='Deluxe'), {'Deluxe': 1})
+        incremental = self.counters()
+        inventory.rebuild()
+        self.assertEqual(incremental, self.counters())
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def test_reserve_from_search_assigns_a_room(self):
+        self.guest.has_used_promotion = True
+        self.guest.save()
+        self.client.force_login(self.guest.user)
+        response = self.client.post('/rooms/search/reserve/', {
+            'booking-room_type': 'Deluxe',
+            'booking-check_in_date': '2030-09-01',
+            'booking-check_out_date': '2030-09-03',
+        })
+        self.assertRedirects(response, '/user_reservations/', fetch_redirect_response=False)
+        self.assertEqual(Reservation.objects.get(guest=self.guest).room, self.rooms[0])
+
+    def test_no_single_room_free_for_the_whole_stay(self):
+        # Cada noche queda una habitación libre, pero no la misma.
+        book_room(self.guest, self.rooms[0], date(2030, 8, 1), date(2030, 8, 2))
+        book_room(self.guest, self.rooms[1], date(2030, 8, 2), date(2030, 8, 3))
+        self.assertEqual(inventory.vacancies(date(2030, 8, 1), date(2030, 8, 3)), {'Deluxe': 1})
+        with self.assertRaises(RoomUnavailable):
+            book_room_type(self.guest, 'Deluxe', date(2030, 8, 1), date(2030, 8, 3))
+
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('archivo')
+        self.room = Room.objects.create(room_number='501', room_type='Suite', price_per_night=Decimal('100.00'))
+        self.promotion = create_promotion()
+        self.old = [
+            book_room(self.guest, self.room, date(2020, 1, 1) + timedelta(days=3 * i), date(2020, 1, 3) + timedelta(days=3 * i), promotion=self.promotion if i == 0 else None)
+            for i in range(5)
+        ]
+        self.recent = book_room(self.guest, self.room, date(2030, 1, 1), date(2030, 1, 3))
+
+    def derived(self):
+        return (
+            sorted(DailyRoomTypeStats.objects.values_list('date', 'room_type', 'rooms_sold', 'revenue')),
+            sorted(RoomTypeInventory.objects.filter(booked__gt=0).values_list('room_type', 'date', 'booked')),
+        )
+
+    def test_archive_moves_old_stays_in_batches_and_keeps_history(self):
+        before = self.derived()
+        self.assertEqual(archive.archive(date(2025, 1, 1), batch_size=2), 5)
+        self.assertEqual(list(Reservation.objects.all()), [self.recent])
+        self.assertEqual(ReservationArchive.objects.count(), 5)
+        self.assertEqual(archive.archive(date(2025, 1, 1)), 0)
+
+        # El rollup, el inventario y el cupo de la promoción no cambian, y
+        # al recalcular se leen también las archivadas.
+        self.assertEqual(self.derived(), before)
+        rollups.rebuild()
+        inventory.rebuild()
+        self.assertEqual(self.derived(), before)
+        self.promotion.refresh_from_db()
+        self.assertEqual(self.promotion.uses_count, 1)
+
+        archived = ReservationArchive.objects.get(pk=self.old[0].pk)
+        self.assertEqual((archived.promotion, archived.total_price), (self.promotion, self.old[0].total_price))
+        self.assertEqual(archived.property, self.old[0].property)
+        self.assertEqual(archived.redemption.reservation, None)
+        rows = list(exports.export_rows(history=True))
+        self.assertEqual([row[0] for row in rows], sorted(reservation.pk for reservation in self.old + [self.recent]))
+        self.assertEqual(len(list(exports.export_rows())), 1)
+
+        output = io.StringIO()
+        call_command('export_reservations', '--format', 'ndjson', '--history', stdout=output)
+        self.assertEqual(len(output.getvalue().splitlines()), 6)
+
+    def test_command_archives_in_batches(self):
+        output = io.StringIO()
+        call_command('archive_reservations', '--days', '0', '--batch-size', '2', '--dry-run', stdout=output)
+        self.assertTrue(output.getvalue().startswith('5 reservas'))
+        self.assertEqual(ReservationArchive.objects.count(), 0)
+        output = io.StringIO()
+        call_command('archive_reservations', '--days', '0', '--batch-size', '2', stdout=output)
+        self.assertTrue(output.getvalue().startswith('5 reservas'))
+        self.assertEqual(list(Reservation.objects.all()), [self.recent])
+        with self.assertRaises(CommandError):
+            call_command('archive_reservations', '--batch-size', '0', stdout=io.StringIO())
+
+    def test_archived_redemptions_still_count_for_the_guest_limit(self):
+        archive.archive(date(2025, 1, 1))
+        # El flag has_used_promotion se puede limpiar a mano; el límite de la
+        # promoción tiene que seguir valiendo por sí solo.
+        with self.assertRaises(promotions.PromotionLimitReached), transaction.atomic():
+            promotions.redeem(self.promotion, self.guest, self.recent)
+        self.promotion.refresh_from_db()
+        self.assertEqual(self.promotion.uses_count, 1)
+        self.assertEqual(PromotionRedemption.objects.filter(promotion=self.promotion, guest=self.guest).count(), 1)
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def test_lists_union_archived_stays_on_request(self):
+        archive.archive(date(2025, 1, 1))
+        self.client.force_login(self.guest.user)
+        response = self.client.get('/user_reservations/')
+        self.assertEqual(list(response.context['reservations']), [self.recent])
+        response = self.client.get('/user_reservations/?history=1')
+        self.assertEqual(len(response.context['reservations']), 6)
+
+        self.client.force_login(User.objects.create(username='historial', is_staff=True, is_superuser=True))
+        response = self.client.get('/reservations/', {'sort': 'check_in_date', 'history': 'on'})
+        dates = [reservation.check_in_date for reservation in response.context['reservations']]
+        self.assertEqual(dates, sorted(reservation.check_in_date for reservation in self.old + [self.recent]))
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], CALENDAR_FEED_TOKEN='secreto')
+class CalendarFeedTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('calendario')
+        self.room_a, self.room_b = [
+            Room.objects.create(room_number=str(900 + i), room_type='Suite', price_per_night=Decimal('120.00'))
+            for i in range(2)
+        ]
+        self.check_in = date.today() + timedelta(days=10)
+        self.stay = book_room(self.guest, self.room_a, self.check_in, self.check_in + timedelta(days=2))
+
+    def get(self, url, **headers):
+        return self.client.get(url, {'token': 'secreto'}, headers=headers)
+
+    def test_room_feed_is_rebuilt_only_when_its_reservations_change(self):
+        self.assertEqual(self.client.get('/calendars/rooms/900.ics').status_code, 403)
+        response = self.get('/calendars/rooms/900.ics')
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn(f'DTSTART;VALUE=DATE:{self.check_in:%Y%m%d}', body)
+        self.assertNotIn('calendario', body)
+        etag = response['ETag']
+
+        # Sin cambios: 304 con una consulta a RoomCalendar.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get('/calendars/rooms/900.ics', if_none_match=etag).status_code, 304)
+
+        self.get('/calendars/rooms/901.ics')
+        other = RoomCalendar.objects.get(room=self.room_b)
+        later = self.check_in + timedelta(days=5)
+        book_room(self.guest, self.room_a, later, later + timedelta(days=1))
+        response = self.get('/calendars/rooms/900.ics', if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'DTSTART;VALUE=DATE:{later:%Y%m%d}', response.content.decode())
+        self.get('/calendars/rooms/901.ics')
+        self.assertEqual(RoomCalendar.objects.get(room=self.room_b).built_version, other.built_version)
+
+    def test_moving_a_stay_updates_both_rooms_and_the_type_feed(self):
+        type_etag = self.get('/calendars/types/Suite.ics')['ETag']
+        self.stay.room = self.room_b
+        self.stay.save()
+        self.assertNotIn('VEVENT', self.get('/calendars/rooms/900.ics').content.decode())
+        self.assertIn('VEVENT', self.get('/calendars/rooms/901.ics').content.decode())
+        response = self.get('/calendars/types/Suite.ics', if_none_match=type_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode().count('BEGIN:VEVENT'), 1)
+        self.assertEqual(self.get('/calendars/types/Nada.ics').status_code, 404)
+
+
+class AssignmentTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('asignacion')
+        self.room_a, self.room_b = [
+            Room.objects.create(room_number=str(600 + i), room_type='Suite', price_per_night=Decimal('250.00'))
+            for i in range(2)
+        ]
+
+    def stay(self, room, first, last, **kwargs):
+        return book_room(self.guest, room, date(2030, 7, first), date(2030, 7, last), **kwargs)
+
+    def test_repacking_closes_short_gaps_and_swaps_rooms(self):
+        # A: 1-3, 4-6 y B: 3-5, 6-8 (fija) dejan dos huecos de una noche.
+        # Para cerrarlos, 4-6 y 3-5 tienen que intercambiar habitación.
+        self.stay(self.room_a, 1, 3)
+        moved_to_b = self.stay(self.room_a, 4, 6)
+        moved_to_a = self.stay(self.room_b, 3, 5)
+        locked = self.stay(self.room_b, 6, 8, room_locked=True)
+        counters = sorted(RoomTypeInventory.objects.values_list('date', 'booked'))
+
+        result = assignment.plan(date(2030, 7, 1), date(2030, 7, 31), today=date(2030, 6, 30))
+        self.assertEqual(result.room_types['Suite']['before']['short_gaps'], 2)
+        self.assertEqual(result.room_types['Suite']['after']['short_gaps'], 0)
+        self.assertEqual(sorted(result.moves), sorted([
+            (moved_to_b.pk, self.room_a.pk, self.room_b.pk),
+            (moved_to_a.pk, self.room_b.pk, self.room_a.pk),
+        ]))
+        self.assertEqual(assignment.apply_plan(result), 2)
+        self.assertEqual(result.skipped, 0)
+
+        moved_to_a.refresh_from_db()
+        moved_to_b.refresh_from_db()
+        locked.refresh_from_db()
+        self.assertEqual((moved_to_a.room, moved_to_a.check_in_date), (self.room_a, date(2030, 7, 3)))
+        self.assertEqual((moved_to_b.room, moved_to_b.check_out_date), (self.room_b, date(2030, 7, 6)))
+        self.assertEqual(locked.room, self.room_b)
+        self.assertEqual(counters, sorted(RoomTypeInventory.objects.values_list('date', 'booked')))
+        self.assertEqual(assignment.plan(date(2030, 7, 1), date(2030, 7, 31), today=date(2030, 6, 30)).moves, [])
+
+        # Cada huésped movido recibe un aviso con su habitación nueva.
+        notices = Job.objects.filter(task=tasks.SEND_ROOM_CHANGE)
+        self.assertEqual(sorted(job.payload['reservation_id'] for job in notices), sorted([moved_to_a.pk, moved_to_b.pk]))
+        jobs.run_pending()
+        bodies = [message.body for message in mail.outbox if message.subject.startswith('Cambio de habitación')]
+        self.assertEqual(len(bodies), 2)
+        self.assertTrue(any('601' in body and '04/07/2030' in body for body in bodies))
+
+    def plan_swap(self):
+        self.stay(self.room_a, 1, 3)
+        moved_to_b = self.stay(self.room_a, 4, 6)
+        moved_to_a = self.stay(self.room_b, 3, 5)
+        self.stay(self.room_b, 6, 8, room_locked=True)
+        result = assignment.plan(date(2030, 7, 1), date(2030, 7, 31), today=date(2030, 6, 30))
+        self.assertEqual(len(result.moves), 2)
+        return result, moved_to_a, moved_to_b
+
+    def test_stays_changed_after_planning_are_left_alone(self):
+        result, moved_to_a, moved_to_b = self.plan_swap()
+        # Entre plan() y apply_plan() se cancela una de las dos.
+        moved_to_a.delete()
+        self.assertEqual(assignment.apply_plan(result), 1)
+        self.assertEqual(result.skipped, 1)
+        moved_to_b.refresh_from_db()
+        self.assertEqual(moved_to_b.room, self.room_b)
+        self.assertEqual(list(Job.objects.filter(task=tasks.SEND_ROOM_CHANGE).values_list('payload', flat=True)), [{'reservation_id': moved_to_b.pk}])
+
+    def test_changed_dates_that_break_the_swap_abort_everything(self):
+        result, moved_to_a, moved_to_b = self.plan_swap()
+        # moved_to_b ya no coincide con el plan y se queda en A, donde iba
+        # moved_to_a: el trigger rechaza el cruce y no se mueve nada.
+        moved_to_b.check_out_date = date(2030, 7, 5)
+        moved_to_b.save()
+        stays = sorted(Reservation.objects.values_list('pk', 'room_id', 'check_in_date', 'check_out_date'))
+        with self.assertRaises(IntegrityError):
+            assignment.apply_plan(result)
+        self.assertEqual(sorted(Reservation.objects.values_list('pk', 'room_id', 'check_in_date', 'check_out_date')), stays)
+        self.assertFalse(Job.objects.filter(task=tasks.SEND_ROOM_CHANGE).exists())
+
+    def test_stays_already_started_are_not_moved(self):
+        self.stay(self.room_a, 1, 3)
+        self.stay(self.room_a, 4, 6)
+        self.stay(self.room_b, 3, 5)
+        self.stay(self.room_b, 6, 8, room_locked=True)
+        result = assignment.plan(date(2030, 7, 1), date(2030, 7, 31), today=date(2030, 7, 4))
+        self.assertEqual(result.moves, [])
+        self.assertTrue(result.room_types['Suite']['skipped'])
+
+
+class GuestSearchTests(TestCase):
+
+    def setUp(self):
+        self.gonzalez = create_guest('busqueda1')
+        self.gonzalez.first_name, self.gonzalez.last_name = 'Ana', 'González'
+        self.gonzalez.save()
+        self.munoz = create_guest('busqueda2')
+        self.munoz.first_name, self.munoz.last_name, self.munoz.address = 'Tomás', 'Muñoz', 'Calle Ana 123'
+        self.munoz.save()
+
+    def test_prefix_search_ignores_accents_and_ranks_names_first(self):
+        self.assertEqual(search_guests('gonz'), [self.gonzalez])
+        self.assertEqual(search_guests('MUNOZ tom'), [self.munoz])
+        self.assertEqual(search_guests('ana'), [self.gonzalez, self.munoz])
+        self.assertEqual(search_guests('busqueda2@veranum.cl'), [self.munoz])
+        self.assertEqual(search_guests('"*) OR ('), [])
+
+    def test_older_best_match_is_found_among_many_matches(self):
+        users = User.objects.bulk_create([User(username=f'garcia{i}') for i in range(search.CANDIDATES + 1)])
+        Guest.objects.bulk_create([
+            Guest(user=user, first_name='Luis', last_name='García', email=f'{user.username}@veranum.cl', phone_number=f'7{i:08}', address='Pasaje Ana')
+            for i, user in enumerate(users)
+        ])
+        self.gonzalez.last_name = 'González García'
+        self.gonzalez.save()
+        self.assertEqual(search_guests('ana garcia', limit=1), [self.gonzalez])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.gonzalez.last_name = 'Rojas'
+        self.gonzalez.save()
+        self.assertEqual(search_guests('gonz'), [])
+        self.assertEqual(search_guests('rojas'), [self.gonzalez])
+        self.gonzalez.delete()
+        self.assertEqual(search_guests('ana'), [self.munoz])
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def test_search_endpoint(self):
+        self.client.force_login(User.objects.create(username='recepcion', is_staff=True, is_superuser=True))
+        response = self.client.get('/guests/search/', {'q': 'muñ'})
+        self.assertEqual([guest['id'] for guest in response.json()['results']], [self.munoz.pk])
+        response = self.client.get('/guests/', {'q': 'gonzalez'})
+        self.assertEqual(list(response.context['guests']), [self.gonzalez])
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.client.force_login(User.objects.create(username='personal', is_staff=True, is_superuser=True))
+
+    def test_requests_are_recorded_per_view(self):
+        self.client.get('/rooms/')
+        self.client.get('/rooms/')
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('veranum_request_duration_seconds_count{view="room_list"} 2', body)
+        self.assertIn('veranum_requests_total{view="room_list",status="200"} 2', body)
+        self.assertIn('veranum_request_queries_bucket{view="room_list",le="+Inf"} 2', body)
+
+    @override_settings(METRICS_TOKEN='secreto')
+    def test_metrics_are_restricted(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.client.logout()
+        # Detrás del proxy todo llega desde loopback: la dirección no basta.
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer otro').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+        with self.settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+    def test_sql_is_kept_only_after_the_slow_threshold(self):
+        fast = QueryTracker(capture_after=time.perf_counter() + 60)
+        slow = QueryTracker(capture_after=time.perf_counter())
+        with connection.execute_wrapper(fast), connection.execute_wrapper(slow):
+            Room.objects.count()
+        self.assertEqual((fast.count, fast.statements), (1, []))
+        self.assertEqual((slow.count, len(slow.statements)), (1, 1))
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('reservations.slow_requests') as logs:
+            self.client.get('/rooms/')
+        self.assertIn('reservations_room', logs.output[0])
+
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class JobTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('correo')
+        self.room = Room.objects.create(room_number='701', room_type='Doble', price_per_night=Decimal('50.00'))
+
+    def test_booking_queues_confirmation_email(self):
+        reservation = book_room(self.guest, self.room, date(2030, 5, 1), date(2030, 5, 3))
+        self.assertEqual(mail.outbox, [])
+        job = Job.objects.get()
+        self.assertEqual(job.payload, {'reservation_id': reservation.pk})
+        # Encolar de nuevo con la misma clave no duplica el trabajo.
+        self.assertEqual(jobs.enqueue(job.task, job.payload, key=job.idempotency_key).pk, job.pk)
+
+        self.assertEqual(jobs.run_pending(), {Job.DONE: 1})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.guest.email])
+        self.assertIn('701', mail.outbox[0].body)
+        self.assertEqual(jobs.run_pending(), {})
+
+    def test_failed_jobs_are_retried_by_priority_until_max_attempts(self):
+        calls = []
+
+        def flaky(label):
+            calls.append(label)
+            raise RuntimeError(label)
+
+        jobs.task('tests.flaky', max_attempts=2)(flaky)
+        self.addCleanup(jobs.TASKS.pop, 'tests.flaky')
+        low = jobs.enqueue('tests.flaky', {'label': 'baja'})
+        high = jobs.enqueue('tests.flaky', {'label': 'alta'}, priority=5)
+
+        self.assertEqual(jobs.run_pending(), {Job.PENDING: 2})
+        self.assertEqual(calls, ['alta', 'baja'])
+        # El reintento espera; se adelanta para no dormir en el test.
+        Job.objects.update(run_at=low.run_at)
+        self.assertEqual(jobs.run_pending(), {Job.FAILED: 2})
+        high.refresh_from_db()
+        self.assertEqual(high.attempts, 2)
+        self.assertIn('RuntimeError: alta', high.last_error)
+        self.assertEqual(jobs.run_pending(), {})
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class AdminTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create(username='admin', is_staff=True, is_superuser=True))
+        self.promotion = create_promotion()
+        self.added = 0
+
+    def add_reservations(self, count):
+        for _ in range(count):
+            self.added += 1
+            guest = create_guest(f'admin{self.added}')
+            room = Room.objects.create(room_number=str(800 + self.added), room_type='Suite', price_per_night=Decimal('90.00'), promotion=self.promotion)
+            book_room(guest, room, date(2030, 2, 1), date(2030, 2, 3))
+
+    def test_changelists_cost_a_fixed_number_of_queries(self):
+        urls = [
+            '/admin/reservations/reservation/',
+            '/admin/reservations/reservation/?room_type=Suite&check_in_date__gte=2030-01-01',
+            '/admin/reservations/guest/',
+            '/admin/reservations/guest/?q=admin1',
+            '/admin/reservations/room/',
+            '/admin/reservations/promotion/',
+        ]
+        self.add_reservations(3)
+        counts = {}
+        for url in urls:
+            # La primera visita llena el caché del catálogo y de la sesión.
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            counts[url] = len(queries)
+        self.add_reservations(12)
+        for url in urls:
+            self.client.get(url)
+            with self.assertNumQueries(counts[url]):
+                self.client.get(url)
+
+    def test_capped_count_is_cached_until_the_data_changes(self):
+        self.add_reservations(2)
+        reservations = Reservation.objects.order_by('-id')
+        self.assertEqual(CappedCountPaginator(reservations, 10).count, 2)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(CappedCountPaginator(reservations, 10).count, 2)
+        self.assertEqual([query for query in queries if 'COUNT' in query['sql']], [])
+        # Cada filtro tiene su propio conteo.
+        self.assertEqual(CappedCountPaginator(reservations.filter(room__room_number='801'), 10).count, 1)
+        self.add_reservations(1)
+        self.assertEqual(CappedCountPaginator(reservations, 10).count, 3)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.client.force_login(User.objects.create(username='recepcion', is_staff=True, is_superuser=True))
+        self.room = Room.objects.create(room_number='701', room_type='Doble', price_per_night=Decimal('60.00'))
+
+    def test_unchanged_list_answers_304_without_reading_data_tables(self):
+        etag = self.client.get('/rooms/')['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/rooms/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse([query for query in queries if 'reservations_room' in query['sql']])
+
+        self.room.price_per_night = Decimal('65.00')
+        self.room.save()
+        response = self.client.get('/rooms/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_depends_on_user_and_reservations(self):
+        guest = create_guest('condicional')
+        etag = self.client.get('/user_dashboard/')['ETag']
+        self.client.force_login(guest.user)
+        self.assertEqual(self.client.get('/user_dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get('/user_dashboard/')['ETag']
+        self.assertEqual(self.client.get('/user_dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        book_room(guest, self.room, date.today(), date.today() + timedelta(days=1))
+        self.assertEqual(self.client.get('/user_dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_logging_in_again_is_not_answered_with_the_old_page(self):
+        # La página vieja lleva un token CSRF que ya no sirve después de
+        # volver a iniciar sesión: reservar desde ella daría 403.
+        guest = create_guest('reingreso')
+        guest.user.set_password('clave-reingreso-1')
+        guest.user.save()
+        client = Client(enforce_csrf_checks=True)
+
+        def post(path, data=None):
+            return client.post(path, {**(data or {}), 'csrfmiddlewaretoken': client.cookies['csrftoken'].value})
+
+        def log_in():
+            client.get('/login/')
+            self.assertEqual(post('/login/', {'username': 'reingreso', 'password': 'clave-reingreso-1'}).status_code, 302)
+
+        log_in()
+        etag = client.get('/user_dashboard/')['ETag']
+        self.assertEqual(client.get('/user_dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        post('/accounts/logout/')
+        log_in()
+        response = client.get('/user_dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(client.get('/user_dashboard/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        # El formulario de la página nueva sí se acepta.
+        check_in = date.today() + timedelta(days=5)
+        response = post('/reservations/new/', {
+            'room': self.room.pk, 'check_in_date': check_in, 'check_out_date': check_in + timedelta(days=1), 'promotion': create_promotion().pk,
+        })
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class CachedAuthTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('sesion')
+        self.client.force_login(self.guest.user)
+
+    def auth_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        return response, [query['sql'] for query in queries if 'auth_user' in query['sql'] or 'reservations_guest' in query['sql']]
+
+    def test_user_and_guest_come_from_cache(self):
+        self.client.get('/user_reservations/')
+        response, queries = self.auth_queries('/user_reservations/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_changes_invalidate_the_cached_user(self):
+        self.client.get('/user_reservations/')
+        room = Room.objects.create(room_number='801', room_type='Suite', price_per_night=Decimal('200.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            book_room(self.guest, room, date(2030, 3, 1), date(2030, 3, 2), promotion=create_promotion())
+        response, queries = self.auth_queries('/user_reservations/')
+        self.assertTrue(response.wsgi_request.user.guest.has_used_promotion)
+        self.assertTrue(queries)
+
+        self.guest.user.is_active = False
+        self.guest.user.save()
+        self.assertEqual(self.client.get('/user_reservations/').status_code, 302)
+
+    def test_deleting_the_user_deletes_the_guest(self):
+        room = Room.objects.create(room_number='802', room_type='Suite', price_per_night=Decimal('200.00'))
+        book_room(self.guest, room, date(2030, 3, 1), date(2030, 3, 2))
+        self.guest.user.delete()
+        self.assertFalse(Guest.objects.filter(pk=self.guest.pk).exists())
+        self.assertFalse(Reservation.objects.exists())
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_password_hash_is_not_cached(self):
+        self.guest.user.set_password('clave')
+        self.guest.user.save()
+        self.client.force_login(self.guest.user)
+        self.client.get('/user_reservations/')
+        key = backends.USER_KEY.format(properties.current(), self.guest.user.pk)
+        entry = caches[settings.AUTH_CACHE_ALIAS].get(key, version=backends._version())
+        self.assertNotIn(self.guest.user.password.encode(), pickle.dumps(entry))
+
+        # El usuario en caché se puede guardar sin perder la contraseña, y un
+        # cambio de contraseña sigue cerrando las demás sesiones.
+        response, queries = self.auth_queries('/user_reservations/')
+        self.assertEqual(queries, [])
+        cached = response.wsgi_request.user
+        cached.first_name = 'Otro'
+        with self.captureOnCommitCallbacks(execute=True):
+            cached.save()
+        self.assertEqual(User.objects.get(pk=cached.pk).password, self.guest.user.password)
+        self.assertEqual(self.client.get('/user_reservations/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.guest.user.set_password('nueva-clave')
+            self.guest.user.save()
+        self.assertEqual(self.client.get('/user_reservations/').status_code, 302)
+
+@override_settings(ROOT_URLCONF='hotel_management.asgi_urls', ALLOWED_HOSTS=['testserver'])
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('asincrono')
+        self.room = Room.objects.create(room_number='301', room_type='Doble', price_per_night=Decimal('60.00'))
+        self.taken = Room.objects.create(room_number='302', room_type='Doble', price_per_night=Decimal('60.00'))
+        Reservation.objects.create(guest=self.guest, room=self.taken, check_in_date=date(2030, 2, 1), check_out_date=date(2030, 2, 5))
+
+    async def test_async_views_match_sync_results(self):
+        await self.async_client.aforce_login(self.guest.user)
+        search = {'check_in_date': '2030-02-02', 'check_out_date': '2030-02-04'}
+        response = await self.async_client.get('/rooms/search/', search)
+        self.assertEqual([room.pk for room in response.context['rooms']], [self.room.pk])
+        self.assertEqual(response.context['rooms'][0].stay_total, Decimal('120.00'))
+
+        response = await self.async_client.get('/user_dashboard/', search)
+        self.assertEqual([room.pk for room in response.context['rooms']], [self.room.pk])
+
+        response = await self.async_client.get('/user_reservations/')
+        self.assertEqual([reservation.room.room_number for reservation in response.context['reservations']], ['302'])
+
+    async def test_async_dashboard_answers_304(self):
+        await self.async_client.aforce_login(self.guest.user)
+        etag = (await self.async_client.get('/user_dashboard/'))['ETag']
+        response = await self.async_client.get('/user_dashboard/', headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_async_views_require_login(self):
+        response = await self.async_client.get('/user_dashboard/')
+        self.assertEqual(response.status_code, 302)
+
+    async def test_staff_without_guest_profile_see_an_empty_list(self):
+        staff = await User.objects.acreate(username='recepcion', is_staff=True)
+        await self.async_client.aforce_login(staff)
+        response = await self.async_client.get('/user_reservations/', {'history': '1'})
+        self.assertEqual((response.status_code, response.context['reservations']), (200, []))
+        with override_settings(ROOT_URLCONF='hotel_management.urls'):
+            await sync_to_async(self.client.force_login)(staff)
+            response = await sync_to_async(self.client.get)('/user_reservations/', {'history': '1'})
+        self.assertEqual((response.status_code, response.context['reservations']), (200, []))
+
+
+@override_settings(ROOT_URLCONF='hotel_management.asgi_urls', ALLOWED_HOSTS=['testserver'])
+class LiveAvailabilityTests(TestCase):
+
+    def setUp(self):
+        self.guest = create_guest('envivo')
+        self.room = Room.objects.create(room_number='401', room_type='Doble', price_per_night=Decimal('60.00'))
+
+    def book(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Reservation.objects.create(guest=self.guest, room=self.room, check_in_date=date(2030, 3, 1), check_out_date=date(2030, 3, 3))
+
+    async def test_committed_bookings_reach_subscribers(self):
+        stream = live.stream()
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+        pending = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        await sync_to_async(self.book)()
+        chunk = await asyncio.wait_for(pending, 5)
+        await stream.aclose()
+        self.assertIn('event: stay', chunk)
+        event = json.loads(chunk.split('data: ', 1)[1])
+        self.assertEqual((event['room'], event['check_in_date'], event['booked']), (self.room.pk, '2030-03-01', True))
+        self.assertNotIn('guest', event)
+
+    @override_settings(LIVE_EVENTS_BACKEND='reservations.live.DatabaseBackend', LIVE_POLL_SECONDS=0.01)
+    async def test_database_backend_delivers_across_processes(self):
+        # Otro proceso solo comparte la tabla LiveEvent con este.
+        events = live.DatabaseBackend().listen()
+        pending = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0.05)
+        await sync_to_async(self.book)()
+        event = await asyncio.wait_for(pending, 5)
+        await events.aclose()
+        self.assertEqual((event['type'], event['room']), ('stay', self.room.pk))
+
+    @override_settings(LIVE_KEEPALIVE_SECONDS=0.01)
+    async def test_slow_subscriber_gets_reset_and_idle_one_keepalive(self):
+        subscriber = live.Subscriber(size=2)
+        self.assertEqual(await subscriber.next_events(0.01), [])
+        for event_id in range(3):
+            subscriber.push(live.format_event({'type': 'stay', 'id': event_id}))
+        self.assertEqual(await subscriber.next_events(1), [live.RESET])
+
+        await self.async_client.aforce_login(self.guest.user)
+        response = await self.async_client.get('/live/availability/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+        self.assertEqual(await anext(chunks), b': keepalive\n\n')
+        await chunks.aclose()
+
+    def test_closed_loops_do_not_break_publishing(self):
+        backend = live.LocalBackend()
+        closed = asyncio.new_event_loop()
+        closed.close()
+        gone = (closed, asyncio.Queue())
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        alive = (loop, asyncio.Queue())
+        backend._listeners.extend([gone, alive])
+        backend.publish({'type': 'reset'})
+        loop.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(backend._listeners, [alive])
+        self.assertEqual(alive[1].get_nowait()['type'], 'reset')
+
+
+
+@override_settings(READ_DATABASE_ALIAS='replica')
+class ReadWriteRouterTests(TransactionTestCase):
+
+    def test_reads_go_to_the_read_connection_outside_transactions(self):
+        router = ReadWriteRouter()
+        self.assertEqual(router.db_for_read(Room), 'replica')
+        self.assertEqual(router.db_for_write(Room), 'default')
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Room), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'reservations'))
+
+
+@override_settings(DEFAULT_PROPERTY='veranum', PROPERTY_DATABASES={'veranum': 'default', 'costa': 'property_costa'})
+class PropertyTests(TestCase):
+
+    def test_router_sends_hotel_data_to_the_property_database(self):
+        router = PropertyRouter()
+        self.assertEqual(router.db_for_write(Reservation), 'default')
+        with properties.using('costa'):
+            self.assertEqual(router.db_for_read(Room), 'property_costa')
+            # Lo compartido no depende de la propiedad.
+            self.assertIsNone(router.db_for_read(User))
+            self.assertIsNone(router.db_for_write(GuestDirectory))
+        self.assertEqual(router.db_for_write(Room, instance=Room(property='costa')), 'property_costa')
+        self.assertEqual(properties.from_host('costa.veranum.cl:8000'), 'costa')
+        self.assertEqual(properties.from_host('www.veranum.cl'), 'veranum')
+
+        self.assertTrue(router.allow_migrate('property_costa', 'reservations', 'reservation'))
+        self.assertFalse(router.allow_migrate('property_costa', 'auth', 'user'))
+        self.assertFalse(router.allow_migrate('property_costa', 'reservations', 'guestdirectory'))
+        self.assertTrue(router.allow_migrate('default', 'reservations', 'guestdirectory'))
+
+    def test_directory_follows_guests_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            guest = create_guest('directorio')
+        self.assertEqual(guest.property, 'veranum')
+        [entry] = directory.lookup(email='DIRECTORIO@veranum.cl')
+        self.assertEqual((entry.property, entry.guest_id), ('veranum', guest.pk))
+        self.assertEqual(directory.lookup(user=guest.user), [entry])
+
+        GuestDirectory.objects.all().delete()
+        self.assertEqual(directory.rebuild('veranum'), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            guest.delete()
+        self.assertEqual(directory.lookup(phone_number=guest.phone_number), [])
+
+
+@skipUnless(properties.is_sharded(), 'Solo con HOTEL_PROPERTIES (una base por propiedad).')
+class ShardedPropertyTests(TestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        self.name = properties.names()[-1]
+        self.alias = properties.database(self.name)
+        with properties.using(self.name), self.captureOnCommitCallbacks(using=self.alias, execute=True):
+            self.guest = create_guest('fragmentado')
+            self.room = Room.objects.create(room_number='601', room_type='Suite', price_per_night=Decimal('90.00'))
+            book_room(self.guest, self.room, date(2030, 5, 1), date(2030, 5, 3), promotion=create_promotion())
+
+    def test_deleting_a_user_deletes_their_guest_in_its_property(self):
+        self.assertEqual(self.guest._state.db, self.alias)
+        user = self.guest.user
+        with self.captureOnCommitCallbacks(using=self.alias, execute=True):
+            user.delete()
+        self.assertFalse(User.objects.filter(pk=self.guest.user_id).exists())
+        self.assertEqual(GuestDirectory.objects.filter(user_id=self.guest.user_id).count(), 0)
+        with properties.using(self.name):
+            self.assertFalse(Guest.objects.exists())
+            self.assertFalse(Reservation.objects.exists())
+            self.assertEqual(Promotion.objects.get().uses_count, 0)
+
+    def test_move_to_property_copies_a_database(self):
+        target = properties.names()[0]
+        output = io.StringIO()
+        call_command('move_to_property', '--property', target, '--source', self.alias, stdout=output)
+        with properties.using(target):
+            guest = Guest.objects.get()
+            self.assertEqual((guest.pk, guest.property, guest.user_id), (self.guest.pk, target, self.guest.user_id))
+            self.assertEqual(Reservation.objects.get().room.room_number, '601')
+            self.assertEqual(PromotionRedemption.objects.count(), 1)
+            self.assertEqual(search_guests('fragmentado'), [guest])
+        self.assertEqual(GuestDirectory.objects.filter(property=target).count(), 1)
+        with self.assertRaises(CommandError):
+            call_command('move_to_property', '--property', target, '--source', self.alias, stdout=io.StringIO())
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """
+    Lanza cientos de reservas en paralelo, cada hilo con su propia conexión.
+    """
+    requests = 300
+    workers = 32
+
+    def setUp(self):
+        self.rooms = [
+            Room.objects.create(room_number=str(100 + i), room_type='Doble', price_per_night=Decimal('50.00'))
+            for i in range(3)
+        ]
+        self.guests = [create_guest(f'huesped{i}') for i in range(10)]
+        self.promotion = create_promotion()
+
+    def run_concurrently(self, attempts):
+        def attempt(args):
+            try:
+                return book_room(*args[:4], promotion=args[4])
+            except (BookingError, promotions.PromotionError) as exc:
+                return exc
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(attempt, attempts))
+
+    def test_no_double_bookings_under_contention(self):
+        randomizer = random.Random(7)
+        start = date(2030, 3, 1)
+        attempts = []
+        for _ in range(self.requests):
+            check_in = start + timedelta(days=randomizer.randrange(30))
+            attempts.append((
+                randomizer.choice(self.guests),
+                randomizer.choice(self.rooms),
+                check_in,
+                check_in + timedelta(days=randomizer.randint(1, 4)),
+                None,
+            ))
+
+        results = self.run_concurrently(attempts)
+
+        booked = [result for result in results if isinstance(result, Reservation)]
+        rejected = [result for result in results if isinstance(result, RoomUnavailable)]
+        self.assertEqual(len(booked) + len(rejected), self.requests)
+        self.assertEqual(Reservation.objects.count(), len(booked))
+        for room in self.rooms:
+            assert_no_overlaps(self, room)
+
+    def test_first_booking_promotion_is_redeemed_once(self):
+        guest = self.guests[0]
+        start = date(2030, 6, 1)
+        attempts = [
+            (guest, self.rooms[i % len(self.rooms)], start + timedelta(days=i), start + timedelta(days=i + 1), self.promotion)
+            for i in range(self.requests)
+        ]
+
+        results = self.run_concurrently(attempts)
+
+        booked = [result for result in results if isinstance(result, Reservation)]
+        self.assertEqual(len(booked), 1)
+        self.assertEqual(Reservation.objects.filter(guest=guest, promotion=self.promotion).count(), 1)
+        guest.refresh_from_db()
+        self.assertTrue(guest.has_used_promotion)
+
+    def test_flash_sale_never_over_redeems(self):
+        self.promotion.max_uses = 20
+        self.promotion.save()
+        guests = [create_guest(f'flash{i}') for i in range(self.requests // 3)]
+        start = date(2030, 9, 1)
+        attempts = [
+            (guest, self.rooms[i % len(self.rooms)], start + timedelta(days=i), start + timedelta(days=i + 1), self.promotion)
+            for i, guest in enumerate(guests)
+        ]
+
+        results = self.run_concurrently(attempts)
+
+        booked = [result for result in results if isinstance(result, Reservation)]
+        self.assertEqual(len(booked), 20)
+        self.assertTrue(all(isinstance(result, (Reservation, promotions.PromotionExhausted)) for result in results))
+        self.promotion.refresh_from_db()
+        self.assertEqual(self.promotion.uses_count, 20)
+        self.assertEqual(PromotionRedemption.objects.count(), 20)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ViewQueryCountTests(TestCase):
+    """
+    Recorre las vistas de urls.py con pocos datos y con más de una página de
+    filas: la cantidad de consultas no puede crecer con los datos. Una
+    plantilla que vuelva a leer {{ reservation.guest }} fila por fila sin
+    select_related hace fallar estas pruebas.
+    """
+
+    def setUp(self):
+        self.guest = create_guest('personal')
+        self.guest.user.is_staff = self.guest.user.is_superuser = True
+        self.guest.user.save()
+        self.client.force_login(self.guest.user)
+        self.promotion = create_promotion()
+        self.today = date.today()
+        self.added = 0
+
+    def add_data(self, count):
+        # Por cada vuelta: una habitación, un huésped con su primera reserva
+        # (con canje), una promoción y dos estadías del usuario de la prueba,
+        # una próxima y otra pasada que luego se archiva.
+        for _ in range(count):
+            self.added += 1
+            check_in = self.today + timedelta(days=self.added % 10)
+            room = Room.objects.create(
+                room_number=str(1000 + self.added),
+                room_type=('Suite', 'Doble')[self.added % 2],
+                price_per_night=Decimal('80.00') + self.added,
+                promotion=self.promotion if self.added % 3 == 0 else None,
+            )
+            create_promotion(f'CONSULTAS{self.added}')
+            book_room(create_guest(f'consultas{self.added}'), room, check_in, check_in + timedelta(days=2), promotion=self.promotion)
+            book_room(self.guest, room, self.today + timedelta(days=20), self.today + timedelta(days=21))
+            book_room(self.guest, room, self.today - timedelta(days=400), self.today - timedelta(days=398))
+        archive.archive(self.today - timedelta(days=300))
+
+    def urls(self):
+        stay = {'check_in_date': self.today, 'check_out_date': self.today + timedelta(days=3)}
+        return [
+            ('/', {}),
+            ('/guests/', {}),
+            ('/guests/', {'q': 'consultas'}),
+            ('/guests/new/', {}),
+            ('/guests/search/', {'q': 'consultas'}),
+            ('/reservations/', {}),
+            ('/reservations/', {'history': 'on', 'sort': 'check_in_date'}),
+            ('/reservations/', {'room': Room.objects.get(room_number='1001').pk}),
+            ('/reservations/new/', {}),
+            ('/reservations/export/', {}),
+            ('/reservations/export/', {'format': 'ndjson', 'history': 'on'}),
+            ('/rooms/', {}),
+            ('/rooms/new/', {}),
+            ('/rooms/search/', {}),
+            ('/rooms/search/', stay),
+            ('/rooms/search/', {**stay, 'room_type': 'Suite', 'max_price': '100'}),
+            ('/rooms/search/reserve/', {}),
+            ('/calendars/rooms/1001.ics', {}),
+            ('/calendars/types/Suite.ics', {}),
+            ('/promotions/', {}),
+            ('/promotions/new/', {}),
+            ('/signup/', {}),
+            ('/login/', {}),
+            ('/user_dashboard/', {}),
+            ('/user_dashboard/', stay),
+            ('/user_reservations/', {}),
+            ('/user_reservations/', {'history': '1'}),
+            ('/reports/occupancy/', {}),
+            ('/reports/occupancy/', {'start': self.today - timedelta(days=400), 'end': self.today + timedelta(days=10), 'room_type': 'Suite'}),
+            ('/metrics', {}),
+        ]
+
+    def get(self, url, params):
+        response = self.client.get(url, params)
+        self.assertLess(response.status_code, 400, url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def test_views_cost_a_fixed_number_of_queries(self):
+        self.add_data(3)
+        counts = {}
+        for url, params in self.urls():
+            # La primera visita llena los cachés (sesión, catálogo, feeds).
+            self.get(url, params)
+            with CaptureQueriesContext(connection) as queries:
+                self.get(url, params)
+            counts[url, str(params)] = len(queries)
+        self.add_data(60)
+        for url, params in self.urls():
+            self.get(url, params)
+            with CaptureQueriesContext(connection) as queries:
+                self.get(url, params)
+            self.assertEqual(len(queries), counts[url, str(params)], f'{url} {params}\n' + '\n'.join(query['sql'] for query in queries))
+
+    def book_through_views(self, number):
+        guest = create_guest(f'reserva{number}')
+        guest.has_used_promotion = True
+        guest.save()
+        self.client.force_login(guest.user)
+        self.client.get('/user_dashboard/')
+        room = Room.objects.create(room_number=str(2000 + number), room_type='Familiar', price_per_night=Decimal('70.00'))
+        check_in = self.today + timedelta(days=100)
+        with CaptureQueriesContext(connection) as by_room:
+            self.client.post('/reservations/new/', {
+                'room': room.pk, 'check_in_date': check_in, 'check_out_date': check_in + timedelta(days=2),
+            })
+        self.client.get('/user_dashboard/')
+        with CaptureQueriesContext(connection) as by_type:
+            self.client.post('/rooms/search/reserve/', {
+                'booking-room_type': 'Familiar', 'booking-check_in_date': check_in, 'booking-check_out_date': check_in + timedelta(days=2),
+            })
+        self.assertEqual(Reservation.objects.filter(guest=guest).count(), 2)
+        return len(by_room), len(by_type)
+
+    def test_bookings_cost_a_fixed_number_of_queries(self):
+        self.add_data(3)
+        Room.objects.create(room_number='1999', room_type='Familiar', price_per_night=Decimal('70.00'))
+        counts = self.book_through_views(1)
+        self.add_data(60)
+        Room.objects.create(room_number='1998', room_type='Familiar', price_per_night=Decimal('70.00'))
+        self.assertEqual(self.book_through_views(2), counts)
+
+    def test_bookings_through_views_keep_invariants(self):
+        self.add_data(5)
+        guest = create_guest('invariantes')
+        self.client.force_login(guest.user)
+        room = Room.objects.get(room_number='1003')
+        check_in = self.today + timedelta(days=40)
+        stay = {'check_in_date': check_in, 'check_out_date': check_in + timedelta(days=3)}
+
+        # Las señales invalidan el usuario en caché al confirmar: sin esto la
+        # sesión seguiría viendo has_used_promotion en False.
+        with self.captureOnCommitCallbacks(execute=True):
+            # Primera reserva: exige promoción y la canjea.
+            self.client.post('/reservations/new/', {'room': room.pk, **stay})
+            self.assertFalse(Reservation.objects.filter(guest=guest).exists())
+            self.client.post('/reservations/new/', {'room': room.pk, 'promotion': self.promotion.pk, **stay})
+        with self.captureOnCommitCallbacks(execute=True):
+            # La misma habitación en fechas que se cruzan no se reserva.
+            self.client.post('/reservations/new/', {'room': room.pk, 'check_in_date': check_in + timedelta(days=2), 'check_out_date': check_in + timedelta(days=4)})
+            # Por tipo: se reparten las Suite libres hasta que no quede ninguna.
+            suites = Room.objects.filter(room_type='Suite').count()
+            for _ in range(suites + 2):
+                self.client.post('/rooms/search/reserve/', {f'booking-{field}': value for field, value in stay.items()} | {'booking-room_type': 'Suite'})
+
+        guest.refresh_from_db()
+        self.assertTrue(guest.has_used_promotion)
+        self.assertEqual(Reservation.objects.filter(guest=guest, promotion=self.promotion).count(), 1)
+        self.assertEqual(Reservation.objects.filter(guest=guest, room__room_type='Suite').count(), suites)
+        self.assertEqual(inventory.vacancies(check_in, check_in + timedelta(days=3), room_type='Suite'), {'Suite': 0})
+
+        for room in Room.objects.all():
+            assert_no_overlaps(self, room)
+        for reservation in Reservation.objects.select_related('room__promotion', 'promotion'):
+            quote = quote_rooms([reservation.room], reservation.check_in_date, reservation.check_out_date, promotion=reservation.promotion)
+            self.assertEqual(reservation.total_price, quote[reservation.room_id])
+        for promotion in Promotion.objects.all():
+            self.assertEqual(promotion.uses_count, promotion.redemptions.count())
+        self.assertEqual(
+            set(Guest.objects.filter(has_used_promotion=True).values_list('id', flat=True)),
+            set(PromotionRedemption.objects.values_list('guest_id', flat=True)),
+        )
+
+        # Los contadores incrementales coinciden con recalcularlos desde cero.
+        stats = sorted(DailyRoomTypeStats.objects.filter(rooms_sold__gt=0).values_list('date', 'room_type', 'rooms_sold', 'revenue'))
+        counters = sorted(RoomTypeInventory.objects.filter(booked__gt=0).values_list('room_type', 'date', 'booked'))
+        rollups.rebuild()
+        inventory.rebuild()
+        self.assertEqual(stats, sorted(DailyRoomTypeStats.objects.filter(rooms_sold__gt=0).values_list('date', 'room_type', 'rooms_sold', 'revenue')))
+        self.assertEqual(counters, sorted(RoomTypeInventory.objects.filter(booked__gt=0).values_list('room_type', 'date', 'booked')))
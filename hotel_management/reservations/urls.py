@@ -5,15 +5,23 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('guests/', views.guest_list, name='guest_list'),
     path('guests/new/', views.create_guest, name='create_guest'),
+    path('guests/search/', views.guest_search, name='guest_search'),
     path('reservations/', views.reservation_list, name='reservation_list'),
     path('reservations/new/', views.create_reservation, name='create_reservation'),
+    path('reservations/export/', views.export_reservations, name='export_reservations'),
     path('rooms/', views.room_list, name='room_list'),
     path('rooms/new/', views.create_room, name='create_room'),
+    path('rooms/search/', views.room_search, name='room_search'),
+    path('rooms/search/reserve/', views.reserve_room_type, name='reserve_room_type'),
+    path('calendars/rooms/<str:room_number>.ics', views.room_calendar, name='room_calendar'),
+    path('calendars/types/<str:room_type>.ics', views.room_type_calendar, name='room_type_calendar'),
     path('promotions/', views.promotion_list, name='promotion_list'),
     path('promotions/new/', views.create_promotion, name='create_promotion'),
     path('signup/', views.signup, name='signup'),
     path('login/', views.login_view, name='login'),
     path('user_dashboard/', views.user_dashboard, name='user_dashboard'),
     path('user_reservations/', views.user_reservations, name='user_reservations'),
+    path('reports/occupancy/', views.occupancy_report, name='occupancy_report'),
+    path('metrics', views.metrics, name='metrics'),
 ]
 
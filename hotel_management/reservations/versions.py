@@ -0,0 +1,54 @@
+from django.db.models import F
+from django.utils import timezone
+from .models import ModelVersion
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def bump(*models):
+    """
+    Sube el sello de versión de los modelos indicados. Se llama desde las
+    señales post_save/post_delete (signals.py) y, a mano, desde las cargas
+    masivas que no disparan señales. Va en la transacción del cambio, así
+    que el sello nuevo se ve recién cuando el cambio está confirmado.
+    """
+    now = timezone.now()
+    labels = [label(model) for model in models]
+    updated = ModelVersion.objects.filter(model__in=labels).update(version=F('version') + 1, updated_at=now)
+    if updated < len(labels):
+        ModelVersion.objects.bulk_create(
+            [ModelVersion(model=name, version=1, updated_at=now) for name in labels],
+            ignore_conflicts=True,
+        )
+
+
+def _stamps(rows, labels):
+    versions = dict.fromkeys(labels, 0)
+    last_modified = None
+    for name, version, updated_at in rows:
+        versions[name] = version
+        last_modified = max(last_modified or updated_at, updated_at)
+    return tuple(versions[name] for name in labels), last_modified
+
+
+def _rows(labels):
+    return ModelVersion.objects.filter(model__in=labels).values_list('model', 'version', 'updated_at')
+
+
+def stamps(*models):
+    """
+    Devuelve (versiones, última modificación) de los modelos indicados,
+    en una sola consulta a la tabla de sellos.
+    """
+    labels = [label(model) for model in models]
+    return _stamps(_rows(labels), labels)
+
+
+async def astamps(*models):
+    """
+    Variante async de stamps().
+    """
+    labels = [label(model) for model in models]
+    return _stamps([row async for row in _rows(labels)], labels)
@@ -1,12 +1,64 @@
-from datetime import date
-from django.shortcuts import render, get_object_or_404, redirect
+import hmac
+from collections import Counter
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
+from django.db.models import Sum
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.utils.translation import gettext as _
-from .models import Guest, Reservation, Room, Promotion
-from .forms import GuestForm, ReservationForm, RoomForm, SignUpForm, PromotionForm
+from .models import DailyRoomTypeStats, Guest, Reservation, ReservationArchive, Room, Promotion
+from .forms import GuestForm, ReservationForm, RoomForm, SignUpForm, PromotionForm, AvailabilitySearchForm, ReservationFilterForm, OccupancyReportForm, RoomTypeBookingForm, GuestSearchForm
+from . import calendars, catalog, directory, exports, inventory, properties
+from .conditional import versioned
+from .availability import available_catalog_rooms
+from .booking import book_room, book_room_type, PromotionAlreadyUsed, RoomUnavailable
+from .promotions import PromotionError
+from .metrics import registry
+from .pagination import KeysetPaginator
+from .pricing import CENT, quote_rooms, stay_nights
+from .search import search_guests
+
+PAGE_SIZE = 50
+
+# Cada orden termina en 'id' para que el cursor sea único y coincide con un
+# índice de Reservation, así la página se lee directo del índice.
+RESERVATION_ORDERINGS = {
+    '-check_in_date': ('-check_in_date', '-id'),
+    'check_in_date': ('check_in_date', 'id'),
+    '-check_out_date': ('-check_out_date', '-id'),
+    'check_out_date': ('check_out_date', 'id'),
+}
+
+def with_stay_totals(rooms, check_in_date, check_out_date):
+    """
+    Agrega a cada habitación el total de la estadía (stay_total) y si lleva
+    descuento (stay_discounted), cotizando todas en una sola pasada.
+    """
+    rooms = list(rooms)
+    nights = len(stay_nights(check_in_date, check_out_date))
+    totals = quote_rooms(rooms, check_in_date, check_out_date)
+    for room in rooms:
+        room.stay_total = totals[room.pk]
+        room.stay_discounted = room.stay_total < room.price_per_night * nights
+    return rooms
+
+def room_type_booking_form(vacancies, check_in_date, check_out_date):
+    """
+    Formulario para reservar por tipo desde la búsqueda, con los tipos que
+    aún tienen cupo. None si no queda ninguno.
+    """
+    room_types = [room_type for room_type, free in vacancies.items() if free > 0]
+    if not room_types:
+        return None
+    form = RoomTypeBookingForm(room_types=room_types, initial={'check_in_date': check_in_date, 'check_out_date': check_out_date})
+    return form
 
 def index(request):
     """
@@ -37,21 +89,120 @@ def create_guest(request):
 @permission_required('reservations.view_guest', raise_exception=True)
 def guest_list(request):
     """
-    Muestra una lista de todos los huéspedes.
+    Muestra una lista paginada de los huéspedes, ordenada por apellido.
+    Con ?q= muestra en cambio los huéspedes que calzan con la búsqueda,
+    de más a menos relevante (ver search.py).
     Solo accesible por usuarios con permisos de administrador.
     """
-    guests = Guest.objects.all()
-    return render(request, 'reservations/guest_list.html', {'guests': guests})
+    form = GuestSearchForm(request.GET or None)
+    if form.is_valid() and form.cleaned_data['q']:
+        guests = search_guests(form.cleaned_data['q'], limit=PAGE_SIZE)
+        return render(request, 'reservations/guest_list.html', {'guests': guests, 'page': None, 'form': form})
+    guests = Guest.objects.only('first_name', 'last_name', 'email', 'phone_number', 'address')
+    page = KeysetPaginator(guests, ('last_name', 'first_name', 'id'), per_page=PAGE_SIZE).page(request.GET.get('cursor'))
+    return render(request, 'reservations/guest_list.html', {'guests': page, 'page': page, 'form': form})
+
+@login_required
+@permission_required('reservations.view_guest', raise_exception=True)
+def guest_search(request):
+    """
+    Búsqueda de huéspedes en JSON para autocompletar en recepción:
+    ?q=texto&limit=n (máximo 50). Cada palabra se busca por prefijo. Un
+    correo o teléfono completo se busca además en las otras propiedades,
+    por el directorio compartido (other_properties).
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), PAGE_SIZE)
+    except ValueError:
+        limit = 10
+    text = request.GET.get('q', '').strip()
+    guests = search_guests(text, limit=limit)
+    elsewhere = []
+    if properties.is_sharded() and ('@' in text or text.lstrip('+').isdigit()):
+        elsewhere = [entry for entry in directory.lookup(email=text, phone_number=text) if entry.property != request.property]
+    return JsonResponse({
+        'results': [
+            {
+                'id': guest.pk,
+                'first_name': guest.first_name,
+                'last_name': guest.last_name,
+                'email': guest.email,
+                'phone_number': guest.phone_number,
+            }
+            for guest in guests
+        ],
+        'other_properties': [
+            {
+                'property': entry.property,
+                'id': entry.guest_id,
+                'first_name': entry.first_name,
+                'last_name': entry.last_name,
+                'email': entry.email,
+                'phone_number': entry.phone_number,
+            }
+            for entry in elsewhere
+        ],
+    })
 
 @login_required
 @permission_required('reservations.view_reservation', raise_exception=True)
+@versioned(Reservation, Guest, Room)
 def reservation_list(request):
     """
-    Muestra una lista de todas las reservas.
+    Muestra una lista paginada de las reservas, con filtros por fecha de
+    entrada y habitación. Con el filtro de historial suma las archivadas.
     Solo accesible por usuarios con permisos de administrador.
     """
-    reservations = Reservation.objects.all()
-    return render(request, 'reservations/reservation_list.html', {'reservations': reservations})
+    form = ReservationFilterForm(request.GET or None)
+    filters = {}
+    history = False
+    ordering = RESERVATION_ORDERINGS['-check_in_date']
+    if form.is_valid():
+        if form.cleaned_data['check_in_from']:
+            filters['check_in_date__gte'] = form.cleaned_data['check_in_from']
+        if form.cleaned_data['check_in_to']:
+            filters['check_in_date__lte'] = form.cleaned_data['check_in_to']
+        if form.cleaned_data['room']:
+            filters['room'] = form.cleaned_data['room']
+        if form.cleaned_data['sort']:
+            ordering = RESERVATION_ORDERINGS[form.cleaned_data['sort']]
+        history = form.cleaned_data['history']
+    fields = ('check_in_date', 'check_out_date', 'guest__first_name', 'guest__last_name', 'room__room_number')
+    reservations = Reservation.objects.select_related('guest', 'room').only(*fields).filter(**filters)
+    archived = ()
+    if history:
+        archived = [ReservationArchive.objects.select_related('guest', 'room').only(*fields).filter(**filters)]
+    page = KeysetPaginator(reservations, ordering, per_page=PAGE_SIZE, others=archived).page(request.GET.get('cursor'))
+    return render(request, 'reservations/reservation_list.html', {'reservations': page, 'page': page, 'form': form})
+
+@login_required
+@permission_required('reservations.view_reservation', raise_exception=True)
+def export_reservations(request):
+    """
+    Descarga el historial de reservas en CSV o NDJSON (?format=ndjson),
+    con los mismos filtros que la lista de reservas. La respuesta se envía
+    por partes mientras se lee la base, así que la memoria no crece con el
+    tamaño de la tabla.
+    Solo accesible por usuarios con permisos de administrador.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in exports.FORMATS:
+        export_format = 'csv'
+    form = ReservationFilterForm(request.GET)
+    filters = {}
+    if form.is_valid():
+        filters = {
+            'check_in_from': form.cleaned_data['check_in_from'],
+            'check_in_to': form.cleaned_data['check_in_to'],
+            'room': form.cleaned_data['room'],
+            'history': form.cleaned_data['history'],
+        }
+    response = StreamingHttpResponse(
+        exports.render(exports.export_rows(**filters), export_format),
+        content_type=exports.FORMATS[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="reservas.{export_format}"'
+    return response
 
 @login_required
 @permission_required('reservations.add_room', raise_exception=True)
@@ -74,13 +225,87 @@ def create_room(request):
 
 @login_required
 @permission_required('reservations.view_room', raise_exception=True)
+@versioned(Room)
 def room_list(request):
     """
-    Muestra una lista de todas las habitaciones.
+    Muestra una lista paginada de las habitaciones, ordenada por número.
     Solo accesible por usuarios con permisos de administrador.
     """
-    rooms = Room.objects.all()
-    return render(request, 'reservations/room_list.html', {'rooms': rooms})
+    rooms = Room.objects.only('room_number', 'room_type', 'description', 'price_per_night', 'available')
+    page = KeysetPaginator(rooms, ('room_number',), per_page=PAGE_SIZE).page(request.GET.get('cursor'))
+    return render(request, 'reservations/room_list.html', {'rooms': page, 'page': page})
+
+@login_required
+def room_search(request):
+    """
+    Busca habitaciones libres para un rango de fechas, filtrando opcionalmente
+    por tipo de habitación y precio máximo por noche.
+    """
+    form = AvailabilitySearchForm(request.GET or None)
+    rooms = vacancies = booking_form = None
+    if form.is_valid():
+        check_in_date = form.cleaned_data['check_in_date']
+        check_out_date = form.cleaned_data['check_out_date']
+        vacancies = inventory.vacancies(check_in_date, check_out_date, room_type=form.cleaned_data['room_type'])
+        booking_form = room_type_booking_form(vacancies, check_in_date, check_out_date)
+        rooms = available_catalog_rooms(
+            check_in_date,
+            check_out_date,
+            room_type=form.cleaned_data['room_type'],
+            max_price=form.cleaned_data['max_price'],
+        )
+        rooms = with_stay_totals(rooms, check_in_date, check_out_date)
+    return render(request, 'reservations/room_search.html', {
+        'form': form,
+        'rooms': rooms,
+        'vacancies': vacancies,
+        'booking_form': booking_form,
+    })
+
+@login_required
+def reserve_room_type(request):
+    """
+    Reserva una habitación del tipo elegido en la búsqueda. La habitación
+    concreta se asigna al confirmar, según disponibilidad.
+    """
+    if request.method != 'POST':
+        return redirect('room_search')
+    if not hasattr(request.user, 'guest'):
+        messages.error(request, _('Primero necesitas crear un perfil de huésped.'))
+        return redirect('create_guest')
+
+    form = RoomTypeBookingForm(request.POST, room_types=inventory.capacity(catalog.get_rooms()))
+    if not form.is_valid():
+        messages.error(request, _('Por favor, corrige el error a continuación.'))
+        return redirect('room_search')
+
+    guest = request.user.guest
+    promotion = None
+    if not guest.has_used_promotion:
+        promotion = form.cleaned_data['promotion']
+        if promotion is None:
+            messages.error(request, _('Debes seleccionar una promoción para tu primera reserva.'))
+            return redirect('room_search')
+
+    try:
+        reservation = book_room_type(
+            guest,
+            form.cleaned_data['room_type'],
+            form.cleaned_data['check_in_date'],
+            form.cleaned_data['check_out_date'],
+            promotion=promotion,
+        )
+    except RoomUnavailable:
+        messages.error(request, _('No quedan habitaciones de ese tipo para esas fechas.'))
+        return redirect('room_search')
+    except PromotionAlreadyUsed:
+        messages.error(request, _('Ya utilizaste tu promoción de primera reserva.'))
+        return redirect('room_search')
+    except PromotionError:
+        messages.error(request, _('No se pudo canjear la promoción: no rige en esas fechas o ya no tiene cupo.'))
+        return redirect('room_search')
+    messages.success(request, _('Reserva creada con éxito: habitación %(room)s.') % {'room': reservation.room.room_number})
+    return redirect('user_reservations')
 
 @login_required
 def create_reservation(request):
@@ -91,47 +316,64 @@ def create_reservation(request):
     if request.method == 'POST':
         form = ReservationForm(request.POST)
         if form.is_valid():
-            reservation = form.save(commit=False)
             if not hasattr(request.user, 'guest'):
                 messages.error(request, _('Primero necesitas crear un perfil de huésped.'))
                 return redirect('create_guest')
-            
+
             guest = request.user.guest
-            reservation.guest = guest 
-            room_id = request.POST.get('room') 
-            reservation.room = get_object_or_404(Room, id=room_id)  
-            
-          
+            promotion = None
             if not guest.has_used_promotion:
-                promotion_id = request.POST.get('promotion')
-                if promotion_id:
-                    reservation.promotion = get_object_or_404(Promotion, id=promotion_id)
-                    guest.has_used_promotion = True 
-                    guest.save()
-                else:
+                promotion = form.cleaned_data['promotion']
+                if promotion is None:
                     messages.error(request, _('Debes seleccionar una promoción para tu primera reserva.'))
                     return redirect('user_dashboard')
-            else:
-                reservation.promotion = None
-            
-            reservation.save()
+
+            try:
+                book_room(
+                    guest,
+                    form.cleaned_data['room'],
+                    form.cleaned_data['check_in_date'],
+                    form.cleaned_data['check_out_date'],
+                    promotion=promotion,
+                    # El huésped eligió esta habitación: no se reasigna.
+                    room_locked=True,
+                )
+            except RoomUnavailable:
+                messages.error(request, _('La habitación ya está reservada para esas fechas.'))
+                return redirect('user_dashboard')
+            except PromotionAlreadyUsed:
+                messages.error(request, _('Ya utilizaste tu promoción de primera reserva.'))
+                return redirect('user_dashboard')
+            except PromotionError:
+                messages.error(request, _('No se pudo canjear la promoción: no rige en esas fechas o ya no tiene cupo.'))
+                return redirect('user_dashboard')
             messages.success(request, _('Reserva creada con éxito.'))
             return redirect('user_dashboard')
         else:
             messages.error(request, _('Por favor, corrige el error a continuación.'))
     else:
-        promotions = Promotion.objects.all()
         form = ReservationForm()
-        form.fields['promotion'].queryset = promotions
+        # Las opciones salen del catálogo en caché; el queryset del campo solo
+        # se consulta al validar el POST.
+        form.fields['room'].choices = [('', '---------')] + [(room.pk, str(room)) for room in catalog.get_rooms()]
+        form.fields['promotion'].choices = [('', '---------')] + [(promotion.pk, str(promotion)) for promotion in catalog.get_active_promotions()]
     return render(request, 'reservations/reservation_form.html', {'form': form})
 
 @login_required
 def user_reservations(request):
     """
-    Muestra una lista de reservas del usuario actual.
+    Muestra una lista de reservas del usuario actual; con ?history=1 incluye
+    también las estadías archivadas.
     """
-    reservations = Reservation.objects.filter(guest=request.user.guest)
-    return render(request, 'reservations/user_reservations.html', {'reservations': reservations})
+    history = request.GET.get('history') == '1'
+    # Una cuenta sin perfil de huésped (el personal) ve la lista vacía.
+    guest = getattr(request.user, 'guest', None)
+    reservations = []
+    if guest is not None:
+        reservations = list(Reservation.objects.filter(guest=guest).select_related('room'))
+        if history:
+            reservations += ReservationArchive.objects.filter(guest=guest).select_related('room').order_by('-check_in_date')
+    return render(request, 'reservations/user_reservations.html', {'reservations': reservations, 'history': history})
 
 @login_required
 @permission_required('reservations.add_promotion', raise_exception=True)
@@ -156,11 +398,12 @@ def create_promotion(request):
 @permission_required('reservations.view_promotion', raise_exception=True)
 def promotion_list(request):
     """
-    Muestra una lista de todas las promociones.
+    Muestra una lista paginada de las promociones, las más nuevas primero.
     Solo accesible por usuarios con permisos de administrador.
     """
-    promotions = Promotion.objects.all()
-    return render(request, 'reservations/promotion_list.html', {'promotions': promotions})
+    promotions = Promotion.objects.only('code', 'description', 'discount_percentage', 'start_date', 'end_date', 'uses_count', 'max_uses')
+    page = KeysetPaginator(promotions, ('-start_date', '-id'), per_page=PAGE_SIZE).page(request.GET.get('cursor'))
+    return render(request, 'reservations/promotion_list.html', {'promotions': page, 'page': page})
 
 def signup(request):
     """
@@ -216,11 +459,113 @@ def login_view(request):
     return render(request, 'registration/login.html', {'form': form})
 
 @login_required
+@versioned(Room, Reservation, Promotion, per_day=True)
 def user_dashboard(request):
     """
     Muestra el tablero de usuario con una lista de habitaciones disponibles.
+    Por defecto muestra las habitaciones libres para esta noche. Habitaciones
+    y promociones salen del catálogo en caché.
     """
-    rooms = Room.objects.filter(available=True)
-    promotions = Promotion.objects.all()
     today = date.today()
-    return render(request, 'reservations/user_dashboard.html', {'rooms': rooms, 'promotions': promotions, 'today': today})
+    form = AvailabilitySearchForm(request.GET or None)
+    if form.is_valid():
+        check_in_date = form.cleaned_data['check_in_date']
+        check_out_date = form.cleaned_data['check_out_date']
+    else:
+        check_in_date, check_out_date = today, today + timedelta(days=1)
+    rooms = with_stay_totals(available_catalog_rooms(check_in_date, check_out_date), check_in_date, check_out_date)
+    promotions = catalog.get_active_promotions(today)
+    return render(request, 'reservations/user_dashboard.html', {
+        'rooms': rooms,
+        'promotions': promotions,
+        'today': today,
+        'check_in_date': check_in_date,
+        'check_out_date': check_out_date,
+    })
+
+@login_required
+@permission_required('reservations.view_dailyroomtypestats', raise_exception=True)
+def occupancy_report(request):
+    """
+    Ocupación e ingresos diarios por tipo de habitación. Solo lee el rollup
+    DailyRoomTypeStats (y el catálogo en caché para el inventario), así que
+    el costo depende del rango pedido y no del historial de reservas.
+    """
+    today = date.today()
+    start, end, room_type = today - timedelta(days=30), today, ''
+    form = OccupancyReportForm(request.GET or None, initial={'start': start, 'end': end})
+    if form.is_valid():
+        start, end, room_type = form.cleaned_data['start'], form.cleaned_data['end'], form.cleaned_data['room_type']
+
+    stats = DailyRoomTypeStats.objects.filter(date__range=(start, end))
+    if room_type:
+        stats = stats.filter(room_type=room_type)
+    inventory = Counter(room.room_type for room in catalog.get_rooms() if room.available)
+    days = (end - start).days + 1
+
+    rows = list(stats.order_by('date', 'room_type'))
+    for row in rows:
+        row.occupancy = row.rooms_sold * 100 / inventory[row.room_type] if inventory[row.room_type] else None
+    totals = list(stats.values('room_type').annotate(rooms_sold=Sum('rooms_sold'), revenue=Sum('revenue')).order_by('room_type'))
+    for total in totals:
+        total['revenue'] = total['revenue'].quantize(CENT)
+        capacity = inventory[total['room_type']] * days
+        total['occupancy'] = total['rooms_sold'] * 100 / capacity if capacity else None
+    return render(request, 'reservations/occupancy_report.html', {
+        'form': form,
+        'rows': rows,
+        'totals': totals,
+        'start': start,
+        'end': end,
+    })
+
+def calendar_response(request, name, rooms):
+    """
+    Feed .ics de `rooms` con ETag: si el canal ya tiene la versión vigente
+    recibe un 304 sin que se lean las reservas. Con CALENDAR_FEED_TOKEN
+    definido, la URL debe traer ?token=.
+    """
+    token = settings.CALENDAR_FEED_TOKEN
+    if token and not hmac.compare_digest(request.GET.get('token', ''), token):
+        raise PermissionDenied
+    room_ids = [room.pk for room in rooms]
+    etag = quote_etag(calendars.etag(room_ids))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(calendars.render(name, room_ids), content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.CALENDAR_CACHE_SECONDS)
+    return response
+
+def room_calendar(request, room_number):
+    """
+    Noches ocupadas de una habitación en formato iCalendar, para los
+    channel managers.
+    """
+    rooms = [room for room in catalog.get_rooms() if room.room_number == room_number]
+    if not rooms:
+        raise Http404
+    return calendar_response(request, f'Habitación {room_number}', rooms)
+
+def room_type_calendar(request, room_type):
+    """
+    Noches ocupadas de todas las habitaciones de un tipo, un evento por
+    reserva, en formato iCalendar.
+    """
+    rooms = [room for room in catalog.get_rooms() if room.room_type == room_type]
+    if not rooms:
+        raise Http404
+    return calendar_response(request, room_type, sorted(rooms, key=lambda room: room.room_number))
+
+def metrics(request):
+    """
+    Expone las métricas de peticiones en formato de texto de Prometheus.
+    Solo accesible por el personal o con el token METRICS_TOKEN
+    (Authorization: Bearer <token>).
+    """
+    token = settings.METRICS_TOKEN
+    scheme, __, credentials = request.headers.get('Authorization', '').partition(' ')
+    authorized = token and scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip(), token)
+    if not authorized and not request.user.is_staff:
+        raise PermissionDenied
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,24 @@
+import django
+
+# Punto de entrada de los procesos de run_jobs --processes y de
+# seed_data --all-properties. Un proceso nuevo (spawn) importa este módulo
+# antes de configurar Django, así que no puede importar modelos al
+# cargarse, como sí hace jobs.py.
+
+
+def setup():
+    django.setup()
+
+
+def execute(job_id, name):
+    from .jobs import execute_in_worker
+    return execute_in_worker(job_id, name)
+
+
+def seed(name, options):
+    # Un proceso por propiedad en seed_data --all-properties.
+    from io import StringIO
+    from django.core.management import call_command
+    output = StringIO()
+    call_command('seed_data', property=name, stdout=output, **options)
+    return output.getvalue()